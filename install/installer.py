@@ -401,6 +401,8 @@ def create_symlinks():
             
         scripts = [
             'TakePhoto.py',
+            'TriggerCapture.py',
+            'CaptureDaemon.py',
             'Scheduler.py',
             'Attract_On.py',
             'Attract_Off.py',
@@ -499,6 +501,25 @@ WantedBy=multi-user.target
             # Copy to system location
             run_command(['sudo', 'cp', temp_service_file, '/etc/systemd/system/'], capture_output=False)
         
+        # Capture daemon service
+        capture_service_file = os.path.join(src_deployment_dir, 'creaturebox-capture.service')
+        if os.path.exists(capture_service_file):
+            dest_capture_service_file = os.path.join(deployment_dir, 'creaturebox-capture.service')
+            shutil.copy2(capture_service_file, dest_capture_service_file)
+            
+            with open(dest_capture_service_file, 'r') as f:
+                content = f.read()
+            
+            content = content.replace('/opt/creaturebox-venv', VENV_PATH)
+            content = content.replace('/opt/creaturebox', TARGET_DIR)
+            content = content.replace('User=creaturebox', f'User={user}')
+            content = content.replace('Group=creaturebox', f'Group={user}')
+            
+            with open(dest_capture_service_file, 'w') as f:
+                f.write(content)
+            
+            run_command(['sudo', 'cp', dest_capture_service_file, '/etc/systemd/system/creaturebox-capture.service'], capture_output=False)
+        
         # Nginx configuration
         nginx_file = os.path.join(src_deployment_dir, 'nginx.conf')
         if os.path.exists(nginx_file):
@@ -604,6 +625,8 @@ WantedBy=multi-user.target
         
         run_command(['sudo', 'systemctl', 'enable', 'creaturebox-web.service'], capture_output=False)
         run_command(['sudo', 'systemctl', 'start', 'creaturebox-web.service'], capture_output=False)
+        run_command(['sudo', 'systemctl', 'enable', 'creaturebox-capture.service'], capture_output=False)
+        run_command(['sudo', 'systemctl', 'start', 'creaturebox-capture.service'], capture_output=False)
         run_command(['sudo', 'systemctl', 'restart', 'nginx'], capture_output=False)
         
         # Create crontab example file
@@ -611,8 +634,8 @@ WantedBy=multi-user.target
         crontab_content = f"""# Example crontab entries for CreatureBox
 # To install: crontab -e
 
-# Take photo every hour
-0 * * * * {VENV_PATH}/bin/python {TARGET_DIR}/TakePhoto.py
+# Take photo every hour (through the capture daemon, falls back to TakePhoto.py)
+0 * * * * {VENV_PATH}/bin/python {TARGET_DIR}/TriggerCapture.py
 
 # Run scheduler at boot
 @reboot {VENV_PATH}/bin/python {TARGET_DIR}/Scheduler.py
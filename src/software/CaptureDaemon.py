@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+
+"""
+CaptureDaemon - keeps the camera open between photos
+
+Running TakePhoto.py from cron pays for interpreter start-up, importing
+cv2/PIL/picamera2, configuring the 64MP sensor and several seconds of sleeps
+on every single photo. This daemon does all of that once, then waits for
+triggers and takes each photo with the camera already warm.
+
+Trigger a photo with any of:
+-TriggerCapture.py (this is what cron should run)
+-kill -USR1 <pid of this daemon>
+-writing "capture" to the socket at /tmp/creaturebox-capture.sock
+
+It is normally run by the creaturebox-capture systemd service.
+"""
+
+from capture.daemon import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+
+"""
+DevelopRaw - turns raw captures into JPEGs
+
+Photos taken with ImageFileType 3 are saved as raw sensor data (.npz) so
+the night's capture loop stays short. This develops every raw file that
+has no JPEG yet, at the lowest CPU priority, so it can run during the day
+or after the night's session without getting in the way of anything.
+
+Usage:
+    DevelopRaw.py                    develop everything under the photos folder
+    DevelopRaw.py FOLDER ...         develop everything under these folders
+    DevelopRaw.py --remove-raw       delete each raw file once its JPEG is written
+    DevelopRaw.py --limit 50         stop after 50 files
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+from capture.config import PHOTOS_DIR, DEVELOP_NICENESS, LOG_FORMAT
+from capture.develop import develop_pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Develop raw captures into JPEGs")
+    parser.add_argument("folders", nargs="*", default=[PHOTOS_DIR],
+                        help="folders to search for raw files")
+    parser.add_argument("--remove-raw", action="store_true",
+                        help="delete raw files once developed")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="most files to develop in this run")
+    parser.add_argument("--nice", type=int, default=DEVELOP_NICENESS,
+                        help="CPU niceness to run at")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    os.nice(args.nice)
+
+    developed = develop_pending(args.folders, remove_raw=args.remove_raw, limit=args.limit)
+    print(f"Developed {len(developed)} raw file(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+"""
+TriggerCapture - asks the capture daemon to take a photo
+
+This is what cron runs instead of TakePhoto.py. It only uses the standard
+library so it starts almost instantly. If the daemon isn't running it falls
+back to running TakePhoto.py the old way so no photos are missed.
+
+Usage:
+    TriggerCapture.py             take a photo
+    TriggerCapture.py capture M   take a photo with capture strategy M (hdr, burst, 16mp, ...)
+    TriggerCapture.py calibrate   calibrate exposure and focus
+    TriggerCapture.py status      print the daemon status
+"""
+
+import os
+import sys
+import json
+import socket
+import subprocess
+
+from capture.config import SOCKET_PATH, SOCKET_TIMEOUT
+
+
+def send_command(command, socket_path=SOCKET_PATH, timeout=SOCKET_TIMEOUT):
+    """Send one command to the daemon and return its JSON reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((command + "\n").encode("utf-8"))
+        reply = sock.makefile("r", encoding="utf-8").readline()
+    return json.loads(reply)
+
+
+def run_takephoto(command):
+    """Fall back to a one-shot TakePhoto.py run."""
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    args = [sys.executable, os.path.join(script_dir, "TakePhoto.py")]
+    name, _, mode = command.partition(" ")
+    if name == "calibrate":
+        args.append("--calibrate")
+    elif mode:
+        args.extend(["--mode", mode])
+    return subprocess.run(args).returncode
+
+
+def main():
+    command = " ".join(sys.argv[1:]) or "capture"
+
+    try:
+        reply = send_command(command)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if command == "status":
+            print("Capture daemon is not running")
+            return 1
+        print("Capture daemon is not running, falling back to TakePhoto.py")
+        return run_takephoto(command)
+    except (OSError, ValueError) as e:
+        # Timed out or no reply: the daemon may still hold the camera, so
+        # don't fall back to TakePhoto.py
+        print(f"No reply from the capture daemon: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(reply, indent=2))
+    return 0 if reply.get("status") == "success" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
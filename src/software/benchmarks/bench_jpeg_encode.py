@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark JPEG saving for full-resolution frames.
+
+Compares the old PIL path (img.save(quality=96) with EXIF), a single
+cv2.imencode call, and the striped multi-core encoder used by
+capture.saving.save_array, at 16MP, 48MP and 64MP.
+
+Usage:
+    python3 benchmarks/bench_jpeg_encode.py [--repeat N] [--sizes 16,48,64]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture.config import JPEG_QUALITY, JPEG_ENCODE_WORKERS  # noqa: E402
+from capture.jpeg import encode_striped  # noqa: E402
+from capture.saving import build_exif, write_jpeg  # noqa: E402
+
+# Megapixels -> (width, height) of the sensor modes we ship with
+SIZES = {
+    16: (4656, 3496),
+    48: (8000, 6000),
+    64: (9248, 6944),
+}
+
+
+def make_frame(width, height):
+    """Synthetic frame with smooth structure and sensor-like noise."""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 32, width // 32, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-6, 7, (height, width, 1), dtype=np.int16)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def save_pil(frame, path, exif_bytes):
+    Image.fromarray(frame[:, :, ::-1]).save(path, exif=exif_bytes, quality=JPEG_QUALITY)
+
+
+def save_cv2(frame, path, exif_bytes):
+    ok, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    write_jpeg(path, jpeg, exif_bytes)
+
+
+def save_striped(frame, path, exif_bytes):
+    write_jpeg(path, encode_striped(frame, JPEG_QUALITY), exif_bytes)
+
+
+def best_time(func, frame, path, exif_bytes, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(frame, path, exif_bytes)
+        times.append(time.perf_counter() - start)
+    return min(times), os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JPEG saving")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per encoder (best is reported)")
+    parser.add_argument("--sizes", default="16,48,64", help="Comma-separated megapixel sizes")
+    args = parser.parse_args()
+
+    exif_bytes = build_exif(500, {"LensPosition": 6.4, "AnalogueGain": 1.5})
+    encoders = [("PIL save", save_pil), ("cv2 single", save_cv2), ("striped", save_striped)]
+
+    print(f"Encode workers: {JPEG_ENCODE_WORKERS}, quality {JPEG_QUALITY}")
+    print(f"{'size':>6} {'encoder':>12} {'seconds':>8} {'MB':>7} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for megapixels in (int(size) for size in args.sizes.split(",")):
+            width, height = SIZES[megapixels]
+            frame = make_frame(width, height)
+            baseline = None
+            for name, func in encoders:
+                path = os.path.join(tmp_dir, f"{megapixels}_{name.replace(' ', '_')}.jpg")
+                seconds, size = best_time(func, frame, path, exif_bytes, args.repeat)
+                baseline = baseline or seconds
+                print(f"{megapixels:>4}MP {name:>12} {seconds:>8.2f} {size / 1024**2:>7.1f} "
+                      f"{baseline / seconds:>7.2f}x")
+            frame = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Capture engine package initialization."""
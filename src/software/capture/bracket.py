@@ -0,0 +1,155 @@
+# src/software/capture/bracket.py
+"""HDR bracketing on a running camera.
+
+The old HDR loop stopped and restarted the camera and slept 0.3 s for every
+exposure so the new ExposureTime had "sunk in". Instead the camera keeps
+streaming: each exposure's controls are queued as soon as the previous
+target frame arrives, and frames are checked against the ExposureTime the
+sensor actually reports in the request metadata. Frames still in flight
+with the old exposure are simply released, and the flash is gated to the
+target frame by a FlashGate.
+"""
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import EXPOSURE_MATCH_TOLERANCE, EXPOSURE_MATCH_MIN_US, BRACKET_MAX_FRAMES
+from .flashgate import FlashGate
+
+logger = logging.getLogger(__name__)
+
+
+def exposure_matches(reported: int, target: int,
+                     tolerance: float = EXPOSURE_MATCH_TOLERANCE,
+                     min_us: int = EXPOSURE_MATCH_MIN_US) -> bool:
+    """Check whether a reported exposure is the one that was asked for.
+
+    The sensor quantizes exposure to whole lines, so the reported value is
+    only ever close to the requested one.
+
+    Args:
+        reported: ExposureTime from the request metadata
+        target: Requested ExposureTime
+        tolerance: Allowed relative difference
+        min_us: Allowed absolute difference in microseconds
+
+    Returns:
+        True if the frame was exposed for the target time
+    """
+    return abs(reported - target) <= max(min_us, target * tolerance)
+
+
+class BracketEngine:
+    """Captures an exposure bracket without stopping the camera."""
+
+    def __init__(self, picam2, flash_on: Callable[[], None], flash_off: Callable[[], None],
+                 max_frames: int = BRACKET_MAX_FRAMES):
+        """Initialize the engine.
+
+        Args:
+            picam2: Started Picamera2 instance
+            flash_on: Turns the flash on
+            flash_off: Turns the flash off (or leaves it on in only-flash mode)
+            max_frames: Frames to wait for each exposure before giving up
+                and using the latest frame
+        """
+        self.picam2 = picam2
+        self.flash_on = flash_on
+        self.flash_off = flash_off
+        self.max_frames = max_frames
+        self.timings = []
+
+    def clamp_exposures(self, exposure_times: List[int]) -> List[int]:
+        """Clamp exposure times to what the sensor supports.
+
+        Wide HDR brackets around a short exposure can go negative.
+        """
+        min_exp, max_exp, _ = self.picam2.camera_controls["ExposureTime"]
+        return [int(min(max(t, min_exp), max_exp)) for t in exposure_times]
+
+    def wait_for_exposure(self, target: int) -> int:
+        """Drop frames until the sensor reports the target exposure.
+
+        Returns:
+            Number of frames dropped
+        """
+        for frame_count in range(1, self.max_frames + 1):
+            request = self.picam2.capture_request()
+            try:
+                reported = request.get_metadata()["ExposureTime"]
+            finally:
+                request.release()
+            if exposure_matches(reported, target):
+                return frame_count
+
+        logger.warning(f"Exposure {target}us not reported after {self.max_frames} frames")
+        return self.max_frames
+
+    def capture(self, exposure_times: List[int],
+                make_frame: Callable[[Any], Any],
+                on_frame: Optional[Callable[[int, Any, Dict[str, Any]], None]] = None
+                ) -> List[Any]:
+        """Capture one frame per exposure time with the flash on.
+
+        For each exposure the controls are queued on the running camera and
+        unlit frames are dropped until the metadata shows the new exposure
+        is in effect. Only then is the flash gated onto the next frame, so
+        it is lit for little more than that frame's exposure and readout.
+
+        Args:
+            exposure_times: Exposure times in microseconds
+            make_frame: Turns a request into a frame (called before release)
+            on_frame: Called as on_frame(index, frame, metadata) as soon as
+                each target frame arrives; frames handed to it are not kept
+
+        Returns:
+            List of (frame, metadata) tuples for frames not passed to on_frame.
+            The timing of each exposure is left in self.timings.
+        """
+        targets = self.clamp_exposures(exposure_times)
+        frames = []
+        flash_time = 0
+        self.timings = []
+
+        start = time.time()
+        with FlashGate(self.picam2, self.flash_on, self.flash_off) as gate:
+            for index, target in enumerate(targets):
+                settle_start = time.time()
+                self.picam2.set_controls({"ExposureTime": target})
+                dropped = self.wait_for_exposure(target)
+
+                armed = time.time()
+                request = gate.capture(target)
+                captured = time.time()
+                flash_time += gate.flash_time
+
+                try:
+                    metadata = request.get_metadata()
+                    frame = make_frame(request)
+                finally:
+                    request.release()
+                # Not a libcamera value; it travels with the frame to the manifest
+                metadata["FlashTime"] = gate.flash_time
+                self.timings.append({
+                    "exposureTime": target,
+                    "reportedExposureTime": metadata["ExposureTime"],
+                    "droppedFrames": dropped,
+                    "settle": armed - settle_start,
+                    "armed": gate.lit_at - armed,
+                    "capture": captured - gate.lit_at,
+                    "flashTime": gate.flash_time,
+                    "frame": time.time() - captured,
+                })
+
+                if not exposure_matches(metadata["ExposureTime"], target):
+                    logger.warning(f"Exposure {target}us requested, got {metadata['ExposureTime']}us")
+                logger.info(f"Exposure {target}us captured after dropping {dropped} frame(s)")
+
+                if on_frame is not None:
+                    on_frame(index, frame, metadata)
+                else:
+                    frames.append((frame, metadata))
+
+        logger.info(f"Bracket of {len(targets)} took {time.time() - start:.3f}s, "
+                    f"flash on for {flash_time:.3f}s")
+        return frames
@@ -0,0 +1,150 @@
+# src/software/capture/buffers.py
+"""Preallocated frame buffers for full-resolution captures.
+
+A 9248x6944 RGB888 frame is about 190 MB. make_image() and make_array()
+allocate a fresh copy (or two, when the stride is padded) for every frame,
+so a bracket plus intermediates can push a 4 GB Pi 4 into swap. Instead,
+frames are copied once, straight out of the mapped request buffer, into a
+small pool of arrays that are allocated at start-up and reused forever.
+"""
+import queue
+import logging
+import resource
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FramePool:
+    """Fixed-size pool of reusable frame arrays.
+
+    acquire() blocks while every buffer is in use, so the pool also bounds
+    how many frames can be in flight between capture and disk.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], count: int, dtype=np.uint8):
+        """Allocate the pool.
+
+        Args:
+            shape: Array shape of one frame, e.g. (height, width, 3)
+            count: Number of frames in the pool
+            dtype: Array data type
+        """
+        self.shape = tuple(shape)
+        self.count = count
+        self.dtype = np.dtype(dtype)
+        self._free = queue.Queue()
+
+        for _ in range(count):
+            self._free.put(self._allocate())
+
+        logger.info(f"Allocated {count} frame buffers of {self.frame_bytes / 1024**2:.0f} MB")
+
+    def _allocate(self) -> np.ndarray:
+        """Allocate one buffer with every page resident.
+
+        np.zeros maps lazily zero-filled pages, so the first capture into it
+        would still fault in the whole frame. Filling it writes every page
+        now, and the pool's memory is resident from the start.
+        """
+        buffer = np.empty(self.shape, dtype=self.dtype)
+        buffer.fill(0)
+        return buffer
+
+    @property
+    def frame_bytes(self) -> int:
+        """Size of one buffer in bytes."""
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def acquire(self, timeout: Optional[float] = None) -> np.ndarray:
+        """Take a free buffer, waiting for one to be released if needed.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            A buffer from the pool
+
+        Raises:
+            queue.Empty: If no buffer was released within the timeout
+        """
+        return self._free.get(timeout=timeout)
+
+    def release(self, buffer: np.ndarray):
+        """Return a buffer to the pool.
+
+        Args:
+            buffer: Buffer previously returned by acquire()
+        """
+        self._free.put(buffer)
+
+    def ensure(self, count: int):
+        """Grow the pool to at least count buffers.
+
+        Args:
+            count: Number of buffers needed at once
+        """
+        while self.count < count:
+            self._free.put(self._allocate())
+            self.count += 1
+            logger.info(f"Frame pool grown to {self.count} buffers")
+
+    def copy_from_request(self, request, stream: str = "main") -> np.ndarray:
+        """Copy a stream out of a completed request into a pooled buffer.
+
+        The request buffer is mapped rather than copied with make_array(),
+        so the only copy is the one into the pool and no new memory is
+        allocated. The request can be released as soon as this returns.
+
+        Args:
+            request: Completed Picamera2 request
+            stream: Stream name
+
+        Returns:
+            Pooled buffer holding the frame (release it when done)
+        """
+        from picamera2 import MappedArray
+
+        buffer = self.acquire()
+        try:
+            with MappedArray(request, stream) as mapped:
+                height, width = self.shape[:2]
+                # Drop any stride padding on the right of each row
+                np.copyto(buffer, mapped.array[:height, :width])
+        except Exception:
+            self.release(buffer)
+            raise
+        return buffer
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter for this process.
+
+    Returns:
+        True if the counter was reset (Linux only)
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes.
+
+    This is the peak since the last reset_peak_rss() where supported,
+    otherwise since the process started.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
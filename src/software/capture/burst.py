@@ -0,0 +1,140 @@
+# src/software/capture/burst.py
+"""Burst capture that keeps only the best frames.
+
+Fast insects land and leave between scheduled photos. In burst mode the
+camera streams as fast as the still configuration allows for N frames
+under one flash. Each frame is scored straight from the mapped request
+buffer on a strided grayscale copy, either by sharpness or by how much it
+differs from the first frame. Only a frame that beats the current best K
+is copied into one of K preallocated pool buffers, replacing the weakest
+one. So a burst never holds more than K full-resolution frames, and only
+those K are encoded and written.
+"""
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .config import (
+    BURST_SCORE_SHARPNESS, BURST_SCORE_MOTION, BURST_SCORE_STEP
+)
+from .bracket import BracketEngine
+from .buffers import FramePool
+from .dedup import changed_fraction, frame_signature
+from .focus import sharpness
+
+logger = logging.getLogger(__name__)
+
+BURST_INDEX_PREFIX = "B"
+
+
+def burst_index(number: int) -> str:
+    """HDR index used in the file name of a burst frame, e.g. "B03"."""
+    return f"{BURST_INDEX_PREFIX}{number:02d}"
+
+
+class BurstEngine:
+    """Streams a burst and keeps the best-scoring frames."""
+
+    def __init__(self, picam2, pool: FramePool, flash_on: Callable[[], None],
+                 flash_off: Callable[[], None], score: int = BURST_SCORE_SHARPNESS,
+                 step: int = BURST_SCORE_STEP):
+        """Initialize the engine.
+
+        Args:
+            picam2: Started Picamera2 instance with an RGB888 main stream
+            pool: Pool the kept frames are copied into; it needs one buffer
+                per kept frame
+            flash_on: Turns the flash on
+            flash_off: Turns the flash off (or leaves it on in only-flash mode)
+            score: BURST_SCORE_SHARPNESS or BURST_SCORE_MOTION
+            step: Pixel stride of the scoring copy
+        """
+        self.picam2 = picam2
+        self.pool = pool
+        self.flash_on = flash_on
+        self.flash_off = flash_off
+        self.score = score
+        self.step = step
+        self._reference = None
+
+    def _score(self, frame: np.ndarray) -> float:
+        """Score a frame; higher is better."""
+        if self.score == BURST_SCORE_MOTION:
+            signature = frame_signature(frame)
+            if self._reference is None:
+                self._reference = signature
+            return changed_fraction(signature, self._reference)
+        if self.score == BURST_SCORE_SHARPNESS:
+            small = np.ascontiguousarray(frame[::self.step, ::self.step])
+            return sharpness(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        raise ValueError(f"Unknown burst score: {self.score}")
+
+    def capture(self, count: int, keep: int, exposure_time: Optional[int] = None
+                ) -> List[Tuple[int, np.ndarray, Dict[str, Any], float]]:
+        """Capture a burst and keep its best frames.
+
+        Args:
+            count: Frames in the burst
+            keep: Frames to keep
+            exposure_time: Exposure to switch to (and wait for) first
+
+        Returns:
+            (frame number, pooled frame, metadata, score) for the kept frames
+            in capture order; release the frames to the pool when written
+        """
+        from picamera2 import MappedArray
+
+        if exposure_time is not None:
+            bracket = BracketEngine(self.picam2, self.flash_on, self.flash_off)
+            exposure_time = bracket.clamp_exposures([exposure_time])[0]
+            self.picam2.set_controls({"ExposureTime": exposure_time})
+            bracket.wait_for_exposure(exposure_time)
+
+        self.pool.ensure(keep)
+        height, width = self.pool.shape[:2]
+        self._reference = None
+        kept = []
+        timestamps = []
+        copied = 0
+
+        start = time.time()
+        self.flash_on()
+        try:
+            for number in range(count):
+                # The first frame must start after the flash came on
+                request = self.picam2.capture_request(flush=number == 0)
+                try:
+                    metadata = request.get_metadata()
+                    timestamps.append(metadata.get("SensorTimestamp", 0))
+                    with MappedArray(request, "main") as mapped:
+                        frame = mapped.array[:height, :width]
+                        score = self._score(frame)
+                        weakest = min(kept, key=lambda k: k[3]) if len(kept) == keep else None
+                        if weakest is None or score > weakest[3]:
+                            # Score before copying: a losing frame is never copied
+                            if weakest is not None:
+                                kept.remove(weakest)
+                                self.pool.release(weakest[1])
+                            buffer = self.pool.acquire()
+                            np.copyto(buffer, frame)
+                            kept.append((number, buffer, metadata, score))
+                            copied += 1
+                finally:
+                    request.release()
+        finally:
+            self.flash_off()
+        elapsed = time.time() - start
+
+        kept.sort(key=lambda k: k[0])
+        intervals = np.diff(timestamps) / 1e9
+        frame_duration = metadata.get("FrameDuration", 0) / 1e6
+        # A gap of more than one frame duration means the sensor dropped frames
+        gaps = int(np.sum(intervals > 1.5 * frame_duration)) if frame_duration else 0
+        fps = len(intervals) / intervals.sum() if intervals.sum() > 0 else 0
+        logger.info(f"Burst of {count} at {fps:.1f} fps with {gaps} gap(s) in {elapsed:.2f}s, "
+                    f"copied {copied}, kept " +
+                    ", ".join(f"#{number} ({score:.3g})" for number, _, _, score in kept))
+        return kept
@@ -0,0 +1,153 @@
+# src/software/capture/calibration.py
+"""Calibration history so a recent calibration can be reused.
+
+Each calibration (lens position, exposure, gain) is stored with the time it
+ran and the temperatures it ran at. Focus drifts mainly with temperature and
+the flash-lit scene barely changes during a night, so when a stored result
+is recent enough and was taken at a similar temperature it is applied
+directly instead of running autofocus again.
+"""
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    CALIBRATION_CACHE_FILE, CALIBRATION_HISTORY_SIZE, CALIBRATION_MAX_AGE,
+    CALIBRATION_MAX_TEMP_DELTA, SOC_TEMPERATURE_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+# Values a calibration produces, as written to camera_settings.csv
+CALIBRATION_KEYS = ("LensPosition", "ExposureTime", "AnalogueGain")
+
+
+def read_soc_temperature(file_path: str = SOC_TEMPERATURE_FILE) -> Optional[float]:
+    """Read the SoC temperature in degrees Celsius.
+
+    Used as a stand-in for the enclosure temperature on sensors that don't
+    report SensorTemperature.
+
+    Returns:
+        Temperature, or None if it can't be read
+    """
+    try:
+        with open(file_path, "r") as f:
+            return int(f.read().strip()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+class CalibrationCache:
+    """Small JSON history of calibration results."""
+
+    def __init__(self, file_path: str = CALIBRATION_CACHE_FILE,
+                 max_entries: int = CALIBRATION_HISTORY_SIZE):
+        """Initialize the cache.
+
+        Args:
+            file_path: JSON file holding the history
+            max_entries: Entries kept; the oldest are dropped first
+        """
+        self.file_path = file_path
+        self.max_entries = max_entries
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Stored calibrations, oldest first."""
+        try:
+            with open(self.file_path, "r") as f:
+                return json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable calibration history {self.file_path}: {e}")
+            return []
+
+    def record(self, values: Dict[str, Any], sensor_temperature: Optional[float] = None,
+               soc_temperature: Optional[float] = None,
+               timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Store a calibration result.
+
+        Args:
+            values: LensPosition, ExposureTime and AnalogueGain
+            sensor_temperature: SensorTemperature from the camera metadata
+            soc_temperature: SoC temperature at calibration time
+            timestamp: Calibration time (default: now)
+
+        Returns:
+            The stored entry
+        """
+        entry = {key: values[key] for key in CALIBRATION_KEYS if key in values}
+        entry["timestamp"] = time.time() if timestamp is None else timestamp
+        entry["sensorTemperature"] = sensor_temperature
+        entry["socTemperature"] = soc_temperature
+
+        entries = self.entries()
+        entries.append(entry)
+        entries = entries[-self.max_entries:]
+
+        # Write and rename so a power cut never leaves a truncated file
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"entries": entries}, f, indent=2)
+        os.replace(temp_path, self.file_path)
+        return entry
+
+    @staticmethod
+    def _temperature_delta(entry: Dict[str, Any], sensor_temperature: Optional[float],
+                           soc_temperature: Optional[float]) -> Optional[float]:
+        """Temperature difference to an entry, preferring the sensor reading."""
+        if sensor_temperature is not None and entry.get("sensorTemperature") is not None:
+            return abs(entry["sensorTemperature"] - sensor_temperature)
+        if soc_temperature is not None and entry.get("socTemperature") is not None:
+            return abs(entry["socTemperature"] - soc_temperature)
+        return None
+
+    def lookup(self, sensor_temperature: Optional[float] = None,
+               soc_temperature: Optional[float] = None, now: Optional[float] = None,
+               max_age: float = CALIBRATION_MAX_AGE,
+               max_temp_delta: float = CALIBRATION_MAX_TEMP_DELTA) -> Optional[Dict[str, Any]]:
+        """Find a stored calibration that is still valid.
+
+        An entry is valid if it is at most max_age seconds old and was taken
+        within max_temp_delta degrees of the current temperature. Entries
+        without a comparable temperature are matched on age alone.
+
+        Args:
+            sensor_temperature: Current SensorTemperature, if known
+            soc_temperature: Current SoC temperature, if known
+            now: Current time (default: now)
+            max_age: Oldest usable entry in seconds
+            max_temp_delta: Largest usable temperature difference
+
+        Returns:
+            The closest-temperature valid entry (newest on ties), or None
+        """
+        if now is None:
+            now = time.time()
+
+        best = None
+        best_key = None
+        for entry in self.entries():
+            age = now - entry.get("timestamp", 0)
+            if age < 0 or age > max_age:
+                continue
+            if not all(key in entry for key in CALIBRATION_KEYS):
+                continue
+
+            delta = self._temperature_delta(entry, sensor_temperature, soc_temperature)
+            if delta is not None and delta > max_temp_delta:
+                continue
+
+            key = (delta if delta is not None else max_temp_delta, age)
+            if best_key is None or key < best_key:
+                best, best_key = entry, key
+
+        return best
+
+
+def calibration_values(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Camera settings stored in a calibration entry."""
+    return {key: entry[key] for key in CALIBRATION_KEYS}
@@ -0,0 +1,170 @@
+# src/software/capture/config.py
+"""Configuration for the CreatureBox capture engine."""
+import os
+
+# Base Paths (cron and systemd can't use relative paths)
+BASE_DIR = os.environ.get("MOTHBOX_HOME", "/home/pi/Desktop/Mothbox")
+PHOTOS_DIR = os.path.join(BASE_DIR, "photos")
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+
+# File Paths
+CAMERA_SETTINGS_FILE = os.path.join(BASE_DIR, "camera_settings.csv")
+SCHEDULE_SETTINGS_FILE = os.path.join(BASE_DIR, "schedule_settings.csv")
+CONTROLS_FILE = os.path.join(BASE_DIR, "controls.txt")
+CALIBRATION_CACHE_FILE = os.path.join(BASE_DIR, "calibration_history.json")
+SOC_TEMPERATURE_FILE = "/sys/class/thermal/thermal_zone0/temp"
+EXTERNAL_MEDIA_PATHS = ("/media", "/mnt")
+
+# Capture Daemon Settings
+SOCKET_PATH = os.environ.get("CREATUREBOX_CAPTURE_SOCKET", "/tmp/creaturebox-capture.sock")
+SOCKET_TIMEOUT = 120  # seconds a trigger client waits for a capture to finish
+SETTINGS_POLL_INTERVAL = 30  # seconds between checks for changed settings while idle
+
+# Storage Limits (Gigabytes, below 4 on a raspberry pi 4 can make weird OS problems)
+INTERNAL_STORAGE_MINIMUM = 5
+PHOTO_STORAGE_MINIMUM = INTERNAL_STORAGE_MINIMUM - 1
+
+# Relay Pins (BCM numbering)
+RELAY_FLASH = 20
+RELAY_ATTRACT = 21
+
+# Sensor Resolution
+PI4_RESOLUTION = (9000, 6000)  # the Pi4 can't really handle the FULL resolution
+PI5_RESOLUTION = (9248, 6944)
+PREVIEW_RESOLUTION = (1920 * 2, 1080 * 2)
+
+# Camera Defaults
+# To actually 100% lock down AWB you need to set ColourGains
+COLOUR_GAINS = (2.25943877696990967, 1.500129925489425659)
+DEFAULT_HDR_COUNT = 3
+DEFAULT_HDR_WIDTH = 18000
+
+# Focus Sweep (small, fast sensor mode scored on the lores stream)
+FOCUS_RESOLUTION = (1280, 720)
+FOCUS_LORES_RESOLUTION = (640, 360)
+FOCUS_FRAME_DURATION_LIMITS = (8333, 33333)  # microseconds; up to 120 fps
+FOCUS_ROI = (0.25, 0.25, 0.5, 0.5)  # x, y, width, height as fractions of the frame
+FOCUS_COARSE_STEP = 0.5  # dioptres
+FOCUS_FINE_STEP = 0.1
+FOCUS_SEARCH_RANGE = 2.0  # dioptres either side of the last calibrated position
+FOCUS_LENS_TOLERANCE = 0.05  # reported LensPosition counts as arrived
+FOCUS_MAX_FRAMES = 6  # frames to wait for the lens at each step
+FOCUS_MIN_PEAK_RATIO = 1.5  # sharpest step vs weakest step for a real peak
+
+# Presence Trigger (PresenceTrigger=True in controls.txt)
+PRESENCE_RESOLUTION = (640, 480)
+PRESENCE_LORES_RESOLUTION = (320, 240)
+PRESENCE_FRAME_DURATION = 200000  # microseconds; 5 fps is plenty for insects
+PRESENCE_LEARNING_RATE = 0.05  # weight of each frame in the background
+PRESENCE_PIXEL_THRESHOLD = 25  # grey levels that count as a change
+PRESENCE_MIN_AREA = 0.002  # changed fraction of the frame that triggers
+PRESENCE_MIN_BLOBS = 2  # changed blobs that trigger
+PRESENCE_BLOB_MIN_PIXELS = 12  # smaller blobs are noise
+PRESENCE_MIN_INTERVAL = 60  # seconds between triggered photos
+PRESENCE_MAX_INTERVAL = 900  # a photo is taken at least this often
+
+# Calibration Cache (a stored calibration is reused while it is still valid)
+CALIBRATION_HISTORY_SIZE = 50  # entries kept in the history file
+CALIBRATION_MAX_AGE = 12 * 3600  # seconds; older entries are stale
+CALIBRATION_MAX_TEMP_DELTA = 3.0  # degrees C between calibration and now
+
+# HDR Bracketing (frames are matched on the ExposureTime the sensor reports)
+EXPOSURE_MATCH_TOLERANCE = 0.02  # relative difference from the requested exposure
+EXPOSURE_MATCH_MIN_US = 100  # absolute difference always accepted (line quantization)
+BRACKET_MAX_FRAMES = 8  # frames to wait for new controls before giving up
+
+# Flash Gating (the relay is timed from the sensor's frame timestamps)
+FLASH_LEAD_US = 2000  # switch the relay on this long before the exposure starts
+FLASH_RELAY_LATENCY_US = 1000  # time the relay takes to close
+FLASH_GATE_TIMEOUT = 2.0  # seconds to wait for a frame to time the flash from
+FLASH_GATE_RETRIES = 2  # re-arm this often if the lit frame was missed
+
+# Multi-Camera Capture (cameras free-run, frames are paired by SensorTimestamp)
+MULTICAM_MAX_SKEW_US = 5000  # try a later frame when the set is further apart
+MULTICAM_MAX_RETRIES = 2  # extra frames per camera while pairing
+
+# HDR Merge (HDRMerge setting in camera_settings.csv)
+HDR_MERGE_OFF = 0  # save every exposure
+HDR_MERGE_FUSED = 1  # save only the fused frame
+HDR_MERGE_KEEP_MIDDLE = 2  # save the fused frame and the middle exposure
+FUSION_LEVELS = 6  # pyramid levels, fixed so strips blend identically
+FUSION_STRIP_HEIGHT = 256  # output rows fused at a time
+FUSION_OVERLAP = 128  # rows of context above and below each strip
+
+# Output Settings
+JPEG_QUALITY = 96
+SAVE_WORKERS = 2  # encode/write threads; each holds one full frame while saving
+SAVE_QUEUE_SIZE = 1  # frames waiting for a worker before the capture loop blocks
+FRAME_POOL_SIZE = 2  # preallocated full-resolution frame buffers
+JPEG_ENCODE_WORKERS = os.cpu_count() or 1  # threads encoding strips of one frame
+JPEG_STRIPED_MIN_PIXELS = 4000000  # smaller frames are encoded in one piece
+
+# Burst Capture (Burst setting in camera_settings.csv)
+BURST_SCORE_SHARPNESS = 0  # keep the sharpest frames (BurstScore setting)
+BURST_SCORE_MOTION = 1  # keep the frames that differ most from the first one
+DEFAULT_BURST_KEEP = 2  # frames written per burst (BurstKeep setting)
+BURST_BUFFER_COUNT = 2  # camera buffers, so the sensor streams while a frame is scored
+BURST_SCORE_STEP = 4  # frames are scored on every 4th pixel of every 4th row
+DEFAULT_BURST_COUNT = 10  # frames per burst when burst mode is asked for without a Burst setting
+
+# Capture Strategies (CaptureMode setting in camera_settings.csv)
+CAPTURE_MODE_AUTO = "auto"  # burst, HDR or a single photo, from the Burst and HDR settings
+SIXTEEN_MP_RESOLUTION = (4920, 3264)
+STEREO_RESOLUTION = (4624, 3472)  # two full-size streams crash a Pi 5
+STEREO_CAMERAS = (0, 1)
+
+# Raw Capture (ImageFileType 3 saves the Bayer data for later development)
+IMAGE_FILE_RAW = 3
+RAW_MAIN_RESOLUTION = (1280, 960)  # the ISP output isn't saved, so keep it small
+RAW_COMPRESS_LEVEL = 1  # zlib level; 0 stores uncompressed
+DEVELOP_GAMMA = 2.2
+DEVELOP_STRIP_HEIGHT = 512  # rows developed at a time (keeps float buffers small)
+DEVELOP_NICENESS = 19  # the development job runs at the lowest CPU priority
+
+# Duplicate Suppression (SkipDuplicates setting in camera_settings.csv)
+DEDUP_SIGNATURE_WIDTH = 256  # pixels; a moth is still several pixels wide
+DEDUP_PIXEL_THRESHOLD = 12  # grey levels that count as a change
+DEDUP_MAX_CHANGED = 0.0005  # changed fraction still treated as the same scene
+DEDUP_PROXY_WIDTH = 1280
+DEDUP_PROXY_QUALITY = 85
+
+# Storage Planner (NextServiceDate setting; keeps the disk from filling before the visit)
+PLANNER_HISTORY = 50  # recent captures the bytes per frame and photo interval are measured over
+PLANNER_PHOTO_INTERVAL = 60  # seconds between photos until the metrics log shows the real one
+PLANNER_MAX_SESSION_GAP = 3600  # gaps between captures longer than this are between sessions
+PLANNER_MARGIN = 1.2  # projected usage has to fit the free space with this much to spare
+# Tried in order until the rest of the schedule fits:
+# (JPEG quality, still resolution (None: full), most exposures per photo (None: all))
+PLANNER_LEVELS = (
+    (JPEG_QUALITY, None, None),
+    (90, None, None),
+    (85, None, None),
+    (85, None, 1),
+    (80, SIXTEEN_MP_RESOLUTION, 1),
+    (70, SIXTEEN_MP_RESOLUTION, 1),
+)
+# Rough size of a JPEG at each quality relative to one at quality 96
+JPEG_RELATIVE_SIZE = {96: 1.0, 90: 0.65, 85: 0.52, 80: 0.44, 75: 0.39, 70: 0.35}
+
+# Renditions (small JPEGs written next to each photo for the web gallery)
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+PREVIEW_SUFFIX = ".preview.jpg"
+THUMBNAIL_SIZE = 200  # square, centre-cropped like the gallery's own thumbnails
+PREVIEW_WIDTH = 1600
+RENDITION_QUALITY = 85
+# Thumbnail embedded in each JPEG's EXIF block (1st IFD), read by the gallery
+# and file browsers without decoding the photo
+EXIF_THUMBNAIL_WIDTH = 320
+EXIF_THUMBNAIL_QUALITY = 75
+
+DEVICE_MAKE = "MothboxV4"
+CAMERA_MAKE = "Arducam64mp"
+
+# Capture Metrics (one JSON line per capture, read by the web API)
+METRICS_FILE = os.path.join(LOG_DIR, "capture_metrics.jsonl")
+METRICS_MAX_BYTES = 5 * 1024**2  # rotated to METRICS_FILE.1 beyond this
+
+# Logging Configuration
+LOG_LEVEL = "INFO"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FILE = os.path.join(LOG_DIR, 'capture_daemon.log')
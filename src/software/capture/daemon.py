@@ -0,0 +1,240 @@
+# src/software/capture/daemon.py
+"""Capture daemon that keeps the camera warm and takes photos on demand.
+
+Triggers arrive over a local Unix socket (one command per line, one JSON
+reply per line) or as SIGUSR1. With PresenceTrigger=True in controls.txt the
+daemon also watches a lores stream between photos and takes one when the
+sheet changes (see capture.presence). Commands:
+
+    capture    take a photo with the current settings
+    capture M  take a photo with capture strategy M (hdr, burst, 16mp, ...)
+    calibrate  run exposure/focus calibration now
+    status     report daemon state
+    shutdown   stop the daemon
+"""
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+import socketserver
+from typing import Dict, Any, Optional
+
+from .config import (
+    SOCKET_PATH, CONTROLS_FILE, LOG_DIR, LOG_FILE, LOG_FORMAT, LOG_LEVEL,
+    SETTINGS_POLL_INTERVAL
+)
+from .engine import CaptureEngine
+from .presence import PresenceTrigger
+from .settings import CaptureSettings
+
+logger = logging.getLogger(__name__)
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Reads one command line and writes one JSON reply."""
+
+    def handle(self):
+        line = self.rfile.readline().decode("utf-8").strip()
+        response = self.server.daemon.handle_command(line)
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class _CommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server with a reference back to the daemon."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        super().__init__(socket_path, _CommandHandler)
+
+
+class CaptureDaemon:
+    """Long-lived capture service around a CaptureEngine."""
+
+    def __init__(self, socket_path: str = SOCKET_PATH, controls_path: str = CONTROLS_FILE):
+        """Initialize the daemon.
+
+        Args:
+            socket_path: Unix socket to listen on
+            controls_path: Path to controls.txt
+        """
+        self.socket_path = socket_path
+        self.engine = CaptureEngine(controls_path, source="daemon")
+        self.presence = PresenceTrigger()
+        self._server = None
+        self._server_thread = None
+
+        # The socket server runs commands on its own threads; one camera
+        # session and frame pool can only serve one of them at a time
+        self._camera_lock = threading.RLock()
+        self._trigger = threading.Event()
+        self._stopping = threading.Event()
+        self._started_at = None
+        self._captures = 0
+        self._last_capture = None
+
+    @property
+    def settings(self) -> CaptureSettings:
+        """Current capture settings."""
+        return self.engine.settings
+
+    def start(self):
+        """Open the camera and start listening for triggers."""
+        self.engine.open()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = _CommandServer(self.socket_path, self)
+        os.chmod(self.socket_path, 0o666)  # cron and the web server run as other users
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="CaptureDaemon-Socket",
+            daemon=True
+        )
+        self._server_thread.start()
+
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self._trigger.set())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stopping.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: self._stopping.set())
+
+        self._started_at = time.time()
+        logger.info(f"Capture daemon listening on {self.socket_path}")
+
+    def run(self):
+        """Serve SIGUSR1 triggers (and the presence trigger) until asked to stop."""
+        settings_checked = time.time()
+        watching = False
+        try:
+            while not self._stopping.is_set():
+                try:
+                    if self._trigger.is_set():
+                        self._trigger.clear()
+                        self.capture()
+                    elif self.settings.presence_trigger:
+                        if not watching:
+                            logger.info("Presence trigger on")
+                            self.presence.reset()
+                        self._watch_presence()
+                    else:
+                        self._trigger.wait(timeout=1.0)
+                    watching = self.settings.presence_trigger
+
+                    # Notice PresenceTrigger being switched in controls.txt between photos
+                    if time.time() - settings_checked > SETTINGS_POLL_INTERVAL:
+                        settings_checked = time.time()
+                        with self._camera_lock:
+                            self.engine.reload_settings()
+                except Exception:
+                    # One bad photo or settings file mustn't stop the daemon
+                    logger.exception("Error in capture loop")
+                    self._stopping.wait(timeout=1.0)
+        finally:
+            self.stop()
+
+    def _watch_presence(self):
+        """Check one lores frame and take a photo if the sheet changed."""
+        # Held through the triggered photo so a socket capture can't switch
+        # the session to the still mode in between
+        with self._camera_lock:
+            reason = self.presence.update(self.engine.session().watch_frame())
+            if reason:
+                logger.info(f"Presence trigger: {reason}")
+                self.capture()
+
+    def stop(self):
+        """Stop listening and close the camera."""
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        self.engine.close()
+        logger.info("Capture daemon stopped")
+
+    def handle_command(self, command: str) -> Dict[str, Any]:
+        """Run a socket command.
+
+        Args:
+            command: Command name, optionally followed by an argument
+                ("capture hdr")
+
+        Returns:
+            JSON-serializable reply
+        """
+        name, _, argument = command.partition(" ")
+        argument = argument.strip() or None
+        try:
+            if name == "capture":
+                return self.capture(argument)
+            elif name == "calibrate":
+                return self.calibrate()
+            elif name == "status":
+                return self.status()
+            elif name == "shutdown":
+                self._stopping.set()
+                return {"status": "success", "message": "Shutting down"}
+            return {"status": "error", "error": f"Unknown command: {command}"}
+        except Exception as e:
+            logger.exception(f"Error running command {command}")
+            return {"status": "error", "error": str(e)}
+
+    def status(self) -> Dict[str, Any]:
+        """Report daemon state."""
+        return {
+            "status": "success",
+            "pid": os.getpid(),
+            "uptime": time.time() - self._started_at if self._started_at else 0,
+            "captures": self._captures,
+            "lastCapture": self._last_capture,
+            "captureMode": self.settings.capture_mode if self.settings else None,
+            "presenceTrigger": bool(self.settings and self.settings.presence_trigger),
+        }
+
+    def calibrate(self) -> Dict[str, Any]:
+        """Calibrate in-process and store the results."""
+        with self._camera_lock:
+            return {"status": "success", "data": self.engine.calibrate()}
+
+    def capture(self, mode: Optional[str] = None) -> Dict[str, Any]:
+        """Take a photo with the warm camera and save it.
+
+        Args:
+            mode: Capture strategy (default: the CaptureMode setting)
+        """
+        with self._camera_lock:
+            try:
+                result = self.engine.capture(mode)
+            finally:
+                # Any photo, from the socket or the main loop, takes the session
+                # out of the presence mode; start a new background afterwards
+                self.presence.reset()
+            if result["status"] == "success":
+                self._captures += 1
+                self._last_capture = time.time()
+        return result
+
+
+def setup_logging():
+    """Log to the capture log file and stderr (journald)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, LOG_LEVEL))
+    for handler in (logging.FileHandler(LOG_FILE), logging.StreamHandler(sys.stderr)):
+        handler.setFormatter(formatter)
+        root_logger.addHandler(handler)
+
+
+def main():
+    """Run the capture daemon until SIGTERM or a shutdown command."""
+    setup_logging()
+    daemon = CaptureDaemon()
+    daemon.start()
+    daemon.run()
@@ -0,0 +1,193 @@
+# src/software/capture/dedup.py
+"""Near-duplicate suppression in the save stage.
+
+On a quiet night most photos show the same empty sheet. Before a frame is
+written, a small grayscale signature is compared with the last frame that
+was kept for the same HDR index. If too few pixels changed, only a small
+proxy JPEG is written instead of the full-size file.
+
+State lives in the dated folder, so it carries across TakePhoto.py runs and
+daemon restarts, and every night gets its own dedup_summary.json with
+frames kept and skipped and the bytes saved.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Union
+
+import cv2
+import numpy as np
+
+from .config import (
+    DEDUP_SIGNATURE_WIDTH, DEDUP_PIXEL_THRESHOLD, DEDUP_MAX_CHANGED,
+    DEDUP_PROXY_WIDTH, DEDUP_PROXY_QUALITY
+)
+from .saving import write_jpeg
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_FILE = ".dedup_reference.npz"
+SUMMARY_FILE = "dedup_summary.json"
+PROXY_SUFFIX = ".proxy.jpg"
+
+
+def frame_signature(frame, width: int = DEDUP_SIGNATURE_WIDTH) -> np.ndarray:
+    """Small grayscale version of a frame used for comparisons.
+
+    Args:
+        frame: HxWx3 BGR array (or a PIL image)
+        width: Signature width; height keeps the aspect ratio
+
+    Returns:
+        2D uint8 array
+    """
+    frame = np.asarray(frame)
+    # Striding first keeps INTER_AREA from reading the whole 190 MB frame
+    step = max(1, frame.shape[1] // (width * 4))
+    small = frame[::step, ::step]
+    height = max(1, round(small.shape[0] * width / small.shape[1]))
+    small = cv2.resize(small, (width, height), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (3, 3), 0)
+
+
+def changed_fraction(signature: np.ndarray, reference: np.ndarray,
+                     pixel_threshold: int = DEDUP_PIXEL_THRESHOLD) -> float:
+    """Fraction of signature pixels that differ from the reference."""
+    if signature.shape != reference.shape:
+        return 1.0
+    diff = cv2.absdiff(signature, reference)
+    return float(np.count_nonzero(diff > pixel_threshold)) / diff.size
+
+
+def proxy_path(file_path: str) -> str:
+    """Path of the proxy written in place of a skipped frame."""
+    return os.path.splitext(file_path)[0] + PROXY_SUFFIX
+
+
+def save_proxy(frame, file_path: str, exif_bytes: bytes,
+               width: int = DEDUP_PROXY_WIDTH, quality: int = DEDUP_PROXY_QUALITY):
+    """Write a downscaled JPEG of a frame with its EXIF block.
+
+    Args:
+        frame: HxWx3 BGR array (or a PIL image)
+        file_path: Destination path
+        exif_bytes: EXIF block from build_exif
+        width: Proxy width in pixels
+        quality: JPEG quality
+    """
+    frame = np.asarray(frame)
+    height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", small, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise IOError(f"Failed to encode proxy {file_path}")
+    write_jpeg(file_path, jpeg, exif_bytes)
+
+
+class DuplicateFilter:
+    """Decides per frame whether to write it in full or only as a proxy."""
+
+    def __init__(self, max_changed: float = DEDUP_MAX_CHANGED):
+        """Initialize the filter.
+
+        Args:
+            max_changed: Largest changed fraction still treated as a duplicate
+        """
+        self.max_changed = max_changed
+        self._lock = threading.Lock()
+        self._folder = None
+        self._references = {}
+        self._summary = None
+
+    def _load_folder(self, folder: str):
+        """Switch to the state of another night's folder."""
+        if folder == self._folder:
+            return
+        self._folder = folder
+        self._references = {}
+        self._summary = {"kept": 0, "skipped": 0, "keptBytes": 0, "proxyBytes": 0,
+                         "estimatedBytesSaved": 0}
+
+        try:
+            with np.load(os.path.join(folder, REFERENCE_FILE)) as data:
+                self._references = {key: data[key] for key in data.files}
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(os.path.join(folder, SUMMARY_FILE), "r") as f:
+                self._summary.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def _store(self):
+        """Write the reference signatures and summary for the current night."""
+        reference_path = os.path.join(self._folder, REFERENCE_FILE)
+        # np.savez appends .npz to names without it, so keep the suffix last
+        temp_path = reference_path + ".tmp.npz"
+        np.savez(temp_path, **self._references)
+        os.replace(temp_path, reference_path)
+
+        summary_path = os.path.join(self._folder, SUMMARY_FILE)
+        with open(summary_path + ".tmp", "w") as f:
+            json.dump(self._summary, f, indent=2)
+        os.replace(summary_path + ".tmp", summary_path)
+
+    def summary(self, folder: str) -> Dict[str, Any]:
+        """Per-night counts for a dated folder."""
+        with self._lock:
+            self._load_folder(folder)
+            return dict(self._summary)
+
+    def save(self, frame, file_path: str, exif_bytes: bytes, key: Union[int, str],
+             save_func: Callable) -> str:
+        """Save a frame in full, or as a proxy if it matches the last kept one.
+
+        Args:
+            frame: Frame to save
+            file_path: Full-size destination path
+            exif_bytes: EXIF block from build_exif
+            key: Frames are only compared with earlier frames of the same
+                key, e.g. the HDR index
+            save_func: Writes the full-size frame, as in SavePipeline
+
+        Returns:
+            Path that was written
+        """
+        signature = frame_signature(frame)
+        key = str(key)
+        folder = os.path.dirname(file_path)
+
+        with self._lock:
+            self._load_folder(folder)
+            reference = self._references.get(key)
+            changed = 1.0 if reference is None else changed_fraction(signature, reference)
+            duplicate = changed <= self.max_changed
+
+        if duplicate:
+            written = proxy_path(file_path)
+            save_proxy(frame, written, exif_bytes)
+        else:
+            written = file_path
+            save_func(frame, file_path, exif_bytes)
+        size = os.path.getsize(written)
+
+        with self._lock:
+            self._load_folder(folder)
+            summary = self._summary
+            if duplicate:
+                summary["skipped"] += 1
+                summary["proxyBytes"] += size
+                average_kept = summary["keptBytes"] / max(1, summary["kept"])
+                summary["estimatedBytesSaved"] += max(0, int(average_kept) - size)
+            else:
+                summary["kept"] += 1
+                summary["keptBytes"] += size
+                self._references[key] = signature
+            self._store()
+
+        if duplicate:
+            logger.info(f"Near-duplicate ({changed:.3%} changed), kept proxy {written}")
+        return written
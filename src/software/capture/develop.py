@@ -0,0 +1,164 @@
+# src/software/capture/develop.py
+"""Deferred development of raw captures.
+
+Turns the .npz files written in raw mode into JPEGs: black level,
+demosaic, the white balance (ColourGains) and colour matrix the camera
+used, gamma, then the usual striped JPEG encode with the original EXIF.
+It is meant to run as a low-priority batch job during the day or after
+the night's session, not in the capture path. Frames are developed in
+strips so a 64MP frame never needs more than one float strip in memory.
+"""
+import os
+import logging
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from .config import DEVELOP_GAMMA, DEVELOP_STRIP_HEIGHT
+from .raw import RawFrame, load_raw
+from .manifest import append_manifest
+from .renditions import save_renditions, embed_exif_thumbnail
+from .saving import save_array
+
+logger = logging.getLogger(__name__)
+
+RAW_EXTENSION = ".npz"
+
+_DEMOSAIC = {
+    "RGGB": cv2.COLOR_BayerRGGB2BGR,
+    "BGGR": cv2.COLOR_BayerBGGR2BGR,
+    "GRBG": cv2.COLOR_BayerGRBG2BGR,
+    "GBRG": cv2.COLOR_BayerGBRG2BGR,
+}
+
+# Rows of context either side of a strip; even, so the Bayer phase is kept
+_MARGIN = 2
+
+
+def gamma_table(gamma: float = DEVELOP_GAMMA) -> np.ndarray:
+    """Lookup table from 16-bit linear values to 8-bit gamma-encoded ones."""
+    linear = np.linspace(0.0, 1.0, 65536)
+    return np.round(255 * linear ** (1 / gamma)).astype(np.uint8)
+
+
+def _colour_transform(info) -> np.ndarray:
+    """3x3 BGR transform combining the colour gains and colour matrix."""
+    red_gain, blue_gain = info.get("colourGains") or (1.0, 1.0)
+    transform = np.diag([blue_gain, 1.0, red_gain])
+    if len(info.get("colourMatrix") or ()) == 9:
+        # The matrix is given for RGB; reverse rows and columns for BGR
+        matrix = np.array(info["colourMatrix"], dtype=np.float64).reshape(3, 3)
+        transform = matrix[::-1, ::-1] @ transform
+    return transform.astype(np.float32)
+
+
+def develop(frame: RawFrame, gamma: float = DEVELOP_GAMMA,
+            strip_height: int = DEVELOP_STRIP_HEIGHT) -> np.ndarray:
+    """Develop a raw frame into an 8-bit BGR image.
+
+    Args:
+        frame: Raw frame from load_raw
+        gamma: Display gamma
+        strip_height: Rows developed at a time
+
+    Returns:
+        HxWx3 uint8 array in BGR order, ready for save_array
+    """
+    info = frame.info
+    data = frame.data
+    height, width = data.shape
+    code = _DEMOSAIC[info["bayerOrder"]]
+    # Samples are scaled to 16 bits, which is how black levels are reported
+    scale = float(1 << (16 - info["bitDepth"]))
+    black = float(np.mean(info.get("blackLevels") or [0]))
+    transform = _colour_transform(info)
+    table = gamma_table(gamma)
+
+    strip_height -= strip_height % 2
+    output = np.empty((height, width, 3), dtype=np.uint8)
+    for top in range(0, height, strip_height):
+        bottom = min(height, top + strip_height)
+        context_top = max(0, top - _MARGIN)
+        context_bottom = min(height, bottom + _MARGIN)
+
+        bgr = cv2.cvtColor(data[context_top:context_bottom], code)
+        bgr = bgr[top - context_top:bottom - context_top].astype(np.float32)
+        bgr = (bgr * scale - black) * (65535 / (65535 - black))
+        bgr = cv2.transform(bgr, transform)
+        np.clip(bgr, 0, 65535, out=bgr)
+        output[top:bottom] = table[bgr.astype(np.uint16)]
+    return output
+
+
+def developed_path(raw_path: str) -> str:
+    """Path of the JPEG developed from a raw file."""
+    return os.path.splitext(raw_path)[0] + ".jpg"
+
+
+def develop_file(raw_path: str, output_path: Optional[str] = None,
+                 remove_raw: bool = False) -> str:
+    """Develop one raw file to a JPEG next to it.
+
+    Args:
+        raw_path: .npz written in raw mode
+        output_path: Destination (default: same name with .jpg)
+        remove_raw: Delete the raw file once the JPEG is written
+
+    Returns:
+        Path of the JPEG
+    """
+    output_path = output_path or developed_path(raw_path)
+    frame = load_raw(raw_path)
+    image = develop(frame)
+    exif_bytes = frame.exif_bytes
+    try:
+        exif_bytes = embed_exif_thumbnail(exif_bytes, image)
+    except Exception as e:
+        logger.error(f"Error embedding EXIF thumbnail in {output_path}: {str(e)}")
+    save_array(image, output_path, exif_bytes)
+    save_renditions(image, output_path, frame.exif_bytes)
+    append_manifest(output_path, frame.info.get("metadata", {}),
+                    {"developedFrom": os.path.basename(raw_path)})
+    if remove_raw:
+        os.remove(raw_path)
+    logger.info(f"Developed {raw_path} -> {output_path}")
+    return output_path
+
+
+def pending_raw_files(folder: str) -> List[str]:
+    """Raw files under a folder that have no developed JPEG yet, oldest first."""
+    pending = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            # Dotfiles are state such as the dedup reference signatures
+            if name.startswith(".") or not name.endswith(RAW_EXTENSION):
+                continue
+            path = os.path.join(root, name)
+            if not os.path.exists(developed_path(path)):
+                pending.append(path)
+    return sorted(pending, key=os.path.getmtime)
+
+
+def develop_pending(folders: Sequence[str], remove_raw: bool = False,
+                    limit: Optional[int] = None) -> List[str]:
+    """Develop every raw file that hasn't been developed yet.
+
+    Args:
+        folders: Folders to search recursively
+        remove_raw: Delete raw files once developed
+        limit: Most files to develop in this run
+
+    Returns:
+        Paths of the JPEGs written
+    """
+    developed = []
+    for folder in folders:
+        for raw_path in pending_raw_files(folder):
+            if limit is not None and len(developed) >= limit:
+                return developed
+            try:
+                developed.append(develop_file(raw_path, remove_raw=remove_raw))
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not develop {raw_path}: {e}")
+    return developed
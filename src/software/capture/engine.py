@@ -0,0 +1,375 @@
+# src/software/capture/engine.py
+"""Capture engine shared by TakePhoto.py, the TakePhoto_* scripts and the daemon.
+
+The engine owns one settings parser, one flash controller, one save
+pipeline and one warm CameraSession per camera. Which photo is taken is up
+to a capture strategy (see capture.strategies), picked by name or by the
+CaptureMode setting. Switching strategy never reopens a camera: strategies
+that share a resolution share the still mode as it is, and a different
+resolution or buffer count only reconfigures the still mode.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .config import (
+    BASE_DIR, CONTROLS_FILE, PHOTOS_DIR, PHOTO_STORAGE_MINIMUM, FRAME_POOL_SIZE
+)
+from .buffers import FramePool, peak_rss, reset_peak_rss
+from .calibration import CalibrationCache, calibration_values, read_soc_temperature
+from .metrics import CaptureMetrics
+from .pipeline import SavePipeline
+from .planner import StoragePlan, StoragePlanner
+from .saving import photo_path, build_exif, save_array
+from .settings import (
+    CaptureSettings, create_dated_folder, find_camera_settings_file,
+    get_storage_info, set_last_calibration, update_camera_settings
+)
+from .strategies import CaptureStrategy, select_strategy
+
+logger = logging.getLogger(__name__)
+
+
+class Shot:
+    """One photo being taken: where its frames go and how they are saved."""
+
+    def __init__(self, engine: "CaptureEngine", strategy: CaptureStrategy,
+                 metrics: CaptureMetrics, folder: str, timestamp: str, device_name: str):
+        """Initialize the shot.
+
+        Args:
+            engine: Engine taking the photo
+            strategy: Strategy taking the photo
+            metrics: Capture record for the photo
+            folder: Dated folder the frames are saved to
+            timestamp: Capture timestamp (YYYY_MM_DD__HH_MM_SS)
+            device_name: Name the files start with
+        """
+        self.engine = engine
+        self.strategy = strategy
+        self.metrics = metrics
+        self.folder = folder
+        self.timestamp = timestamp
+        self.device_name = device_name
+        self._sessions = {}
+
+    def session(self, camera_num: int = 0):
+        """Camera session in the still mode the strategy asked for."""
+        if camera_num not in self._sessions:
+            self._sessions[camera_num] = self.engine.session(camera_num, self.strategy)
+        return self._sessions[camera_num]
+
+    def save(self, index, frame, metadata: Dict[str, Any], exposure_time: int,
+             camera: int = 0, pooled: bool = True, dedup: bool = True):
+        """Queue a frame for saving.
+
+        Args:
+            index: HDR index used in the file name
+            frame: Frame from the camera session
+            metadata: Request metadata of the frame
+            exposure_time: Exposure time written to the EXIF block
+            camera: Position of the camera in the strategy's cameras
+            pooled: Whether pooled frames are released back to the session's
+                frame pool once written
+            dedup: Whether the SkipDuplicates setting applies to the frame
+        """
+        settings = self.engine.settings
+        session = self.session(self.strategy.cameras[camera])
+        file_path = photo_path(self.folder, self.device_name, self.timestamp, index,
+                               settings.image_file_type, camera=camera)
+        exif_bytes = build_exif(exposure_time, settings.controls)
+
+        # Raw frames aren't pooled, and can't be compared until developed
+        raw = session.raw_capture
+        on_done = session.frame_pool.release if pooled and not raw and session.frame_pool else None
+        dedup_key = index if dedup and settings.skip_duplicates and not raw else None
+        manifest = {"hdrIndex": index, "camera": camera, "exposureTime": exposure_time,
+                    "strategy": self.strategy.name}
+        self.engine.pipeline.submit(frame, file_path, exif_bytes, metadata, on_done=on_done,
+                                    dedup_key=dedup_key, metrics=self.metrics, manifest=manifest,
+                                    quality=self.strategy.quality)
+
+
+class CaptureEngine:
+    """Warm camera sessions, settings and a save pipeline for every strategy."""
+
+    def __init__(self, controls_path: str = CONTROLS_FILE, source: str = "engine",
+                 idle_timeout: float = 300):
+        """Initialize the engine.
+
+        Args:
+            controls_path: Path to controls.txt
+            source: Name recorded with each capture's metrics
+            idle_timeout: Seconds without a shot before a camera stops
+                streaming (0 keeps it streaming)
+        """
+        self.controls_path = controls_path
+        self.source = source
+        self.idle_timeout = idle_timeout
+
+        self.settings = None
+        self.flash = None
+        self.pipeline = None
+        self.calibration_cache = CalibrationCache()
+        self.planner = StoragePlanner()
+        self._sessions = {}
+        self._settings_mtimes = None
+
+    def open(self, mode: Optional[str] = None):
+        """Load settings and open the camera the strategy for mode needs first.
+
+        Args:
+            mode: Strategy expected first (default: the CaptureMode setting)
+        """
+        # Hardware imports are deferred so the module can be imported anywhere
+        from .hardware import FlashController
+
+        self.settings = CaptureSettings.load(self.controls_path)
+        self._settings_mtimes = self._read_settings_mtimes()
+        self.flash = FlashController(only_flash=self.settings.only_flash)
+        self.pipeline = SavePipeline(save_func=save_array)
+
+        try:
+            strategy = select_strategy(self.settings, mode)
+        except ValueError as e:
+            logger.error(str(e))
+            strategy = None
+        self.session(0, strategy)
+
+    def close(self):
+        """Finish pending saves and close every camera."""
+        for session in self._sessions.values():
+            session.close()
+        self._sessions = {}
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def session(self, camera_num: int = 0, strategy: Optional[CaptureStrategy] = None):
+        """Get a camera's warm session, opening the camera on first use.
+
+        Args:
+            camera_num: Picamera2 camera number
+            strategy: Strategy whose still mode (resolution and buffer count)
+                the session is switched to; None leaves the mode as it is
+
+        Returns:
+            CameraSession
+        """
+        resolution = strategy.resolution if strategy else None
+        buffer_count = strategy.buffer_count if strategy else 1
+
+        session = self._sessions.get(camera_num)
+        if session is None:
+            from .session import CameraSession
+
+            session = CameraSession(self.settings, self.flash, camera_num=camera_num,
+                                    resolution=resolution, idle_timeout=self.idle_timeout,
+                                    buffer_count=buffer_count)
+            width, height = session.resolution
+            session.frame_pool = FramePool((height, width, 3), FRAME_POOL_SIZE)
+            session.open()
+            self._sessions[camera_num] = session
+        elif strategy is not None:
+            session.set_still_options(resolution, buffer_count)
+        return session
+
+    def _read_settings_mtimes(self):
+        """Modification times of the files settings are loaded from."""
+        mtimes = []
+        for path in (self.controls_path, self.settings.settings_path):
+            try:
+                mtimes.append((path, os.path.getmtime(path)))
+            except OSError:
+                mtimes.append((path, None))
+        return mtimes
+
+    def reload_settings(self, force: bool = False) -> bool:
+        """Reload settings when controls.txt or the settings CSV changed.
+
+        Args:
+            force: Reload even if nothing seems to have changed
+
+        Returns:
+            True if the settings were reloaded
+        """
+        # Settings on newly mounted external media take priority
+        changed = (force or self._read_settings_mtimes() != self._settings_mtimes
+                   or find_camera_settings_file() != self.settings.settings_path)
+        if not changed:
+            return False
+
+        settings = CaptureSettings.load(self.controls_path)
+        logger.info(f"Reloading settings from {settings.settings_path}")
+        self.settings = settings
+        self._settings_mtimes = self._read_settings_mtimes()
+        self.flash.only_flash = settings.only_flash
+        for session in self._sessions.values():
+            session.update_settings(settings)
+        return True
+
+    def calibrate(self, strategy: Optional[CaptureStrategy] = None) -> Dict[str, Any]:
+        """Calibrate exposure and focus on camera 0 and store the results.
+
+        Args:
+            strategy: Strategy about to take a photo, so the camera is opened
+                in its still mode
+
+        Returns:
+            Calibrated values and focus timing
+        """
+        session = self.session(0, strategy)
+        results = session.calibrate()
+        self.calibration_cache.record(
+            results,
+            sensor_temperature=session.sensor_temperature(),
+            soc_temperature=read_soc_temperature()
+        )
+        self._apply_calibration(results)
+        return results
+
+    def calibrate_if_stale(self, strategy: Optional[CaptureStrategy] = None):
+        """Reuse a valid cached calibration, or calibrate if there is none."""
+        entry = self.calibration_cache.lookup(
+            sensor_temperature=self.session(0, strategy).sensor_temperature(),
+            soc_temperature=read_soc_temperature()
+        )
+        if entry is None:
+            self.calibrate(strategy)
+            return
+
+        logger.info(f"Reusing calibration from {datetime.fromtimestamp(entry['timestamp'])}")
+        self._apply_calibration(calibration_values(entry))
+
+    def _apply_calibration(self, values: Dict[str, Any]):
+        """Write calibrated values to the settings and re-apply them to the cameras."""
+        update_camera_settings(self.settings.settings_path, values)
+        set_last_calibration(self.controls_path)
+        self.reload_settings(force=True)
+
+    def plan_storage(self, strategy: CaptureStrategy, available: float) -> StoragePlan:
+        """Lower the strategy's quality, exposures or resolution if storage is short.
+
+        Args:
+            strategy: Strategy about to take a photo
+            available: Free bytes
+
+        Returns:
+            The plan applied to the strategy
+        """
+        full_resolution = strategy.resolution or self.session(strategy.cameras[0]).default_resolution
+        plan = self.planner.plan(self.settings, strategy.frame_count, full_resolution, available)
+        strategy.apply_plan(plan, full_resolution)
+        return plan
+
+    def capture(self, mode: Optional[str] = None, metrics: Optional[CaptureMetrics] = None,
+                device_name: Optional[str] = None) -> Dict[str, Any]:
+        """Take a photo and save it.
+
+        Args:
+            mode: Strategy name (default: the CaptureMode setting)
+            metrics: Capture record to fill in (default: a new one)
+            device_name: Name the files start with (default: the name in
+                controls.txt)
+
+        Returns:
+            JSON-serializable result, as replied by the daemon
+        """
+        _, available = get_storage_info(BASE_DIR)
+        if available < PHOTO_STORAGE_MINIMUM * 1024**3:
+            logger.warning("Not enough space to take more photos")
+            return {"status": "error", "error": "Not enough storage"}
+
+        if metrics is None:
+            metrics = CaptureMetrics(self.source)
+        with metrics.phase("settings"):
+            self.reload_settings()
+        strategy = select_strategy(self.settings, mode)
+
+        forced = strategy.calibration
+        if forced or (forced is None and self.settings.calibration_due()):
+            with metrics.phase("calibration"):
+                if forced:
+                    self.calibrate(strategy)
+                else:
+                    self.calibrate_if_stale(strategy)
+            # Calibration reloaded the settings
+            strategy = select_strategy(self.settings, mode)
+        plan = self.plan_storage(strategy, available)
+
+        reset_peak_rss()
+        start = time.time()
+        timestamp = datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
+        os.makedirs(PHOTOS_DIR, exist_ok=True)
+        folder = create_dated_folder(PHOTOS_DIR)
+
+        shot = Shot(self, strategy, metrics, folder, timestamp,
+                    device_name or self.settings.device_name)
+        logger.info(f"Taking a photo with the {strategy.name} strategy")
+        strategy.capture(shot)
+        capture_time = time.time() - start
+
+        with metrics.phase("saveWait"):
+            files = self.pipeline.wait()
+        capture_peak_rss = peak_rss()
+        exposure_times = strategy.exposure_times()
+        metrics.write(mode=strategy.name, exposureTimes=exposure_times, files=len(files),
+                      peakRss=capture_peak_rss, jpegQuality=strategy.quality,
+                      resolution=list(shot.session(strategy.cameras[0]).resolution),
+                      storagePlan=plan.to_dict())
+        logger.info(f"Peak RSS for {strategy.name} photo of {len(exposure_times)} exposure(s): "
+                    f"{capture_peak_rss / 1024**2:.0f} MB")
+
+        return {
+            "status": "success",
+            "data": {
+                "mode": strategy.name,
+                "files": files,
+                "captureTime": capture_time,
+                "totalTime": time.time() - start,
+                "peakRss": capture_peak_rss,
+            }
+        }
+
+
+def run_once(mode: Optional[str] = None, calibrate: bool = False,
+             device_name: Optional[str] = None, source: str = "TakePhoto",
+             metrics: Optional[CaptureMetrics] = None) -> int:
+    """Open the camera, take one photo (or calibrate) and close it again.
+
+    This is what TakePhoto.py and the TakePhoto_* scripts run.
+
+    Args:
+        mode: Strategy name (default: the CaptureMode setting)
+        calibrate: Calibrate exposure and focus instead of taking a photo
+        device_name: Name the files start with (default: the name in controls.txt)
+        source: Name recorded with the capture metrics
+        metrics: Capture record started by the calling script
+
+    Returns:
+        Process exit code
+    """
+    with CaptureEngine(source=source, idle_timeout=0) as engine:
+        engine.open(mode)
+        if metrics is not None:
+            metrics.lap("cameraOpen")
+        if calibrate:
+            results = engine.calibrate()
+            logger.info(f"Calibrated: {results}")
+            return 0
+        result = engine.capture(mode, metrics=metrics, device_name=device_name)
+
+    if result["status"] != "success":
+        logger.error(result["error"])
+        return 1
+    for file_path in result["data"]["files"]:
+        logger.info(f"Image saved to {file_path}")
+    return 0
@@ -0,0 +1,188 @@
+# src/software/capture/flashgate.py
+"""Flash gating timed from the sensor's own frame timestamps.
+
+Turning the flash on, then waiting in capture_request(flush=True) and
+turning it off once the request has reached Python keeps the flash lit for
+up to a couple of frame periods around a sub-millisecond exposure. The gate
+instead watches completed requests in the Picamera2 pre-callback. The
+SensorTimestamp and FrameDuration of the last frame predict when the next
+exposure starts, so the relay is switched on just before then. The
+callback switches it off again as soon as that frame completes, before the
+request is even handed to the capture thread.
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable
+
+from .config import (
+    FLASH_LEAD_US, FLASH_RELAY_LATENCY_US, FLASH_GATE_TIMEOUT, FLASH_GATE_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+ARMED = "armed"
+SCHEDULED = "scheduled"
+LIT = "lit"
+
+
+class FlashGate:
+    """Lights the flash for exactly one frame, timed by the camera."""
+
+    def __init__(self, picam2, flash_on: Callable[[], None], flash_off: Callable[[], None],
+                 lead_us: int = FLASH_LEAD_US, latency_us: int = FLASH_RELAY_LATENCY_US,
+                 timeout: float = FLASH_GATE_TIMEOUT):
+        """Initialize the gate.
+
+        Args:
+            picam2: Started Picamera2 instance
+            flash_on: Turns the flash on
+            flash_off: Turns the flash off (or leaves it on in only-flash mode)
+            lead_us: How long before the exposure starts the relay is switched
+            latency_us: Time the relay takes to close
+            timeout: Seconds to wait for a frame to time the flash from
+                before lighting it straight away
+        """
+        self.picam2 = picam2
+        self.flash_on = flash_on
+        self.flash_off = flash_off
+        self.lead_ns = lead_us * 1000
+        self.latency_ns = latency_us * 1000
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._lit = threading.Event()
+        self._state = IDLE
+        self._exposure_ns = 0
+        self._timer = None
+        self._lit_ns = None
+        self._lit_at = None
+        self._lit_frame = None
+        self._previous_callback = None
+
+        # Results of the last shot
+        self.lit_at = None
+        self.flash_time = 0
+
+    def open(self):
+        """Start watching completed requests."""
+        self._previous_callback = self.picam2.pre_callback
+        self.picam2.pre_callback = self._on_request
+
+    def close(self):
+        """Stop watching requests and make sure the flash is off."""
+        self._reset()
+        self.picam2.pre_callback = self._previous_callback
+        self._previous_callback = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _threshold(self) -> int:
+        """Earliest SensorTimestamp of a frame exposed entirely under the flash.
+
+        The timestamp may mark the start of the first row's exposure or the
+        start of its readout, so the exposure time is allowed for on top of
+        the relay latency.
+        """
+        return self._lit_ns + self.latency_ns + self._exposure_ns
+
+    def _light(self):
+        """Switch the flash on (from the timer or the capture thread)."""
+        with self._lock:
+            if self._state not in (ARMED, SCHEDULED):
+                return
+            self.flash_on()
+            # Picamera2 compares SensorTimestamp against the monotonic clock
+            self._lit_ns = time.monotonic_ns()
+            self._lit_at = time.time()
+            self._state = LIT
+        self._lit.set()
+
+    def _on_request(self, request):
+        """Pre-callback: schedule the flash from one frame, end it on the lit frame."""
+        if self._previous_callback is not None:
+            self._previous_callback(request)
+
+        metadata = request.get_metadata()
+        timestamp = metadata.get("SensorTimestamp")
+        if timestamp is None:
+            return
+
+        with self._lock:
+            if self._state == ARMED:
+                # Frames start one FrameDuration apart; aim for the first one
+                # whose exposure hasn't begun by the time the relay closes
+                frame_ns = max(1, metadata.get("FrameDuration", 0)) * 1000
+                now = time.monotonic_ns()
+                start = timestamp + frame_ns
+                while start - self._exposure_ns - self.lead_ns < now:
+                    start += frame_ns
+                delay = (start - self._exposure_ns - self.lead_ns - now) / 1e9
+                self._state = SCHEDULED
+                self._timer = threading.Timer(delay, self._light)
+                self._timer.daemon = True
+                self._timer.start()
+            elif self._state == LIT and timestamp >= self._threshold():
+                # The lit frame is complete; the flash isn't needed any more
+                self.flash_off()
+                self.lit_at = self._lit_at
+                self.flash_time = time.time() - self._lit_at
+                self._lit_frame = timestamp
+                self._state = IDLE
+
+    def _reset(self):
+        """Cancel a pending shot and turn the flash off if it is still lit."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._state == LIT:
+                self.flash_off()
+                self.lit_at = self._lit_at
+                self.flash_time = time.time() - self._lit_at
+            self._state = IDLE
+
+    def capture(self, exposure_time: int, retries: int = FLASH_GATE_RETRIES) -> Any:
+        """Capture one frame lit by the flash.
+
+        The exposure controls must already be in effect.
+
+        Args:
+            exposure_time: Exposure of the frame in microseconds
+            retries: Times to re-arm if the lit frame was missed
+
+        Returns:
+            The lit request; the caller releases it
+        """
+        for attempt in range(retries + 1):
+            with self._lock:
+                self._exposure_ns = exposure_time * 1000
+                self._lit_frame = None
+                self._lit.clear()
+                self._state = ARMED
+
+            try:
+                if not self._lit.wait(self.timeout):
+                    logger.warning("No frames to time the flash from, lighting it now")
+                    self._light()
+                request = self.picam2.capture_request(flush=self._threshold())
+            finally:
+                self._reset()
+
+            timestamp = request.get_metadata().get("SensorTimestamp")
+            if timestamp == self._lit_frame:
+                logger.info(f"Flash on for {self.flash_time * 1000:.1f}ms "
+                            f"for a {exposure_time}us exposure")
+                return request
+
+            if attempt == retries:
+                logger.warning("Lit frame missed, using the next frame")
+                return request
+            logger.warning(f"Lit frame missed (attempt {attempt + 1}), re-arming the flash")
+            request.release()
@@ -0,0 +1,198 @@
+# src/software/capture/focus.py
+"""Contrast-detect focus sweep on a small stream.
+
+autofocus_cycle() runs the IPA's own search at whatever resolution the
+camera is configured for and keeps the flash on for several seconds. The
+Mothbox looks at a flat sheet at a nearly fixed distance, so a short
+explicit sweep works better: step LensPosition in coarse steps around the
+last known position, then in fine steps around the sharpest coarse step,
+scoring each step on a cropped region of the low-resolution stream.
+"""
+import time
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .config import (
+    FOCUS_COARSE_STEP, FOCUS_FINE_STEP, FOCUS_SEARCH_RANGE, FOCUS_ROI,
+    FOCUS_LENS_TOLERANCE, FOCUS_MAX_FRAMES, FOCUS_MIN_PEAK_RATIO
+)
+
+logger = logging.getLogger(__name__)
+
+LAPLACIAN = "laplacian"
+TENENGRAD = "tenengrad"
+
+
+def sharpness(gray: np.ndarray, method: str = LAPLACIAN) -> float:
+    """Score how sharp a grayscale image is.
+
+    Args:
+        gray: 2D image
+        method: LAPLACIAN (variance of the Laplacian) or TENENGRAD (mean
+            squared Sobel gradient)
+
+    Returns:
+        Sharpness score; higher is sharper
+    """
+    if method == LAPLACIAN:
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    if method == TENENGRAD:
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        return float(np.mean(gx * gx + gy * gy))
+    raise ValueError(f"Unknown sharpness method: {method}")
+
+
+def crop_roi(image: np.ndarray, roi: Tuple[float, float, float, float] = FOCUS_ROI) -> np.ndarray:
+    """Crop a region given as (x, y, width, height) fractions of the image."""
+    height, width = image.shape[:2]
+    x, y, w, h = roi
+    return image[int(y * height):int((y + h) * height), int(x * width):int((x + w) * width)]
+
+
+def _peak_offset(left: float, centre: float, right: float) -> float:
+    """Sub-step offset of a parabola's vertex through three equally spaced scores."""
+    denominator = left - 2 * centre + right
+    if denominator >= 0:
+        return 0.0
+    return max(-0.5, min(0.5, 0.5 * (left - right) / denominator))
+
+
+class FocusEngine:
+    """Coarse-to-fine LensPosition sweep scored on a low-resolution stream."""
+
+    def __init__(self, picam2, flash_on: Callable[[], None], flash_off: Callable[[], None],
+                 stream: str = "lores", roi: Tuple[float, float, float, float] = FOCUS_ROI,
+                 method: str = LAPLACIAN, coarse_step: float = FOCUS_COARSE_STEP,
+                 fine_step: float = FOCUS_FINE_STEP, search_range: float = FOCUS_SEARCH_RANGE):
+        """Initialize the engine.
+
+        Args:
+            picam2: Started Picamera2 instance with AfMode set to manual
+            flash_on: Turns the flash on
+            flash_off: Turns the flash off
+            stream: Stream to score ("lores", or "main" for a small main stream)
+            roi: Region scored, as (x, y, width, height) fractions
+            method: Sharpness metric
+            coarse_step: Coarse sweep step in dioptres
+            fine_step: Fine sweep step in dioptres
+            search_range: Coarse sweep covers this far either side of the
+                starting position
+        """
+        self.picam2 = picam2
+        self.flash_on = flash_on
+        self.flash_off = flash_off
+        self.stream = stream
+        self.roi = roi
+        self.method = method
+        self.coarse_step = coarse_step
+        self.fine_step = fine_step
+        self.search_range = search_range
+
+        self.lens_min, self.lens_max, _ = picam2.camera_controls["LensPosition"]
+        self._scores = {}
+
+    def _gray(self, request) -> np.ndarray:
+        """Luma plane of the scored stream."""
+        array = request.make_array(self.stream)
+        if array.ndim == 3:
+            return cv2.cvtColor(array, cv2.COLOR_BGR2GRAY)
+        # YUV420 arrays are the Y plane followed by the chroma planes
+        height = self.picam2.camera_config[self.stream]["size"][1]
+        return array[:height]
+
+    def _score(self, position: float) -> float:
+        """Move the lens and score the first frame taken at the new position."""
+        position = round(min(max(position, self.lens_min), self.lens_max), 3)
+        if position in self._scores:
+            return self._scores[position]
+
+        self.picam2.set_controls({"LensPosition": position})
+        for _ in range(FOCUS_MAX_FRAMES):
+            request = self.picam2.capture_request()
+            try:
+                reported = request.get_metadata().get("LensPosition", position)
+                if abs(reported - position) <= FOCUS_LENS_TOLERANCE:
+                    score = sharpness(crop_roi(self._gray(request), self.roi), self.method)
+                    break
+            finally:
+                request.release()
+        else:
+            logger.warning(f"Lens did not reach {position} after {FOCUS_MAX_FRAMES} frames")
+            request = self.picam2.capture_request()
+            try:
+                score = sharpness(crop_roi(self._gray(request), self.roi), self.method)
+            finally:
+                request.release()
+
+        self._scores[position] = score
+        return score
+
+    def _sweep(self, start: float, stop: float, step: float) -> Tuple[float, bool]:
+        """Score evenly spaced positions.
+
+        Returns:
+            (sharpest position, whether the sweep found a clear peak: one
+            inside the range and well above the weakest score)
+        """
+        positions = np.arange(start, stop + step / 2, step)
+        scores = [self._score(position) for position in positions]
+        best = int(np.argmax(scores))
+        logger.debug("Focus sweep: " + ", ".join(
+            f"{position:.2f}={score:.1f}" for position, score in zip(positions, scores)))
+
+        peaked = scores[best] >= FOCUS_MIN_PEAK_RATIO * min(scores)
+        if 0 < best < len(positions) - 1:
+            return positions[best] + step * _peak_offset(*scores[best - 1:best + 2]), peaked
+        return positions[best], False
+
+    def run(self, start_position: Optional[float] = None) -> Dict[str, Any]:
+        """Find the sharpest lens position.
+
+        Args:
+            start_position: Centre of the coarse sweep (default: the middle
+                of the lens range)
+
+        Returns:
+            LensPosition, score, number of steps, run time and flash-on time
+        """
+        if start_position is None:
+            start_position = (self.lens_min + self.lens_max) / 2
+        self._scores = {}
+
+        start = time.time()
+        self.flash_on()
+        try:
+            low = max(self.lens_min, start_position - self.search_range)
+            high = min(self.lens_max, start_position + self.search_range)
+            coarse, peaked = self._sweep(low, high, self.coarse_step)
+
+            # No clear peak in the window means focus drifted further;
+            # sweep the whole range once instead of walking outwards
+            if not peaked and (low > self.lens_min or high < self.lens_max):
+                logger.info("Focus peak outside the search window, sweeping the full range")
+                coarse, _ = self._sweep(self.lens_min, self.lens_max, self.coarse_step)
+
+            fine_low = max(self.lens_min, coarse - self.coarse_step)
+            fine_high = min(self.lens_max, coarse + self.coarse_step)
+            position, _ = self._sweep(fine_low, fine_high, self.fine_step)
+
+            # Leave the lens at the result
+            score = self._score(position)
+        finally:
+            self.flash_off()
+            flash_time = time.time() - start
+
+        result = {
+            "LensPosition": float(position),
+            "score": score,
+            "steps": len(self._scores),
+            "time": time.time() - start,
+            "flashTime": flash_time,
+        }
+        logger.info(f"Focus converged at {position:.3f} after {result['steps']} steps "
+                    f"in {result['time']:.2f}s (flash on {flash_time:.2f}s)")
+        return result
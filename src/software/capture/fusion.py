@@ -0,0 +1,210 @@
+# src/software/capture/fusion.py
+"""On-device exposure fusion for HDR brackets.
+
+Implements Mertens-style exposure fusion: every frame gets a per-pixel
+weight from local contrast, colour saturation and well-exposedness, and the
+frames are blended through Laplacian pyramids so the weights don't leave
+halos.
+
+A full 64MP frame in float32 is ~770 MB, so the merge never works on whole
+frames. The image is processed in horizontal strips, each padded with
+enough overlap above and below that the pyramid doesn't see the strip
+edges, and only the strip core is written out. Peak memory is a few strips
+of float data on top of the frames themselves.
+"""
+import time
+import logging
+from typing import List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .config import (
+    FUSION_LEVELS, FUSION_STRIP_HEIGHT, FUSION_OVERLAP,
+    HDR_MERGE_OFF, HDR_MERGE_KEEP_MIDDLE
+)
+
+logger = logging.getLogger(__name__)
+
+# photo_path() index used for the fused frame
+FUSED_INDEX = "F"
+
+# Mertens defaults: sigma of the well-exposedness curve and a small epsilon
+# so that pixels where every weight is zero still average evenly
+_WELL_EXPOSED_SIGMA = 0.2
+_EPSILON = 1e-12
+
+
+def _fusion_weight(image: np.ndarray, contrast_weight: float,
+                   saturation_weight: float, exposure_weight: float) -> np.ndarray:
+    """Per-pixel Mertens weight for one float32 BGR strip in [0, 1]."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    contrast = np.abs(cv2.Laplacian(gray, cv2.CV_32F))
+
+    mean = image.mean(axis=2)
+    saturation = np.sqrt(((image - mean[:, :, None]) ** 2).mean(axis=2))
+
+    well_exposed = np.exp(-((image - 0.5) ** 2) / (2 * _WELL_EXPOSED_SIGMA ** 2)).prod(axis=2)
+
+    weight = np.ones_like(gray)
+    if contrast_weight:
+        weight *= contrast ** contrast_weight
+    if saturation_weight:
+        weight *= saturation ** saturation_weight
+    if exposure_weight:
+        weight *= well_exposed ** exposure_weight
+    return weight + _EPSILON
+
+
+def _gaussian_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+    pyramid = [image]
+    for _ in range(levels - 1):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def _laplacian_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+    gaussian = _gaussian_pyramid(image, levels)
+    pyramid = []
+    for level in range(levels - 1):
+        height, width = gaussian[level].shape[:2]
+        pyramid.append(gaussian[level] - cv2.pyrUp(gaussian[level + 1], dstsize=(width, height)))
+    pyramid.append(gaussian[-1])
+    return pyramid
+
+
+def _collapse(pyramid: List[np.ndarray]) -> np.ndarray:
+    image = pyramid[-1]
+    for level in reversed(pyramid[:-1]):
+        height, width = level.shape[:2]
+        image = cv2.pyrUp(image, dstsize=(width, height)) + level
+    return image
+
+
+def _fuse_strip(strips: List[np.ndarray], levels: int,
+                weights: Tuple[float, float, float]) -> np.ndarray:
+    """Fuse the same rows of every frame.
+
+    Args:
+        strips: uint8 BGR strips, one per exposure
+        levels: Pyramid levels
+        weights: Contrast, saturation and well-exposedness exponents
+
+    Returns:
+        Fused float32 strip in [0, 1]
+    """
+    # Weights have to be normalized across all frames before blending
+    fusion_weights = []
+    for strip in strips:
+        image = strip.astype(np.float32) * (1 / 255)
+        fusion_weights.append(_fusion_weight(image, *weights))
+    total = np.add.reduce(fusion_weights)
+    for weight in fusion_weights:
+        weight /= total
+
+    # Accumulate one frame at a time so only one image pyramid is alive
+    result = None
+    for strip, weight in zip(strips, fusion_weights):
+        image = strip.astype(np.float32) * (1 / 255)
+        image_pyramid = _laplacian_pyramid(image, levels)
+        weight_pyramid = _gaussian_pyramid(weight, levels)
+        blended = [lap * w[:, :, None] for lap, w in zip(image_pyramid, weight_pyramid)]
+        if result is None:
+            result = blended
+        else:
+            for acc, level in zip(result, blended):
+                acc += level
+
+    return _collapse(result)
+
+
+def fuse_exposures(frames: Sequence[np.ndarray], out: Optional[np.ndarray] = None,
+                   levels: int = FUSION_LEVELS, strip_height: int = FUSION_STRIP_HEIGHT,
+                   overlap: int = FUSION_OVERLAP,
+                   weights: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> np.ndarray:
+    """Fuse an exposure bracket into a single frame, strip by strip.
+
+    Each strip's result is written one strip late, after the next strip
+    (whose overlap reaches back into it) has been read, so out may be one
+    of the input frames. That lets the merge reuse a frame buffer instead
+    of allocating another full-resolution array.
+
+    Args:
+        frames: HxWx3 uint8 frames of the same scene, any exposure order
+        out: Array to write the fused frame into (default: new array)
+        levels: Pyramid levels; the same number is used for every strip
+            so strips join without seams
+        strip_height: Output rows fused per strip
+        overlap: Extra rows read above and below each strip. Strip reads
+            start on a multiple of 2 ** (levels - 1) rows, so overlap plus
+            that alignment less one must not exceed strip_height (overlap
+            alone may equal it if strip_height is aligned)
+
+    Returns:
+        Fused HxWx3 uint8 frame (out, if given)
+    """
+    # Align strip starts to the coarsest pyramid level so every strip
+    # downsamples on the same pixel grid
+    align = 2 ** (levels - 1)
+
+    if len(frames) < 2:
+        raise ValueError("Exposure fusion needs at least two frames")
+    # A strip's read must not reach the strip two before it, which has
+    # already been written to out (possibly one of the frames)
+    reach = overlap if strip_height % align == 0 else overlap + align - 1
+    if reach > strip_height:
+        raise ValueError(f"Fusion overlap {overlap} is too large for strips of {strip_height} rows "
+                         f"aligned to {align}")
+
+    height = frames[0].shape[0]
+    if out is None:
+        out = np.empty_like(frames[0])
+
+    start = time.time()
+    pending = None
+    for top in range(0, height, strip_height):
+        bottom = min(top + strip_height, height)
+        pad_top = max(0, (top - overlap) // align * align)
+        pad_bottom = min(height, bottom + overlap)
+
+        fused = _fuse_strip([frame[pad_top:pad_bottom] for frame in frames], levels, weights)
+        core = fused[top - pad_top:bottom - pad_top]
+        np.clip(core * 255 + 0.5, 0, 255, out=core)
+
+        if pending is not None:
+            pending_top, pending_core = pending
+            out[pending_top:pending_top + len(pending_core)] = pending_core
+        pending = (top, core.astype(np.uint8))
+
+    if pending is not None:
+        pending_top, pending_core = pending
+        out[pending_top:pending_top + len(pending_core)] = pending_core
+
+    logger.info(f"Fused {len(frames)} exposures in {time.time() - start:.2f}s")
+    return out
+
+
+def merge_bracket(frames: Sequence[np.ndarray],
+                  mode: int) -> List[Tuple[Union[int, str], np.ndarray]]:
+    """Turn a captured bracket into the frames that should be saved.
+
+    The fused frame is written into the buffer of one of the side
+    exposures, so no extra full-resolution array is allocated.
+
+    Args:
+        frames: Bracket frames in capture order (middle exposure first,
+            as returned by list_exposuretimes())
+        mode: HDRMerge setting
+
+    Returns:
+        (photo index, frame) pairs to save; FUSED_INDEX marks the fused
+        frame. Frames not listed can be discarded.
+    """
+    if mode == HDR_MERGE_OFF or len(frames) < 2:
+        return list(enumerate(frames))
+
+    fused = fuse_exposures(frames, out=frames[-1])
+    outputs = [(FUSED_INDEX, fused)]
+    if mode == HDR_MERGE_KEEP_MIDDLE:
+        outputs.append((0, frames[0]))
+    return outputs
@@ -0,0 +1,54 @@
+# src/software/capture/hardware.py
+"""Relay control for the flash and attract lights."""
+import logging
+
+import RPi.GPIO as GPIO
+
+from .config import RELAY_FLASH, RELAY_ATTRACT
+
+logger = logging.getLogger(__name__)
+
+
+class FlashController:
+    """Drives the flash relay.
+
+    The relays are active-low. New wiring dictates that the attract relay is
+    held on whenever the flash is touched.
+    """
+
+    def __init__(self, only_flash: bool = False, flash_pin: int = RELAY_FLASH,
+                 attract_pin: int = RELAY_ATTRACT):
+        """Initialize the flash controller.
+
+        Args:
+            only_flash: Keep the flash lit between shots (flash is the attractor)
+            flash_pin: BCM pin of the flash relay
+            attract_pin: BCM pin of the attract relay
+        """
+        self.only_flash = only_flash
+        self.flash_pin = flash_pin
+        self.attract_pin = attract_pin
+
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.flash_pin, GPIO.OUT)
+        GPIO.setup(self.attract_pin, GPIO.OUT)
+
+        GPIO.output(self.flash_pin, GPIO.HIGH)
+        GPIO.output(self.attract_pin, GPIO.LOW)
+        logger.info("Relay module set up")
+
+    def on(self):
+        """Turn the flash on."""
+        GPIO.output(self.attract_pin, GPIO.LOW)
+        GPIO.output(self.flash_pin, GPIO.LOW)
+
+    def off(self):
+        """Turn the flash off."""
+        GPIO.output(self.flash_pin, GPIO.HIGH)
+        GPIO.output(self.attract_pin, GPIO.LOW)
+
+    def release(self):
+        """Turn the flash off after a shot unless running in only-flash mode."""
+        if not self.only_flash:
+            self.off()
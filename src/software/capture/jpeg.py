@@ -0,0 +1,154 @@
+# src/software/capture/jpeg.py
+"""Parallel JPEG encoding for very large frames.
+
+libjpeg encodes on a single core, which makes saving a 64MP frame the
+slowest part of a capture. The frame is split into horizontal strips that
+are encoded on a thread pool (cv2.imencode releases the GIL) and the
+results are stitched back into one baseline JPEG using restart markers:
+
+- every strip is encoded with a restart interval of one MCU row, so each
+  strip's entropy-coded data is a whole number of restart intervals;
+- strips are a multiple of 8 MCU rows high, so the RST0-RST7 numbering in
+  each strip already lines up with its position in the full image;
+- the headers come from the first strip with the frame height patched in
+  the SOF segment, and an RST7 marker joins each pair of strips.
+
+All strips use the same quality and the standard Huffman tables, so the
+tables in the first strip's header are valid for the whole image.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from .config import JPEG_QUALITY, JPEG_ENCODE_WORKERS, JPEG_STRIPED_MIN_PIXELS
+
+logger = logging.getLogger(__name__)
+
+# 4:2:0 chroma subsampling gives 16x16 pixel MCUs
+MCU_SIZE = 16
+# RST markers count modulo 8
+_RST_CYCLE = 8
+
+_EOI = b"\xff\xd9"
+_SOS = 0xDA
+_SOF_MARKERS = (0xC0, 0xC1)  # baseline and extended sequential Huffman
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared encode pool, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=JPEG_ENCODE_WORKERS,
+                thread_name_prefix="JpegEncoder"
+            )
+        return _executor
+
+
+def _encode_strip(strip: np.ndarray, quality: int, restart_interval: int) -> np.ndarray:
+    params = [
+        int(cv2.IMWRITE_JPEG_QUALITY), quality,
+        int(cv2.IMWRITE_JPEG_RST_INTERVAL), restart_interval,
+        int(cv2.IMWRITE_JPEG_OPTIMIZE), 0,
+        int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+    ]
+    if hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+        params += [int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420]
+    ok, jpeg = cv2.imencode(".jpg", strip, params)
+    if not ok:
+        raise IOError("Failed to encode JPEG strip")
+    return jpeg
+
+
+def _split_jpeg(jpeg: np.ndarray):
+    """Find the header and entropy-coded data of an encoded strip.
+
+    Returns:
+        (offset of the SOF segment, offset where entropy-coded data starts,
+        offset of the EOI marker)
+    """
+    data = memoryview(jpeg).cast("B")
+    pos = 2
+    sof = None
+    while True:
+        if data[pos] != 0xFF:
+            raise ValueError("Malformed JPEG header")
+        marker = data[pos + 1]
+        length = int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker in _SOF_MARKERS:
+            sof = pos
+        if marker == _SOS:
+            break
+        pos += 2 + length
+
+    if sof is None:
+        raise ValueError("JPEG strip is not baseline")
+    if bytes(data[-2:]) != _EOI:
+        raise ValueError("JPEG strip does not end with EOI")
+    return sof, pos + 2 + length, len(data) - 2
+
+
+def strip_height(height: int, workers: int = JPEG_ENCODE_WORKERS) -> int:
+    """Rows per strip: about one strip per worker, aligned to 8 MCU rows."""
+    align = MCU_SIZE * _RST_CYCLE
+    rows = -(-height // max(1, workers))
+    return max(align, -(-rows // align) * align)
+
+
+def encode_striped(frame: np.ndarray, quality: int = JPEG_QUALITY,
+                   rows: Optional[int] = None) -> List[memoryview]:
+    """Encode a frame as one JPEG, strips in parallel.
+
+    Args:
+        frame: HxWx3 uint8 BGR array
+        quality: JPEG quality
+        rows: Rows per strip (default: one strip per worker); must be a
+            multiple of 128
+
+    Returns:
+        Chunks that make up the JPEG, starting at SOI; write them in order
+    """
+    height, width = frame.shape[:2]
+    rows = rows or strip_height(height)
+    if rows % (MCU_SIZE * _RST_CYCLE):
+        raise ValueError(f"Strip height must be a multiple of {MCU_SIZE * _RST_CYCLE} rows")
+    if height > 0xFFFF:
+        raise ValueError("Frame too tall for a baseline JPEG")
+
+    restart_interval = -(-width // MCU_SIZE)  # one MCU row
+    executor = _get_executor()
+    futures = [
+        executor.submit(_encode_strip, frame[top:top + rows], quality, restart_interval)
+        for top in range(0, height, rows)
+    ]
+    strips = [future.result() for future in futures]
+
+    chunks = []
+    for index, jpeg in enumerate(strips):
+        sof, scan_start, scan_end = _split_jpeg(jpeg)
+        data = memoryview(jpeg).cast("B")
+        if index == 0:
+            header = bytearray(data[:scan_start])
+            header[sof + 5:sof + 7] = height.to_bytes(2, "big")
+            chunks.append(memoryview(header))
+        else:
+            # Restart after the last interval of the previous strip
+            chunks.append(memoryview(b"\xff" + bytes([0xD0 + _RST_CYCLE - 1])))
+        chunks.append(data[scan_start:scan_end])
+    chunks.append(memoryview(_EOI))
+    return chunks
+
+
+def use_striped(frame: np.ndarray) -> bool:
+    """Whether a frame is big enough for striped encoding to pay off."""
+    height, width = frame.shape[:2]
+    return (JPEG_ENCODE_WORKERS > 1 and height * width >= JPEG_STRIPED_MIN_PIXELS
+            and height > MCU_SIZE * _RST_CYCLE)
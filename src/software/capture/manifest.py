@@ -0,0 +1,131 @@
+# src/software/capture/manifest.py
+"""Per-night manifest of saved frames.
+
+Every file the save pipeline writes gets one JSON line in manifest.jsonl in
+its dated folder. Each line holds the file's size and SHA-256 and the
+exposure, gain, lens position, HDR index, capture time and flash time
+from the frame's metadata. The gallery, backups and verification can read
+these instead of walking folders and opening every photo.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.jsonl"
+
+_lock = threading.Lock()
+
+
+def manifest_path(folder: str) -> str:
+    """Path of a dated folder's manifest."""
+    return os.path.join(folder, MANIFEST_FILE)
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file as a hex string.
+
+    The file was just written, so it is read back from the page cache.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_record(file_path: str, metadata: Dict[str, Any],
+                    fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the manifest record of a written file.
+
+    Args:
+        file_path: File that was written
+        metadata: Request metadata of the frame (FlashTime is added by the
+            capture engines, the rest comes from libcamera)
+        fields: Other fields such as hdrIndex, camera and capturedAt
+
+    Returns:
+        JSON-serializable record
+    """
+    fields = dict(fields or {})
+    requested = fields.pop("exposureTime", None)
+    record = {
+        "file": os.path.basename(file_path),
+        "bytes": os.path.getsize(file_path),
+        "sha256": file_digest(file_path),
+        "exposureTime": metadata.get("ExposureTime", requested),
+        "requestedExposureTime": requested,
+        "analogueGain": metadata.get("AnalogueGain"),
+        "lensPosition": metadata.get("LensPosition"),
+        "flashTime": metadata.get("FlashTime"),
+    }
+    record.update(fields)
+    return record
+
+
+def append_manifest(file_path: str, metadata: Dict[str, Any],
+                    fields: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Add a written file to its folder's manifest.
+
+    The manifest never gets in the way of a capture: errors are logged.
+
+    Args:
+        file_path: File that was written
+        metadata: Request metadata of the frame
+        fields: Other fields of the record
+
+    Returns:
+        The record, or None if it couldn't be written
+    """
+    try:
+        record = manifest_record(file_path, metadata, fields)
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with _lock:
+            with open(manifest_path(os.path.dirname(file_path)), "a") as f:
+                f.write(line)
+        return record
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not add {file_path} to the manifest: {e}")
+        return None
+
+
+def read_manifest(folder: str) -> List[Dict[str, Any]]:
+    """Records in a dated folder's manifest, oldest first.
+
+    A line cut short by a power loss is skipped.
+    """
+    records = []
+    try:
+        with open(manifest_path(folder), "r") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def verify_manifest(folder: str) -> Dict[str, List[str]]:
+    """Check the files of a dated folder against its manifest.
+
+    Args:
+        folder: Dated folder
+
+    Returns:
+        Names of files that are missing and files whose content changed
+    """
+    missing, changed = [], []
+    for record in read_manifest(folder):
+        file_path = os.path.join(folder, record["file"])
+        if not os.path.exists(file_path):
+            missing.append(record["file"])
+        elif (os.path.getsize(file_path) != record["bytes"]
+              or file_digest(file_path) != record["sha256"]):
+            changed.append(record["file"])
+    return {"missing": missing, "changed": changed}
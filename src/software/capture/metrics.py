@@ -0,0 +1,210 @@
+# src/software/capture/metrics.py
+"""Per-capture timing records.
+
+Every capture appends one JSON line to METRICS_FILE with the time spent in
+each phase (process start, imports, settings, configure, calibration,
+capture, saving), the flash-on, capture and flash-off timing of every
+exposure, and the encode and write time of every saved file. The software
+version is recorded with each line so regressions show up across updates.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .config import METRICS_FILE, METRICS_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+_version = None
+
+
+def process_start_time() -> Optional[float]:
+    """Wall-clock time the current process was started.
+
+    Covers interpreter startup, which happens before the script's first
+    line can take a timestamp.
+
+    Returns:
+        Start time, or None if /proc isn't available
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # The command name may contain spaces; fields after it are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    # Field 22 is the start time in clock ticks since boot
+    return time.time() - uptime + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+def software_version() -> str:
+    """Git revision of the installed software, or "unknown"."""
+    global _version
+    if _version is None:
+        try:
+            result = subprocess.run(
+                ["git", "describe", "--always", "--dirty"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, timeout=2
+            )
+            _version = result.stdout.strip() or "unknown"
+        except (OSError, subprocess.SubprocessError):
+            _version = "unknown"
+    return _version
+
+
+def append_record(record: Dict[str, Any], file_path: str = METRICS_FILE,
+                  max_bytes: int = METRICS_MAX_BYTES):
+    """Append a record to a JSONL file, rotating it once it gets large.
+
+    Metrics never get in the way of a capture: write errors are logged.
+
+    Args:
+        record: JSON-serializable record
+        file_path: Metrics file
+        max_bytes: Size beyond which the file is moved to file_path.1
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if os.path.exists(file_path) and os.path.getsize(file_path) > max_bytes:
+            os.replace(file_path, file_path + ".1")
+        with open(file_path, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write capture metrics to {file_path}: {e}")
+
+
+def recent_records(count: int, file_path: str = METRICS_FILE,
+                   block_size: int = 64 * 1024) -> List[Dict[str, Any]]:
+    """Read the last records of a JSONL file without reading all of it.
+
+    Args:
+        count: Number of records wanted
+        file_path: Metrics file
+        block_size: Bytes read from the end at a time
+
+    Returns:
+        Up to count records, oldest first
+    """
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b""
+            while position > 0 and data.count(b"\n") <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except OSError:
+        return []
+
+    records = []
+    # The first line may be cut off by the seek
+    for line in data.splitlines()[-count:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+class CaptureMetrics:
+    """Collects the timing of one capture.
+
+    Phases can be timed with phase() around a block, or with lap() in
+    straight-line scripts, where each lap covers the time since the last.
+    Exposures and saves are added as they happen; saves may come from the
+    save pipeline's worker threads.
+    """
+
+    def __init__(self, source: str, started_at: Optional[float] = None):
+        """Initialize the record.
+
+        Args:
+            source: What took the photo, e.g. "TakePhoto" or "daemon"
+            started_at: Start of the capture (default: now)
+        """
+        self.started_at = time.time() if started_at is None else started_at
+        self.source = source
+        self.phases = {}
+        self.exposures = []
+        self.saves = []
+        self._lock = threading.Lock()
+        self._last_lap = self.started_at
+
+    def add_phase(self, name: str, seconds: float):
+        """Add time to a phase; a phase that runs twice is summed."""
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as a phase."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.time() - start)
+
+    def lap(self, name: str, since: Optional[float] = None):
+        """Add the time since the previous lap (or since a given time) to a phase."""
+        now = time.time()
+        self.add_phase(name, now - (self._last_lap if since is None else since))
+        self._last_lap = now
+
+    def add_exposure(self, timing: Dict[str, Any]):
+        """Add the timing of one exposure, as collected by BracketEngine."""
+        with self._lock:
+            self.exposures.append(timing)
+
+    def add_save(self, timing: Dict[str, Any]):
+        """Add the timing of one saved file, as collected by SavePipeline."""
+        with self._lock:
+            self.saves.append(timing)
+
+    def finish(self, **fields) -> Dict[str, Any]:
+        """Build the record.
+
+        Args:
+            **fields: Extra top-level fields, e.g. the exposure times
+
+        Returns:
+            Record with phases, exposures, saves and totals
+        """
+        with self._lock:
+            record = {
+                "source": self.source,
+                "version": software_version(),
+                "startedAt": self.started_at,
+                "totalTime": time.time() - self.started_at,
+                "flashTime": sum(e.get("flashTime", 0) for e in self.exposures),
+                "encodeTime": sum(s.get("encode", 0) for s in self.saves),
+                "writeTime": sum(s.get("write", 0) for s in self.saves),
+                "bytesWritten": sum(s.get("bytes", 0) for s in self.saves),
+                "phases": dict(self.phases),
+                "exposures": list(self.exposures),
+                "saves": list(self.saves),
+            }
+        record.update(fields)
+        return record
+
+    def write(self, file_path: str = METRICS_FILE, **fields) -> Dict[str, Any]:
+        """Finish the record and append it to the metrics file.
+
+        Returns:
+            The written record
+        """
+        record = self.finish(**fields)
+        append_record(record, file_path)
+        logger.info(f"Capture took {record['totalTime']:.2f}s, flash on for "
+                    f"{record['flashTime']:.3f}s: " + ", ".join(
+                        f"{name} {seconds:.2f}s" for name, seconds in record["phases"].items()))
+        return record
@@ -0,0 +1,160 @@
+# src/software/capture/multicam.py
+"""Simultaneous capture from several cameras under one flash window.
+
+The stereo script used to drive the cameras one after the other, so the
+frames were taken at different moments and the flash stayed on for both.
+Here every camera has its own worker thread: exposure controls are applied
+and confirmed on all cameras in parallel, then the flash comes on and all
+workers request a frame at the same moment. The cameras free-run without
+a hardware sync, so the frames are paired by SensorTimestamp; if one
+camera's frame started much earlier than the others, it takes its next
+frame instead when that gets the set closer together.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import BRACKET_MAX_FRAMES, MULTICAM_MAX_SKEW_US, MULTICAM_MAX_RETRIES
+from .bracket import BracketEngine, exposure_matches
+
+logger = logging.getLogger(__name__)
+
+
+def timestamp_skew(metadatas: List[Dict[str, Any]]) -> float:
+    """Spread of SensorTimestamp across frames, in microseconds."""
+    timestamps = [metadata["SensorTimestamp"] for metadata in metadatas]
+    return (max(timestamps) - min(timestamps)) / 1000
+
+
+class MultiCameraEngine:
+    """Captures exposure brackets on N cameras at once."""
+
+    def __init__(self, cameras: List[Any], flash_on: Callable[[], None],
+                 flash_off: Callable[[], None], max_skew_us: float = MULTICAM_MAX_SKEW_US,
+                 max_frames: int = BRACKET_MAX_FRAMES):
+        """Initialize the engine.
+
+        Args:
+            cameras: Started Picamera2 instances
+            flash_on: Turns the flash on
+            flash_off: Turns the flash off (or leaves it on in only-flash mode)
+            max_skew_us: Skew above which re-pairing frames is attempted
+            max_frames: Frames to wait for each exposure on each camera
+        """
+        self.cameras = cameras
+        self.flash_on = flash_on
+        self.flash_off = flash_off
+        self.max_skew_us = max_skew_us
+        self.brackets = [BracketEngine(camera, flash_on, flash_off, max_frames) for camera in cameras]
+        self._executor = ThreadPoolExecutor(max_workers=len(cameras),
+                                            thread_name_prefix="MultiCamera")
+
+    def close(self):
+        """Stop the worker threads."""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _on_all(self, func: Callable, *args_per_camera) -> List[Any]:
+        """Run func(camera_index, ...) on every camera's worker and wait for all."""
+        futures = [
+            self._executor.submit(func, index, *(args[index] for args in args_per_camera))
+            for index in range(len(self.cameras))
+        ]
+        return [future.result() for future in futures]
+
+    def _pair(self, requests: List[Any]) -> List[Any]:
+        """Swap the earliest frames for later ones while that reduces the skew.
+
+        Args:
+            requests: One completed request per camera (released as replaced)
+
+        Returns:
+            The paired requests
+        """
+        for _ in range(MULTICAM_MAX_RETRIES):
+            metadatas = [request.get_metadata() for request in requests]
+            skew = timestamp_skew(metadatas)
+            if skew <= self.max_skew_us:
+                break
+
+            earliest = min(range(len(requests)), key=lambda i: metadatas[i]["SensorTimestamp"])
+            replacement = self.cameras[earliest].capture_request()
+            candidate = requests[:earliest] + [replacement] + requests[earliest + 1:]
+            if timestamp_skew([request.get_metadata() for request in candidate]) < skew:
+                requests[earliest].release()
+                requests = candidate
+            else:
+                replacement.release()
+                break
+        return requests
+
+    def capture(self, exposure_times: List[int], make_frame: Callable[[Any], Any],
+                on_frame: Optional[Callable[[int, List[Any], List[Dict[str, Any]], float], None]] = None
+                ) -> List[Any]:
+        """Capture one frame per camera for each exposure time.
+
+        Args:
+            exposure_times: Exposure times in microseconds
+            make_frame: Turns a request into a frame (called before release)
+            on_frame: Called as on_frame(index, frames, metadatas, skew_us)
+                as soon as each set arrives; sets handed to it are not kept
+
+        Returns:
+            List of (frames, metadatas, skew_us) tuples for sets not passed
+            to on_frame
+        """
+        targets = self.brackets[0].clamp_exposures(exposure_times)
+        sets = []
+        flash_time = 0
+        skews = []
+
+        start = time.time()
+        for index, target in enumerate(targets):
+            for camera in self.cameras:
+                camera.set_controls({"ExposureTime": target})
+            self._on_all(lambda i: self.brackets[i].wait_for_exposure(target))
+
+            flash_start = time.time()
+            self.flash_on()
+            try:
+                # Every worker asks for the first frame that starts after this point
+                requests = self._on_all(lambda i: self.cameras[i].capture_request(flush=True))
+                requests = self._pair(requests)
+            finally:
+                self.flash_off()
+            set_flash_time = time.time() - flash_start
+            flash_time += set_flash_time
+
+            try:
+                metadatas = [request.get_metadata() for request in requests]
+                frames = self._on_all(lambda i, request: make_frame(request), requests)
+            finally:
+                for request in requests:
+                    request.release()
+
+            for metadata in metadatas:
+                metadata["FlashTime"] = set_flash_time
+            skew = timestamp_skew(metadatas)
+            skews.append(skew)
+            for camera_index, metadata in enumerate(metadatas):
+                if not exposure_matches(metadata["ExposureTime"], target):
+                    logger.warning(f"Camera {camera_index}: exposure {target}us requested, "
+                                   f"got {metadata['ExposureTime']}us")
+            logger.info(f"Exposure {target}us captured on {len(self.cameras)} cameras, "
+                        f"skew {skew / 1000:.2f}ms")
+
+            if on_frame is not None:
+                on_frame(index, frames, metadatas, skew)
+            else:
+                sets.append((frames, metadatas, skew))
+
+        logger.info(f"Bracket of {len(targets)} on {len(self.cameras)} cameras took "
+                    f"{time.time() - start:.3f}s, flash on for {flash_time:.3f}s, "
+                    f"max skew {max(skews, default=0) / 1000:.2f}ms")
+        return sets
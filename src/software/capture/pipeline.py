@@ -0,0 +1,229 @@
+# src/software/capture/pipeline.py
+"""Bounded encode/save pipeline for captured frames.
+
+The capture loop hands each frame to the pipeline as soon as it comes off the
+sensor and moves straight on to the next exposure. Worker threads do the
+JPEG encoding and disk writes (Pillow and OpenCV release the GIL while
+encoding, so they run on separate cores). The queue is bounded: when the workers fall
+behind, submit() blocks, which caps how many full-resolution frames are held
+in memory at once.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional, Union, Any
+
+from .config import SAVE_WORKERS, SAVE_QUEUE_SIZE
+from .dedup import DuplicateFilter
+from .manifest import append_manifest
+from .metrics import CaptureMetrics
+from .renditions import save_renditions, embed_exif_thumbnail, bgr_frame
+from .saving import save_image
+
+logger = logging.getLogger(__name__)
+
+
+class SaveJob:
+    """One frame waiting to be encoded and written."""
+
+    def __init__(self, image, file_path: str, exif_bytes: bytes,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 on_done: Optional[Callable] = None,
+                 dedup_key: Optional[Union[int, str]] = None,
+                 metrics: Optional[CaptureMetrics] = None,
+                 manifest: Optional[Dict[str, Any]] = None,
+                 quality: Optional[int] = None):
+        """Initialize a save job.
+
+        Args:
+            image: Frame to save
+            file_path: Destination path
+            exif_bytes: EXIF block to embed
+            metadata: Request metadata for the frame
+            on_done: Called with the frame once it is written (or failed),
+                e.g. to return a pooled buffer
+            dedup_key: Compare with the last kept frame of this key and
+                write only a proxy if nothing changed (None saves in full)
+            metrics: Capture record the save timing is added to
+            manifest: Fields recorded with the file in the night's manifest,
+                such as hdrIndex (None leaves the file out of the manifest)
+            quality: JPEG quality passed to the save function (None: its default)
+        """
+        self.image = image
+        self.file_path = file_path
+        self.exif_bytes = exif_bytes
+        self.metadata = metadata or {}
+        self.on_done = on_done
+        self.dedup_key = dedup_key
+        self.metrics = metrics
+        self.manifest = manifest
+        self.quality = quality
+        self.submitted_at = time.time()
+
+
+class SavePipeline:
+    """Producer/consumer pipeline that saves frames on a pool of workers."""
+
+    def __init__(self, num_workers: int = SAVE_WORKERS, max_pending: int = SAVE_QUEUE_SIZE,
+                 save_func: Callable = save_image, dedup: Optional[DuplicateFilter] = None,
+                 renditions: bool = True):
+        """Start the worker threads.
+
+        Args:
+            num_workers: Number of encode/write workers
+            max_pending: Frames allowed to wait in the queue before submit() blocks
+            save_func: Function called as save_func(image, file_path, exif_bytes)
+            dedup: Filter for jobs submitted with a dedup_key
+            renditions: Also write the thumbnail and preview of each frame, and
+                embed an EXIF thumbnail in JPEGs
+                while it is still in memory
+        """
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._save_func = save_func
+        self._dedup = dedup or DuplicateFilter()
+        self._renditions = renditions
+        self._lock = threading.Lock()
+        self._saved = []
+        self._errors = []
+        self._workers = []
+
+        for i in range(num_workers):
+            worker = threading.Thread(
+                target=self._worker_thread,
+                name=f"SavePipeline-Worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, image, file_path: str, exif_bytes: bytes,
+               metadata: Optional[Dict[str, Any]] = None,
+               on_done: Optional[Callable] = None,
+               dedup_key: Optional[Union[int, str]] = None,
+               metrics: Optional[CaptureMetrics] = None,
+               manifest: Optional[Dict[str, Any]] = None,
+               quality: Optional[int] = None):
+        """Queue a frame for saving, blocking while the queue is full.
+
+        Args:
+            image: Frame to save
+            file_path: Destination path
+            exif_bytes: EXIF block to embed
+            metadata: Request metadata for the frame
+            on_done: Called with the frame once it is written (or failed)
+            dedup_key: Write only a proxy if the frame matches the last
+                kept frame of this key (None always saves in full)
+            metrics: Capture record the save timing is added to
+            manifest: Fields recorded with the file in the night's manifest
+            quality: JPEG quality passed to the save function (None: its default)
+        """
+        start = time.time()
+        self._queue.put(SaveJob(image, file_path, exif_bytes, metadata, on_done, dedup_key,
+                                metrics, manifest, quality))
+        waited = time.time() - start
+        if waited > 0.05:
+            logger.debug(f"Save queue full, capture waited {waited:.3f}s")
+
+    def wait(self) -> List[str]:
+        """Wait for every submitted frame to be written.
+
+        Returns:
+            Paths written since the last wait(), in completion order
+        """
+        self._queue.join()
+        with self._lock:
+            saved, self._saved = self._saved, []
+            errors, self._errors = self._errors, []
+
+        for file_path, error in errors:
+            logger.error(f"Failed to save {file_path}: {error}")
+        return saved
+
+    def close(self):
+        """Finish pending saves and stop the workers."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _worker_thread(self):
+        """Worker thread function."""
+        while True:
+            job = self._queue.get()
+            frame = None
+            try:
+                # None is a sentinel value indicating shutdown
+                if job is None:
+                    break
+
+                start = time.time()
+                timing = {}
+
+                options = {} if job.quality is None else {"quality": job.quality}
+
+                # PIL frames are converted to an array once for every rendition
+                if self._renditions:
+                    frame = bgr_frame(job.image)
+
+                exif_bytes = job.exif_bytes
+                if self._renditions and job.file_path.endswith(".jpg"):
+                    # The thumbnail is optional; never lose the photo over it
+                    try:
+                        exif_bytes = embed_exif_thumbnail(exif_bytes, frame)
+                    except Exception as e:
+                        logger.error(f"Error embedding EXIF thumbnail in {job.file_path}: {str(e)}")
+
+                def save(image, file_path, exif_bytes):
+                    # save_array reports its encode and write time
+                    timing.update(self._save_func(image, file_path, exif_bytes, **options) or {})
+
+                if job.dedup_key is not None:
+                    written = self._dedup.save(job.image, job.file_path, exif_bytes,
+                                               job.dedup_key, save)
+                else:
+                    save(job.image, job.file_path, exif_bytes)
+                    written = job.file_path
+                # Raw frames get their renditions when they are developed
+                if self._renditions and not written.endswith(".npz"):
+                    timing.update(save_renditions(frame, written, job.exif_bytes))
+                if job.manifest is not None:
+                    # The frame was taken just before it was submitted
+                    append_manifest(written, job.metadata, {
+                        **job.manifest,
+                        "capturedAt": job.submitted_at,
+                        "proxy": written != job.file_path,
+                    })
+                save_time = time.time() - start
+                logger.info(f"Saved {written} in {save_time:.2f}s")
+                if job.metrics is not None:
+                    timing.update({
+                        "file": os.path.basename(written),
+                        "queued": start - job.submitted_at,
+                        "saveTime": save_time,
+                        "bytes": os.path.getsize(written),
+                    })
+                    job.metrics.add_save(timing)
+                with self._lock:
+                    self._saved.append(written)
+            except Exception as e:
+                logger.error(f"Error in save pipeline worker: {str(e)}")
+                traceback.print_exc()
+                with self._lock:
+                    self._errors.append((job.file_path, str(e)))
+            finally:
+                if job is not None and job.on_done is not None:
+                    job.on_done(job.image)
+                # Drop the frame as soon as it is written
+                job = None
+                frame = None
+                self._queue.task_done()
@@ -0,0 +1,268 @@
+# src/software/capture/planner.py
+"""Storage planner: lower the cost of each photo so the disk lasts.
+
+The old scripts quit once free space fell below PHOTO_STORAGE_MINIMUM, which
+could leave the last nights before a service visit with no photos at all.
+When a NextServiceDate is set, the planner estimates before each photo what
+the rest of the schedule will write:
+
+    shots left   scheduled run time until the visit (schedule_settings.csv)
+                 divided by the measured time between photos
+    bytes/shot   measured bytes per megapixel of recent captures (metrics
+                 log), scaled to each level's quality, resolution and
+                 number of frames
+
+and picks the first of PLANNER_LEVELS (JPEG quality, then exposures, then
+resolution) that fits the free space with PLANNER_MARGIN to spare.
+"""
+import csv
+import logging
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    SCHEDULE_SETTINGS_FILE, METRICS_FILE, PHOTO_STORAGE_MINIMUM, JPEG_QUALITY,
+    PLANNER_HISTORY, PLANNER_PHOTO_INTERVAL, PLANNER_MAX_SESSION_GAP, PLANNER_MARGIN,
+    PLANNER_LEVELS, JPEG_RELATIVE_SIZE
+)
+from .metrics import recent_records
+from .settings import CaptureSettings
+
+logger = logging.getLogger(__name__)
+
+
+def jpeg_relative_size(quality: int) -> float:
+    """Size of a JPEG at a quality relative to quality 96, interpolated."""
+    qualities = sorted(JPEG_RELATIVE_SIZE)
+    quality = min(max(quality, qualities[0]), qualities[-1])
+    for low, high in zip(qualities, qualities[1:]):
+        if low <= quality <= high:
+            fraction = (quality - low) / (high - low)
+            low_size, high_size = JPEG_RELATIVE_SIZE[low], JPEG_RELATIVE_SIZE[high]
+            return low_size + fraction * (high_size - low_size)
+    return JPEG_RELATIVE_SIZE[qualities[0]]
+
+
+def _parse_list(value: str, every: Sequence[int]) -> List[int]:
+    """Parse a semicolon-separated schedule value such as "19;21;23"."""
+    value = value.strip()
+    if not value or value.upper().startswith("EVERY") or value == "*":
+        return list(every)
+    return [int(part) for part in value.split(";") if part.strip()]
+
+
+def load_schedule(file_path: str = SCHEDULE_SETTINGS_FILE) -> Dict[str, Any]:
+    """Read the wake-up schedule the Scheduler sets.
+
+    Args:
+        file_path: schedule_settings.csv
+
+    Returns:
+        Wake-up hours, minute, cron weekdays (0 and 7 are Sunday) and run
+        time in minutes (0 runs until the next wake-up)
+    """
+    values = {}
+    with open(file_path, "r") as csv_file:
+        for row in csv.DictReader(csv_file):
+            if row.get("SETTING"):
+                values[row["SETTING"].strip()] = (row.get("VALUE") or "").strip()
+
+    return {
+        "hours": _parse_list(values.get("hour", ""), range(24)),
+        "minute": int(values.get("minute") or 0),
+        "weekdays": {day % 7 for day in _parse_list(values.get("weekday", ""), range(7))},
+        "runtime": int(values.get("runtime") or 0),
+    }
+
+
+def scheduled_seconds(schedule: Dict[str, Any], start: datetime, end: datetime) -> float:
+    """Seconds the device is scheduled to be running between two times.
+
+    Args:
+        schedule: Schedule from load_schedule
+        start: Start of the period (usually now)
+        end: End of the period
+
+    Returns:
+        Scheduled run time within the period
+    """
+    if end <= start:
+        return 0.0
+    # A runtime of 0 keeps running, so the whole period counts
+    if not schedule["runtime"]:
+        return (end - start).total_seconds()
+
+    runtime = timedelta(minutes=schedule["runtime"])
+    total = 0.0
+    # Start a day early for a session that is already running
+    day = start.date() - timedelta(days=1)
+    while day <= end.date():
+        if day.isoweekday() % 7 in schedule["weekdays"]:
+            for hour in schedule["hours"]:
+                session_start = datetime(day.year, day.month, day.day, hour, schedule["minute"])
+                overlap = min(session_start + runtime, end) - max(session_start, start)
+                total += max(0.0, overlap.total_seconds())
+        day += timedelta(days=1)
+    return total
+
+
+class StoragePlan:
+    """Quality, resolution and exposures to use for the next photo."""
+
+    def __init__(self, level: int, quality: int, resolution: Optional[Tuple[int, int]],
+                 max_exposures: Optional[int], reason: str,
+                 estimate: Optional[Dict[str, Any]] = None):
+        """Initialize the plan.
+
+        Args:
+            level: Index in PLANNER_LEVELS (0 is full quality)
+            quality: JPEG quality
+            resolution: Still resolution (None: the strategy's own)
+            max_exposures: Most exposures per photo (None: all)
+            reason: Why this level was picked
+            estimate: Figures the decision was based on
+        """
+        self.level = level
+        self.quality = quality
+        self.resolution = resolution
+        self.max_exposures = max_exposures
+        self.reason = reason
+        self.estimate = estimate or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, as recorded in the capture metrics."""
+        return {
+            "level": self.level,
+            "quality": self.quality,
+            "resolution": list(self.resolution) if self.resolution else None,
+            "maxExposures": self.max_exposures,
+            "reason": self.reason,
+            **self.estimate,
+        }
+
+
+FULL_QUALITY = StoragePlan(0, JPEG_QUALITY, None, None, "planner off")
+
+
+class StoragePlanner:
+    """Picks a StoragePlan before each photo."""
+
+    def __init__(self, schedule_path: str = SCHEDULE_SETTINGS_FILE,
+                 metrics_path: str = METRICS_FILE,
+                 levels: Sequence[Tuple] = PLANNER_LEVELS,
+                 reserve: float = PHOTO_STORAGE_MINIMUM * 1024**3):
+        """Initialize the planner.
+
+        Args:
+            schedule_path: schedule_settings.csv
+            metrics_path: Capture metrics log the costs are measured from
+            levels: (quality, resolution, max exposures) from best to cheapest
+            reserve: Bytes that are never planned for
+        """
+        self.schedule_path = schedule_path
+        self.metrics_path = metrics_path
+        self.levels = levels
+        self.reserve = reserve
+        self._last_level = None
+
+    def measure(self) -> Tuple[Optional[float], float]:
+        """Measure recent captures.
+
+        Returns:
+            Bytes per frame-megapixel at full quality (None without history)
+            and the median seconds between photos within a session
+        """
+        records = recent_records(PLANNER_HISTORY, self.metrics_path)
+
+        costs = []
+        for record in records:
+            files = record.get("files") or 0
+            written = record.get("bytesWritten") or 0
+            if not files or not written:
+                continue
+            # Records from before the planner don't have the resolution
+            width, height = record.get("resolution") or (0, 0)
+            megapixels = width * height / 1e6
+            if not megapixels:
+                continue
+            quality = record.get("jpegQuality", JPEG_QUALITY)
+            costs.append(written / (files * megapixels * jpeg_relative_size(quality)))
+
+        starts = sorted(record["startedAt"] for record in records if "startedAt" in record)
+        gaps = [b - a for a, b in zip(starts, starts[1:]) if 0 < b - a < PLANNER_MAX_SESSION_GAP]
+
+        cost = statistics.mean(costs) if costs else None
+        interval = statistics.median(gaps) if gaps else PLANNER_PHOTO_INTERVAL
+        return cost, interval
+
+    def plan(self, settings: CaptureSettings, frames_per_shot: Callable[[Optional[int]], int],
+             full_resolution: Tuple[int, int],
+             available: float, now: Optional[datetime] = None) -> StoragePlan:
+        """Pick the best level whose projected usage fits the free space.
+
+        Args:
+            settings: Current settings (NextServiceDate)
+            frames_per_shot: Called with a level's max exposures, returns the
+                frames the photo will write
+            full_resolution: Resolution the strategy would use on its own
+            available: Free bytes
+            now: Current time (default: now)
+
+        Returns:
+            StoragePlan
+        """
+        if settings.next_service_date is None:
+            return FULL_QUALITY
+
+        now = now or datetime.now()
+        # A visit happens during the day, after that morning's photos
+        visit = datetime.combine(settings.next_service_date, datetime.min.time()) + timedelta(hours=12)
+        try:
+            schedule = load_schedule(self.schedule_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Storage planner can't read the schedule: {e}")
+            return FULL_QUALITY
+
+        cost, interval = self.measure()
+        if cost is None:
+            return self._decide(0, "no captures measured yet", {})
+
+        shots = scheduled_seconds(schedule, now, visit) / interval
+        budget = available - self.reserve
+        estimate = {"shotsLeft": round(shots), "photoInterval": round(interval, 1),
+                    "budget": int(budget)}
+
+        for level, (quality, resolution, max_exposures) in enumerate(self.levels):
+            width, height = resolution or full_resolution
+            # A level never raises the resolution the strategy asked for
+            if width * height > full_resolution[0] * full_resolution[1]:
+                width, height = full_resolution
+            shot_bytes = (cost * width * height / 1e6 * jpeg_relative_size(quality)
+                          * frames_per_shot(max_exposures))
+            estimate["projected"] = int(shots * shot_bytes)
+            if shots * shot_bytes * PLANNER_MARGIN <= budget:
+                return self._decide(level, f"fits until {visit:%Y-%m-%d}", estimate)
+
+        return self._decide(len(self.levels) - 1,
+                            f"storage runs out before {visit:%Y-%m-%d} even at the lowest level",
+                            estimate)
+
+    def _decide(self, level: int, reason: str, estimate: Dict[str, Any]) -> StoragePlan:
+        """Build the plan for a level and log it when the level changes."""
+        quality, resolution, max_exposures = self.levels[level]
+        plan = StoragePlan(level, quality, resolution, max_exposures, reason, estimate)
+
+        size = "full" if resolution is None else f"{resolution[0]}x{resolution[1]}"
+        exposures = "all" if max_exposures is None else max_exposures
+        message = (f"Storage plan level {level}: quality {quality}, {size} resolution, "
+                   f"{exposures} exposure(s), {reason}")
+        if "projected" in estimate:
+            message += (f" ({estimate['shotsLeft']} photos left need "
+                        f"{estimate['projected'] / 1024**3:.1f} of {estimate['budget'] / 1024**3:.1f} GB)")
+        if level != self._last_level:
+            logger.info(message)
+        else:
+            logger.debug(message)
+        self._last_level = level
+        return plan
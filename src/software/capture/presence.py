@@ -0,0 +1,152 @@
+# src/software/capture/presence.py
+"""Presence trigger: only take a photo when something changed on the sheet.
+
+A tiny lores stream is compared against a running-average background. The
+changed pixels are cleaned up with a morphological open and counted both
+as a fraction of the frame and as connected blobs; crossing either
+threshold means something arrived (or left). Photos are still spaced at
+least min_interval apart and taken at least every max_interval, so the
+sheet is documented even on a quiet night.
+"""
+import time
+import logging
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from .config import (
+    PRESENCE_LEARNING_RATE, PRESENCE_PIXEL_THRESHOLD, PRESENCE_MIN_AREA,
+    PRESENCE_MIN_BLOBS, PRESENCE_BLOB_MIN_PIXELS, PRESENCE_MIN_INTERVAL,
+    PRESENCE_MAX_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+_OPEN_KERNEL = np.ones((3, 3), np.uint8)
+
+
+class BackgroundModel:
+    """Running-average background of a grayscale stream."""
+
+    def __init__(self, learning_rate: float = PRESENCE_LEARNING_RATE,
+                 pixel_threshold: int = PRESENCE_PIXEL_THRESHOLD):
+        """Initialize the model.
+
+        Args:
+            learning_rate: Weight of each new frame in the background
+            pixel_threshold: Grey-level difference that counts as changed
+        """
+        self.learning_rate = learning_rate
+        self.pixel_threshold = pixel_threshold
+        self.background = None
+
+    def reset(self):
+        """Forget the background; the next frame becomes the new one."""
+        self.background = None
+
+    def apply(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Compare a frame with the background, then learn from it.
+
+        Args:
+            gray: 2D uint8 frame
+
+        Returns:
+            Boolean mask of changed pixels, or None for the first frame
+        """
+        frame = cv2.GaussianBlur(gray, (3, 3), 0).astype(np.float32)
+        if self.background is None or self.background.shape != frame.shape:
+            self.background = frame
+            return None
+
+        changed = np.abs(frame - self.background) > self.pixel_threshold
+        cv2.accumulateWeighted(frame, self.background, self.learning_rate)
+        return changed
+
+
+def measure_change(mask: np.ndarray,
+                   blob_min_pixels: int = PRESENCE_BLOB_MIN_PIXELS) -> Dict[str, Any]:
+    """Measure a change mask.
+
+    Args:
+        mask: Boolean mask of changed pixels
+        blob_min_pixels: Smallest blob that is counted
+
+    Returns:
+        Changed fraction of the frame and number of blobs
+    """
+    cleaned = cv2.morphologyEx(mask.astype(np.uint8), cv2.MORPH_OPEN, _OPEN_KERNEL)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(cleaned, connectivity=8)
+    # Label 0 is the unchanged background
+    areas = stats[1:count, cv2.CC_STAT_AREA]
+    return {
+        "changedFraction": float(np.count_nonzero(cleaned)) / cleaned.size,
+        "blobs": int(np.count_nonzero(areas >= blob_min_pixels)),
+    }
+
+
+class PresenceTrigger:
+    """Decides when a watched stream warrants a full-resolution photo."""
+
+    def __init__(self, min_area: float = PRESENCE_MIN_AREA, min_blobs: int = PRESENCE_MIN_BLOBS,
+                 min_interval: float = PRESENCE_MIN_INTERVAL,
+                 max_interval: float = PRESENCE_MAX_INTERVAL,
+                 model: Optional[BackgroundModel] = None):
+        """Initialize the trigger.
+
+        Args:
+            min_area: Changed fraction of the frame that triggers a photo
+            min_blobs: Number of changed blobs that triggers a photo
+            min_interval: Seconds that must pass between photos
+            max_interval: Seconds after which a photo is taken regardless
+            model: Background model (default: a new BackgroundModel)
+        """
+        self.min_area = min_area
+        self.min_blobs = min_blobs
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.model = model or BackgroundModel()
+        self.last_fired = time.time()
+        self._pending = None
+
+    def reset(self, now: Optional[float] = None):
+        """Start a new interval after a photo was taken.
+
+        The background is rebuilt from the next frame, so whatever was just
+        photographed doesn't trigger again.
+        """
+        self.last_fired = time.time() if now is None else now
+        self._pending = None
+        self.model.reset()
+
+    def update(self, gray: np.ndarray, now: Optional[float] = None) -> Optional[str]:
+        """Feed one frame.
+
+        A change seen before min_interval has passed is remembered, so an
+        insect that lands and sits still is still photographed once the
+        interval is up, even after the background has absorbed it.
+
+        Args:
+            gray: 2D uint8 lores frame
+            now: Frame time (default: now)
+
+        Returns:
+            Reason to take a photo now, or None
+        """
+        if now is None:
+            now = time.time()
+
+        mask = self.model.apply(gray)
+        if mask is not None and self._pending is None:
+            change = measure_change(mask)
+            if change["changedFraction"] >= self.min_area or change["blobs"] >= self.min_blobs:
+                self._pending = (f"{change['changedFraction']:.2%} changed, "
+                                 f"{change['blobs']} blob(s)")
+                logger.debug(f"Presence change: {self._pending}")
+
+        elapsed = now - self.last_fired
+        if elapsed >= self.max_interval:
+            return f"no photo for {elapsed:.0f}s"
+        if self._pending is not None and elapsed >= self.min_interval:
+            return self._pending
+        return None
@@ -0,0 +1,140 @@
+# src/software/capture/raw.py
+"""Raw Bayer capture in a losslessly compressed NumPy container.
+
+In raw mode the sensor's unpacked Bayer data is saved instead of the ISP's
+RGB output, together with everything needed to develop it later: Bayer
+order, bit depth, black levels, the colour gains and colour matrix in
+effect, and the EXIF block. The container is an ordinary .npz, so it can
+be opened with np.load() anywhere.
+"""
+import os
+import json
+import time
+import zipfile
+import logging
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from .config import RAW_COMPRESS_LEVEL, COLOUR_GAINS
+
+logger = logging.getLogger(__name__)
+
+
+class RawFrame:
+    """Bayer data with the information needed to develop it."""
+
+    def __init__(self, data: np.ndarray, info: Dict[str, Any], exif_bytes: bytes = b""):
+        """Initialize the frame.
+
+        Args:
+            data: 2D uint16 Bayer mosaic
+            info: bayerOrder, bitDepth, blackLevels, colourGains,
+                colourMatrix and the capture metadata
+            exif_bytes: EXIF block for the developed photo
+        """
+        self.data = data
+        self.info = info
+        self.exif_bytes = exif_bytes
+
+
+def parse_raw_format(raw_format: str) -> Tuple[str, int]:
+    """Bayer order and bit depth of a raw stream format.
+
+    Args:
+        raw_format: Format such as "SRGGB10" or "SBGGR16"
+
+    Returns:
+        (order such as "RGGB", bits per sample)
+    """
+    name = raw_format.split("_")[0]
+    return name[1:5], int(name[5:])
+
+
+def raw_stream_config(picam2) -> Dict[str, Any]:
+    """Raw stream of the full sensor in an unpacked format.
+
+    Unpacked samples are stored one per 16-bit word, which compresses well
+    and needs no bit unpacking later.
+    """
+    raw_format = picam2.sensor_format.split("_")[0]
+    return {"format": raw_format, "size": picam2.sensor_resolution}
+
+
+def raw_frame_from_request(request, picam2,
+                           colour_gains: Tuple[float, float] = COLOUR_GAINS) -> RawFrame:
+    """Copy the raw stream out of a request.
+
+    Args:
+        request: Completed request from a camera with a raw stream
+        picam2: The camera, for the stream configuration
+        colour_gains: Red and blue gains to develop with, if the metadata
+            has none
+
+    Returns:
+        RawFrame (the caller releases the request)
+    """
+    config = picam2.camera_config["raw"]
+    width, height = config["size"]
+    order, bits = parse_raw_format(config["format"])
+    # Rows are padded to the stride; keep only the image
+    data = request.make_array("raw").view(np.uint16)[:height, :width]
+    metadata = request.get_metadata()
+
+    info = {
+        "bayerOrder": order,
+        "bitDepth": bits,
+        "blackLevels": list(metadata.get("SensorBlackLevels", (0, 0, 0, 0))),
+        "colourGains": list(metadata.get("ColourGains", colour_gains)),
+        "colourMatrix": list(metadata.get("ColourCorrectionMatrix", ())),
+        "metadata": {
+            key: metadata[key]
+            for key in ("ExposureTime", "AnalogueGain", "DigitalGain", "LensPosition",
+                        "SensorTimestamp", "SensorTemperature")
+            if key in metadata
+        },
+    }
+    return RawFrame(np.ascontiguousarray(data), info)
+
+
+def save_raw(frame: RawFrame, file_path: str, exif_bytes: bytes,
+             level: int = RAW_COMPRESS_LEVEL) -> Dict[str, float]:
+    """Write a raw frame as a compressed .npz.
+
+    np.savez_compressed always uses zlib's default level, which is several
+    times slower than level 1 for little gain on sensor data, so the
+    archive is written directly. It is renamed into place once complete, so
+    the development job never sees a partial file.
+
+    Args:
+        frame: Raw frame
+        file_path: Destination path (.npz)
+        exif_bytes: EXIF block for the developed photo
+        level: zlib level, 0 to store uncompressed
+
+    Returns:
+        Compress-and-write time, as save_array reports it
+    """
+    start = time.time()
+    arrays = {
+        "raw": frame.data,
+        "info": np.array(json.dumps(frame.info)),
+        "exif": np.frombuffer(exif_bytes or frame.exif_bytes, dtype=np.uint8),
+    }
+    compression = zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED
+    temp_path = file_path + ".tmp"
+    with zipfile.ZipFile(temp_path, "w", compression=compression,
+                         compresslevel=level or None) as archive:
+        for name, array in arrays.items():
+            with archive.open(name + ".npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+    os.replace(temp_path, file_path)
+    logger.info(f"Raw frame saved to {file_path}")
+    return {"encode": time.time() - start}
+
+
+def load_raw(file_path: str) -> RawFrame:
+    """Read a raw frame written by save_raw."""
+    with np.load(file_path, allow_pickle=False) as archive:
+        return RawFrame(archive["raw"], json.loads(str(archive["info"])),
+                        archive["exif"].tobytes())
@@ -0,0 +1,144 @@
+# src/software/capture/renditions.py
+"""Thumbnail and preview renditions written at save time.
+
+The gallery used to make every thumbnail by decoding the full 64MP JPEG
+again. The frame is already in memory when it is saved, so the save stage
+writes a ~1600px preview and a 200px square thumbnail next to the photo
+in the same pass. The preview is made from the full frame with a strided
+INTER_AREA resize, and the thumbnail is made from the preview, so the
+full frame is only read once.
+
+JPEGs also get a small thumbnail in their EXIF block, so the photo carries
+its own thumbnail when it is copied off the device without the renditions.
+"""
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+import piexif
+from PIL import Image
+
+from .config import (
+    THUMBNAIL_SUFFIX, PREVIEW_SUFFIX, THUMBNAIL_SIZE, PREVIEW_WIDTH, RENDITION_QUALITY,
+    EXIF_THUMBNAIL_WIDTH, EXIF_THUMBNAIL_QUALITY
+)
+from .saving import write_jpeg
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SUFFIXES = (THUMBNAIL_SUFFIX, PREVIEW_SUFFIX)
+
+# An APP1 segment holds at most 64 KB including its length field
+MAX_EXIF_SIZE = 65533
+
+
+def thumbnail_path(file_path: str) -> str:
+    """Path of a photo's thumbnail."""
+    return os.path.splitext(file_path)[0] + THUMBNAIL_SUFFIX
+
+
+def preview_path(file_path: str) -> str:
+    """Path of a photo's preview."""
+    return os.path.splitext(file_path)[0] + PREVIEW_SUFFIX
+
+
+def is_rendition(file_path: str) -> bool:
+    """Whether a file is a rendition rather than a photo."""
+    return file_path.lower().endswith(RENDITION_SUFFIXES)
+
+
+def bgr_frame(frame) -> np.ndarray:
+    """BGR array of a frame; PIL images are converted, arrays returned as they are.
+
+    Convert once per frame and pass the array to embed_exif_thumbnail() and
+    save_renditions(), since each conversion copies the whole frame.
+    """
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))[:, :, ::-1]
+    return frame
+
+
+def downscale(frame: np.ndarray, width: int) -> np.ndarray:
+    """Shrink a frame to a width, keeping the aspect ratio.
+
+    Striding first keeps INTER_AREA from reading every pixel of a 190 MB
+    frame; the stride still leaves at least twice the target resolution.
+    """
+    if frame.shape[1] <= width:
+        return frame
+    step = max(1, frame.shape[1] // (width * 2))
+    small = frame[::step, ::step]
+    height = max(1, round(small.shape[0] * width / small.shape[1]))
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def square_thumbnail(frame: np.ndarray, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    """Centre-cropped square thumbnail of a frame."""
+    height, width = frame.shape[:2]
+    side = min(height, width)
+    top, left = (height - side) // 2, (width - side) // 2
+    crop = frame[top:top + side, left:left + side]
+    return cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def embed_exif_thumbnail(exif_bytes: bytes, frame, width: int = EXIF_THUMBNAIL_WIDTH,
+                         quality: int = EXIF_THUMBNAIL_QUALITY) -> bytes:
+    """Add a JPEG thumbnail of a frame to an EXIF block.
+
+    Args:
+        exif_bytes: EXIF block from build_exif
+        frame: HxWx3 BGR array (or a PIL image) the photo is saved from
+        width: Thumbnail width in pixels
+        quality: JPEG quality
+
+    Returns:
+        EXIF block with the thumbnail in its 1st IFD, or exif_bytes unchanged
+        if the thumbnail doesn't fit
+    """
+    thumbnail = downscale(bgr_frame(frame), width)
+    ok, jpeg = cv2.imencode(".jpg", thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise IOError("Failed to encode EXIF thumbnail")
+
+    exif_dict = piexif.load(exif_bytes)
+    exif_dict["1st"][piexif.ImageIFD.Compression] = 6  # JPEG
+    exif_dict["thumbnail"] = jpeg.tobytes()
+    embedded = piexif.dump(exif_dict)
+    if len(embedded) > MAX_EXIF_SIZE:
+        logger.warning(f"EXIF thumbnail of {len(jpeg)} bytes doesn't fit, leaving it out")
+        return exif_bytes
+    return embedded
+
+
+def _write(path: str, frame: np.ndarray, exif_bytes: Optional[bytes], quality: int):
+    """Encode and write one rendition."""
+    ok, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise IOError(f"Failed to encode {path}")
+    write_jpeg(path, jpeg, exif_bytes)
+
+
+def save_renditions(frame, file_path: str, exif_bytes: Optional[bytes] = None,
+                    preview_width: int = PREVIEW_WIDTH, thumbnail_size: int = THUMBNAIL_SIZE,
+                    quality: int = RENDITION_QUALITY) -> Dict[str, float]:
+    """Write the preview and thumbnail of a photo next to it.
+
+    Args:
+        frame: HxWx3 BGR array (or a PIL image) the photo was saved from
+        file_path: Path of the photo
+        exif_bytes: EXIF block to embed in the renditions (None: no EXIF)
+        preview_width: Preview width in pixels
+        thumbnail_size: Thumbnail side in pixels
+        quality: JPEG quality
+
+    Returns:
+        Time spent making the renditions
+    """
+    start = time.time()
+    preview = np.ascontiguousarray(downscale(bgr_frame(frame), preview_width))
+    _write(preview_path(file_path), preview, exif_bytes, quality)
+    _write(thumbnail_path(file_path), square_thumbnail(preview, thumbnail_size), exif_bytes, quality)
+    return {"renditions": time.time() - start}
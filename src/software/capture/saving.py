@@ -0,0 +1,159 @@
+# src/software/capture/saving.py
+"""File naming, EXIF and saving for captured frames."""
+import os
+import time
+import logging
+from typing import Dict, Any, Optional, Union
+
+import cv2
+import numpy as np
+import piexif
+from PIL import Image
+
+from .config import JPEG_QUALITY, DEVICE_MAKE, CAMERA_MAKE
+from .jpeg import encode_striped, use_striped
+from .raw import save_raw
+
+logger = logging.getLogger(__name__)
+
+# ImageFileType setting -> file extension
+FILE_EXTENSIONS = {0: "jpg", 1: "png", 2: "bmp", 3: "npz"}
+
+
+def photo_path(folder: str, device_name: str, timestamp: str, index: Union[int, str],
+               image_file_type: int = 0, camera: int = 0) -> str:
+    """Build the path for one frame of a capture.
+
+    Args:
+        folder: Dated folder for the night
+        device_name: Device name from controls.txt
+        timestamp: Capture timestamp (YYYY_MM_DD__HH_MM_SS)
+        index: HDR index of the frame ("F" for a fused bracket)
+        image_file_type: ImageFileType setting
+        camera: Camera number on multi-camera rigs; camera 0 has no suffix,
+            the others get _b, _c, ... as the stereo script always did
+
+    Returns:
+        Full file path
+    """
+    extension = FILE_EXTENSIONS.get(image_file_type, "jpg")
+    suffix = f"_{chr(ord('a') + camera)}" if camera else ""
+    return os.path.join(folder, f"{device_name}_{timestamp}_HDR{index}{suffix}.{extension}")
+
+
+def build_exif(exposure_time: int, controls: Dict[str, Any]) -> bytes:
+    """Build the EXIF block written into every photo.
+
+    Args:
+        exposure_time: Exposure time of the frame in microseconds
+        controls: Camera controls the frame was taken with
+
+    Returns:
+        EXIF bytes for piexif / PIL
+    """
+    lens_position = controls.get("LensPosition", 0)
+    gain = controls.get("AnalogueGain", 1.0)
+
+    zeroth_ifd = {piexif.ImageIFD.Make: DEVICE_MAKE}
+    exif_ifd = {
+        piexif.ExifIFD.ExposureTime: (1, int(1 / (abs(exposure_time) / 1000000))),
+        # Purposefully shifted digits for more sig figs
+        piexif.ExifIFD.FocalLength: (int(lens_position * 100), 10),
+        piexif.ExifIFD.ISOSpeed: int(gain * 100),
+        piexif.ExifIFD.ISOSpeedRatings: int(gain * 100),
+    }
+    first_ifd = {
+        piexif.ImageIFD.Make: CAMERA_MAKE,
+        piexif.ImageIFD.Software: "piexif",
+    }
+
+    exif_dict = {"0th": zeroth_ifd, "Exif": exif_ifd, "GPS": {}, "1st": first_ifd}
+    return piexif.dump(exif_dict)
+
+
+def save_image(image, file_path: str, exif_bytes: bytes, quality: int = JPEG_QUALITY):
+    """Save a PIL image with EXIF data.
+
+    Args:
+        image: PIL image
+        file_path: Destination path
+        exif_bytes: EXIF block from build_exif
+        quality: JPEG quality
+    """
+    image.save(file_path, exif=exif_bytes, quality=quality)
+    logger.info(f"Image saved to {file_path}")
+
+
+def exif_segment(exif_bytes: bytes) -> bytes:
+    """Wrap an EXIF block in a JPEG APP1 marker segment."""
+    return b"\xff\xe1" + (len(exif_bytes) + 2).to_bytes(2, "big") + exif_bytes
+
+
+def write_jpeg(file_path: str, jpeg, exif_bytes: Optional[bytes]):
+    """Write encoded JPEG data with an EXIF segment spliced in after SOI.
+
+    Like piexif.insert(), a JFIF APP0 segment is replaced by the EXIF APP1.
+    Without an EXIF block the encoded data is written as it is.
+    The encoded data is written through a memoryview so it isn't copied.
+
+    Args:
+        file_path: Destination path
+        jpeg: Encoded JPEG (bytes or a uint8 array from cv2.imencode), or a
+            list of chunks from encode_striped()
+        exif_bytes: EXIF block from build_exif, or None for no EXIF segment
+    """
+    chunks = jpeg if isinstance(jpeg, list) else [jpeg]
+    data = memoryview(chunks[0]).cast("B")
+    body = data[2:]
+    if exif_bytes and bytes(data[2:4]) == b"\xff\xe0":
+        body = data[4 + int.from_bytes(data[4:6], "big"):]
+
+    with open(file_path, "wb") as f:
+        f.write(b"\xff\xd8")
+        if exif_bytes:
+            f.write(exif_segment(exif_bytes))
+        f.write(body)
+        for chunk in chunks[1:]:
+            f.write(chunk)
+
+
+def save_array(frame: np.ndarray, file_path: str, exif_bytes: bytes,
+               quality: int = JPEG_QUALITY) -> Dict[str, float]:
+    """Save a frame array without building a PIL image.
+
+    Frames from the RGB888 stream are stored B, G, R in memory, which is
+    exactly what OpenCV expects. Raw frames (.npz) go to save_raw.
+
+    Args:
+        frame: HxWx3 uint8 array in BGR order, or a RawFrame
+        file_path: Destination path
+        exif_bytes: EXIF block from build_exif
+        quality: JPEG quality
+
+    Returns:
+        Encode and write time of JPEGs (other formats are written in one step)
+    """
+    if file_path.endswith(".npz"):
+        return save_raw(frame, file_path, exif_bytes)
+
+    timing = {}
+    if file_path.endswith(".jpg"):
+        start = time.time()
+        if use_striped(frame):
+            # Large frames are encoded in strips across all cores
+            jpeg = encode_striped(frame, quality)
+        else:
+            ok, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            if not ok:
+                raise IOError(f"Failed to encode {file_path}")
+        encoded = time.time()
+        write_jpeg(file_path, jpeg, exif_bytes)
+        timing = {"encode": encoded - start, "write": time.time() - encoded}
+    elif file_path.endswith(".png"):
+        # PNG is slow anyway; go through PIL so the EXIF chunk is kept
+        Image.fromarray(frame[:, :, ::-1]).save(file_path, exif=exif_bytes)
+    else:
+        if not cv2.imwrite(file_path, frame):
+            raise IOError(f"Failed to write {file_path}")
+    logger.info(f"Image saved to {file_path}")
+    return timing
@@ -0,0 +1,404 @@
+# src/software/capture/session.py
+"""Warm Picamera2 session shared by everything that takes photos.
+
+Opening and configuring the 64MP sensor takes seconds, so a session opens
+the camera once, builds the still and preview configurations once, and only
+starts/stops streaming between shots.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+from picamera2 import Picamera2
+from libcamera import Transform
+
+from .config import (
+    COLOUR_GAINS, PREVIEW_RESOLUTION, FOCUS_RESOLUTION, FOCUS_LORES_RESOLUTION,
+    FOCUS_FRAME_DURATION_LIMITS, PRESENCE_RESOLUTION, PRESENCE_LORES_RESOLUTION,
+    PRESENCE_FRAME_DURATION, IMAGE_FILE_RAW, RAW_MAIN_RESOLUTION
+)
+from .bracket import BracketEngine
+from .burst import BurstEngine
+from .focus import FocusEngine
+from .buffers import FramePool
+from .hardware import FlashController
+from .metrics import CaptureMetrics
+from .raw import raw_stream_config, raw_frame_from_request
+from .settings import CaptureSettings, capture_resolution, determine_pi_model
+
+logger = logging.getLogger(__name__)
+
+STILL = "still"
+PREVIEW = "preview"
+FOCUS = "focus"
+PRESENCE = "presence"
+
+
+class CameraSession:
+    """Long-lived camera session holding still and preview configurations."""
+
+    def __init__(self, settings: CaptureSettings, flash: FlashController,
+                 camera_num: int = 0, resolution: Optional[Tuple[int, int]] = None,
+                 idle_timeout: float = 300, frame_pool: Optional[FramePool] = None,
+                 buffer_count: int = 1):
+        """Open the camera.
+
+        Args:
+            settings: Capture settings to apply
+            flash: Flash relay controller
+            camera_num: Picamera2 camera index
+            resolution: Still resolution (default: maximum for this Pi model)
+            idle_timeout: Seconds without a shot before streaming is stopped
+                (0 keeps the camera streaming)
+            frame_pool: Capture into these preallocated arrays instead of
+                making a PIL image per frame
+            buffer_count: Camera buffers in the still mode
+        """
+        self.settings = settings
+        self.flash = flash
+        self.camera_num = camera_num
+        self.default_resolution = capture_resolution(determine_pi_model())
+        self.resolution = resolution or self.default_resolution
+        self.buffer_count = buffer_count
+        self.idle_timeout = idle_timeout
+        self.frame_pool = frame_pool
+
+        self.picam2 = Picamera2(camera_num)
+        self._lock = threading.RLock()
+        self._mode = None
+        self._started = False
+        self._idle_timer = None
+
+        self.still_config = None
+        self.preview_config = None
+        self.focus_config = None
+        self.presence_config = None
+        self._build_configurations()
+
+    @property
+    def raw_capture(self) -> bool:
+        """Whether photos are saved as raw Bayer data (ImageFileType 3)."""
+        return self.settings.image_file_type == IMAGE_FILE_RAW
+
+    def _build_configurations(self):
+        """Create the still and preview configurations for the current settings."""
+        if self.settings.vertical_flip:
+            transform = Transform(vflip=True, hflip=True)
+        else:
+            transform = Transform()
+
+        capture_main = {"size": self.resolution, "format": "RGB888"}
+        capture_raw = None
+        if self.raw_capture:
+            # Only the Bayer data is saved; the ISP output just has to exist
+            capture_main = {"size": RAW_MAIN_RESOLUTION, "format": "RGB888"}
+            capture_raw = raw_stream_config(self.picam2)
+        self.still_config = self.picam2.create_still_configuration(
+            main=capture_main, transform=transform, raw=capture_raw, lores=None,
+            buffer_count=self.buffer_count
+        )
+        self.preview_config = self.picam2.create_preview_configuration(
+            main={"size": PREVIEW_RESOLUTION}
+        )
+        self.focus_config = self.picam2.create_video_configuration(
+            main={"size": FOCUS_RESOLUTION}, lores={"size": FOCUS_LORES_RESOLUTION},
+            transform=transform, controls={"FrameDurationLimits": FOCUS_FRAME_DURATION_LIMITS}
+        )
+        # Watched under the attract light only, so exposure is left to the AE
+        self.presence_config = self.picam2.create_video_configuration(
+            main={"size": PRESENCE_RESOLUTION}, lores={"size": PRESENCE_LORES_RESOLUTION},
+            transform=transform,
+            controls={
+                "FrameDurationLimits": (PRESENCE_FRAME_DURATION, PRESENCE_FRAME_DURATION),
+                "AeEnable": True,
+            }
+        )
+
+    def open(self):
+        """Configure the still mode, apply settings and let the sensor settle once."""
+        with self._lock:
+            self._configure(STILL)
+            self.apply_controls()
+            self.start()
+            # Only paid once per session instead of once per photo
+            time.sleep(1)
+            logger.info(f"Camera {self.camera_num} ready at {self.resolution[0]}x{self.resolution[1]}")
+
+    def _configure(self, mode: str):
+        """Configure the camera for a mode, stopping it first if needed."""
+        if self._mode == mode:
+            return
+        self.stop()
+        configs = {
+            STILL: self.still_config, PREVIEW: self.preview_config,
+            FOCUS: self.focus_config, PRESENCE: self.presence_config,
+        }
+        self.picam2.configure(configs[mode])
+        previous, self._mode = self._mode, mode
+        if previous == PRESENCE:
+            # Put the calibrated manual exposure back after watching with AE
+            self.apply_controls({"AeEnable": False})
+
+    def start(self):
+        """Start streaming if not already started."""
+        if not self._started:
+            self.picam2.start()
+            self._started = True
+
+    def stop(self):
+        """Stop streaming, keeping the configuration."""
+        if self._started:
+            self.picam2.stop()
+            self._started = False
+
+    def apply_controls(self, controls: Optional[Dict[str, Any]] = None):
+        """Apply the settings controls plus locked colour gains.
+
+        Args:
+            controls: Extra controls applied on top of the settings
+        """
+        merged = dict(self.settings.controls)
+        merged["ColourGains"] = COLOUR_GAINS
+        if controls:
+            merged.update(controls)
+        self.picam2.set_controls(merged)
+
+    def update_settings(self, settings: CaptureSettings):
+        """Switch to new settings, reconfiguring only if the transform or raw mode changed.
+
+        Args:
+            settings: Newly loaded capture settings
+        """
+        with self._lock:
+            reconfigure = (settings.vertical_flip != self.settings.vertical_flip
+                           or settings.image_file_type != self.settings.image_file_type)
+            self.settings = settings
+            if reconfigure:
+                self._build_configurations()
+                mode = self._mode
+                self._mode = None
+                self._configure(mode or STILL)
+            self.apply_controls()
+
+    def set_still_options(self, resolution: Optional[Tuple[int, int]] = None,
+                          buffer_count: int = 1):
+        """Change the still resolution or buffer count.
+
+        The camera stays open; the still mode is only reconfigured if
+        something actually changed, and the frame pool is reallocated only
+        if the resolution did.
+
+        Args:
+            resolution: Still resolution (default: maximum for this Pi model)
+            buffer_count: Camera buffers in the still mode
+        """
+        resolution = tuple(resolution or self.default_resolution)
+        with self._lock:
+            if resolution == self.resolution and buffer_count == self.buffer_count:
+                return
+            logger.info(f"Camera {self.camera_num} still mode: {resolution[0]}x{resolution[1]}, "
+                        f"{buffer_count} buffer(s)")
+            self.resolution = resolution
+            self.buffer_count = buffer_count
+            self._build_configurations()
+
+            shape = (resolution[1], resolution[0], 3)
+            if self.frame_pool is not None and self.frame_pool.shape != shape:
+                self.frame_pool = FramePool(shape, self.frame_pool.count)
+            if self._mode == STILL:
+                self._mode = None
+                self._configure(STILL)
+
+    @contextmanager
+    def still(self, metrics: Optional[CaptureMetrics] = None) -> Iterator[Any]:
+        """Hold the camera streaming in the still mode for a capture.
+
+        Args:
+            metrics: Capture record for the configure time
+
+        Yields:
+            The started Picamera2 instance
+        """
+        with self._lock:
+            self._cancel_idle_stop()
+            configure_start = time.time()
+            self._configure(STILL)
+            self.start()
+            if metrics is not None:
+                metrics.add_phase("configure", time.time() - configure_start)
+            try:
+                yield self.picam2
+            finally:
+                self._schedule_idle_stop()
+
+    def capture_frames(self, exposure_times: List[int],
+                       on_frame: Optional[Callable[[int, Any, Dict[str, Any]], None]] = None,
+                       metrics: Optional[CaptureMetrics] = None
+                       ) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Capture one frame per exposure time with the flash on.
+
+        Args:
+            exposure_times: Exposure times in microseconds
+            on_frame: Called as on_frame(index, image, metadata) as soon as each
+                frame is captured, before the next exposure starts. Frames
+                handed to on_frame are not kept in the returned list.
+            metrics: Capture record for the configure and capture time and
+                the timing of each exposure
+
+        Returns:
+            List of (frame, metadata) tuples. Frames are RawFrames in raw
+            mode, otherwise PIL images, or pooled BGR arrays when the
+            session has a frame pool; pooled arrays must be released back
+            to the pool.
+        """
+        with self.still(metrics) as picam2:
+            if self.raw_capture:
+                make_frame = lambda request: raw_frame_from_request(request, picam2)
+            elif self.frame_pool is not None:
+                make_frame = lambda request: self.frame_pool.copy_from_request(request, "main")
+            else:
+                make_frame = lambda request: request.make_image("main")
+
+            engine = BracketEngine(picam2, self.flash.on, self.flash.release)
+            capture_start = time.time()
+            frames = engine.capture(exposure_times, make_frame, on_frame)
+            if metrics is not None:
+                metrics.add_phase("capture", time.time() - capture_start)
+                for timing in engine.timings:
+                    metrics.add_exposure(timing)
+            return frames
+
+    def capture_burst(self, exposure_time: int, count: int, keep: int, score: int,
+                      metrics: Optional[CaptureMetrics] = None
+                      ) -> List[Tuple[int, Any, Dict[str, Any]]]:
+        """Capture a burst with the flash on and keep its best frames.
+
+        Args:
+            exposure_time: Exposure time in microseconds
+            count: Frames in the burst
+            keep: Frames kept
+            score: BURST_SCORE_SHARPNESS or BURST_SCORE_MOTION
+            metrics: Capture record for the configure and capture time
+
+        Returns:
+            (frame number, pooled BGR array, metadata) for the kept frames;
+            the arrays must be released back to the pool
+        """
+        with self.still(metrics) as picam2:
+            engine = BurstEngine(picam2, self.frame_pool, self.flash.on, self.flash.release,
+                                 score=score)
+            capture_start = time.time()
+            kept = engine.capture(count, keep, exposure_time)
+            if metrics is not None:
+                metrics.add_phase("capture", time.time() - capture_start)
+            return [(number, frame, metadata) for number, frame, metadata, _ in kept]
+
+    def calibrate(self) -> Dict[str, Any]:
+        """Run auto exposure, then a focus sweep, with the flash on.
+
+        Returns:
+            Calibrated LensPosition, ExposureTime and AnalogueGain, plus the
+            focus run time and flash-on time
+        """
+        with self._lock:
+            self._cancel_idle_stop()
+            self._configure(PREVIEW)
+            self.picam2.set_controls({"LensPosition": 7.0})
+            # We lock the exposure time to stop blurry insects and let the gain adjust
+            self.picam2.set_controls({"ExposureValue": 0.6, "ExposureTime": 500})
+
+            start = time.time()
+            self.flash.on()
+            try:
+                self.start()
+                for _ in range(5):
+                    md = self.picam2.capture_metadata()
+                    logger.debug(f"Calibrating brightness - exposure: {md['ExposureTime']} "
+                                 f"gain: {md['AnalogueGain']}")
+
+                md = self.picam2.capture_metadata()
+                exposure_time = md["ExposureTime"]
+                gain = md["AnalogueGain"]
+            finally:
+                self.flash.off()
+
+            logger.info("Focusing")
+            self._configure(FOCUS)
+            self.picam2.set_controls({
+                "AfMode": 0, "ExposureTime": exposure_time, "AnalogueGain": gain
+            })
+            self.start()
+            focus = FocusEngine(self.picam2, self.flash.on, self.flash.off).run(
+                start_position=self.settings.controls.get("LensPosition")
+            )
+            lens_position = focus["LensPosition"]
+            logger.info(f"Calibration completed in {time.time() - start:.2f}s: lens {lens_position} "
+                        f"exposure {exposure_time} gain {gain}")
+
+            # Back to the still mode; settings are re-applied by the caller
+            self._configure(STILL)
+            self._schedule_idle_stop()
+            return {
+                "LensPosition": lens_position,
+                "ExposureTime": exposure_time,
+                "AnalogueGain": gain,
+                "focusTime": focus["time"],
+                "focusFlashTime": focus["flashTime"],
+            }
+
+    def watch_frame(self):
+        """Grab the luma plane of one frame from the presence stream.
+
+        The camera stays in the presence mode between calls, so this is
+        cheap to call in a loop; any capture switches it back as needed.
+
+        Returns:
+            2D uint8 array
+        """
+        with self._lock:
+            self._cancel_idle_stop()
+            self._configure(PRESENCE)
+            self.start()
+            request = self.picam2.capture_request()
+            try:
+                array = request.make_array("lores")
+            finally:
+                request.release()
+            # YUV420 arrays are the Y plane followed by the chroma planes
+            return array[:PRESENCE_LORES_RESOLUTION[1]].copy()
+
+    def sensor_temperature(self) -> Optional[float]:
+        """SensorTemperature from the next frame's metadata, if the sensor reports it."""
+        with self._lock:
+            self.start()
+            return self.picam2.capture_metadata().get("SensorTemperature")
+
+    def _schedule_idle_stop(self):
+        """Stop streaming after idle_timeout seconds without a shot."""
+        if not self.idle_timeout:
+            return
+        self._idle_timer = threading.Timer(self.idle_timeout, self._idle_stop)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _cancel_idle_stop(self):
+        """Cancel a pending idle stop."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _idle_stop(self):
+        """Idle timer callback."""
+        with self._lock:
+            logger.debug("Camera idle, stopping stream")
+            self.stop()
+
+    def close(self):
+        """Stop and close the camera."""
+        with self._lock:
+            self._cancel_idle_stop()
+            self.stop()
+            self.picam2.close()
+            self._mode = None
@@ -0,0 +1,368 @@
+# src/software/capture/settings.py
+"""Settings loading for the capture engine.
+
+These are the parsers that used to live at the top of every TakePhoto script,
+gathered in one place so a long-running process can reload them cheaply.
+"""
+import os
+import csv
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+from .config import (
+    CAMERA_SETTINGS_FILE, CONTROLS_FILE, EXTERNAL_MEDIA_PATHS,
+    PI4_RESOLUTION, PI5_RESOLUTION, DEFAULT_HDR_COUNT, DEFAULT_HDR_WIDTH,
+    HDR_MERGE_OFF, DEFAULT_BURST_KEEP, BURST_SCORE_SHARPNESS, CAPTURE_MODE_AUTO
+)
+
+logger = logging.getLogger(__name__)
+
+# Settings in camera_settings.csv that are not Picamera2 controls
+OPTION_KEYS = (
+    "Name", "ImageFileType", "VerticalFlip", "HDR", "HDR_width", "HDRMerge",
+    "SkipDuplicates", "Burst", "BurstKeep", "BurstScore", "CaptureMode", "AutoCalibration",
+    "AutoCalibrationPeriod", "NextServiceDate"
+)
+
+_FLOAT_SETTINGS = ("LensPosition", "AnalogueGain", "ExposureValue")
+_INT_SETTINGS = (
+    "ExposureTime", "AwbMode", "AfTrigger", "AfRange", "AfSpeed", "AfMode",
+    "HDR", "HDR_width", "HDRMerge", "AutoCalibration", "AutoCalibrationPeriod",
+    "ImageFileType", "VerticalFlip", "SkipDuplicates", "Burst", "BurstKeep", "BurstScore"
+)
+_BOOL_SETTINGS = ("AeEnable", "AwbEnable")
+
+
+def read_control_values(file_path: str = CONTROLS_FILE) -> Dict[str, str]:
+    """Read key-value pairs from the control file.
+
+    Args:
+        file_path: Path to controls.txt
+
+    Returns:
+        Dictionary of raw string values
+    """
+    control_values = {}
+    with open(file_path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            key, value = line.split("=", 1)
+            control_values[key] = value
+    return control_values
+
+
+def set_last_calibration(file_path: str = CONTROLS_FILE, timestamp: Optional[float] = None):
+    """Record the time of the last calibration in the control file.
+
+    Args:
+        file_path: Path to controls.txt
+        timestamp: Calibration time (default: now)
+    """
+    if timestamp is None:
+        timestamp = time.time()
+
+    with open(file_path, "r") as file:
+        lines = file.readlines()
+
+    with open(file_path, "w") as file:
+        for line in lines:
+            if line.startswith("LastCalibration"):
+                file.write(f"LastCalibration={timestamp}\n")
+            else:
+                file.write(line)
+
+
+def find_camera_settings_file(default_path: str = CAMERA_SETTINGS_FILE) -> str:
+    """Find the camera settings CSV, preferring one on external media.
+
+    Only the top level of each external media path is checked.
+
+    Args:
+        default_path: Internal settings file to fall back to
+
+    Returns:
+        Path to the settings file to use
+    """
+    for path in EXTERNAL_MEDIA_PATHS:
+        try:
+            files = os.listdir(path)
+        except OSError:
+            continue
+        if "camera_settings.csv" in files:
+            file_path = os.path.join(path, "camera_settings.csv")
+            logger.info(f"Found settings on external media: {file_path}")
+            return file_path
+
+    return default_path
+
+
+def _convert_setting(setting: str, value: str) -> Any:
+    """Convert a raw CSV value to the type Picamera2 expects."""
+    value = value.strip()
+    try:
+        if setting in _FLOAT_SETTINGS:
+            return float(value)
+        if setting in _INT_SETTINGS:
+            return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid value for {setting}: {value}")
+
+    if setting in _BOOL_SETTINGS:
+        return value.lower() in ("true", "1")
+
+    if setting not in OPTION_KEYS:
+        logger.warning(f"Unknown setting: {setting}. Passing through unchanged.")
+    return value
+
+
+def load_camera_settings(file_path: str) -> Dict[str, Any]:
+    """Read camera settings from a CSV file with converted data types.
+
+    Args:
+        file_path: Path to the CSV file containing camera settings
+
+    Returns:
+        Dictionary of settings
+
+    Raises:
+        ValueError: If an invalid value is encountered in the CSV file
+    """
+    settings = {}
+    with open(file_path) as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            setting = row["SETTING"].strip()
+            settings[setting] = _convert_setting(setting, row["VALUE"])
+    return settings
+
+
+def update_camera_settings(file_path: str, new_settings: Dict[str, Any]):
+    """Update values in the camera settings CSV, keeping its layout.
+
+    Args:
+        file_path: The CSV file to update
+        new_settings: Setting names and their new values
+    """
+    with open(file_path, "r+") as csv_file:
+        reader = csv.DictReader(csv_file)
+        updated_data = []
+        for row in reader:
+            if row["SETTING"] in new_settings:
+                row["VALUE"] = new_settings[row["SETTING"]]
+            updated_data.append(row)
+
+        csv_file.seek(0)
+        csv_file.truncate()
+
+        writer = csv.DictWriter(csv_file, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(updated_data)
+
+
+def list_exposuretimes(middle_exposuretime: int, num_photos: int, exposure_width: int) -> List[int]:
+    """Calculate exposure times for HDR photos.
+
+    Args:
+        middle_exposuretime: The middle exposure time in microseconds
+        num_photos: The number of photos to take
+        exposure_width: The exposure step added/subtracted to the middle time
+
+    Returns:
+        Exposure times in microseconds, middle exposure first
+    """
+    exposure_times = [middle_exposuretime]
+    half_num_photos = int((num_photos - 1) / 2)
+
+    for i in range(1, half_num_photos + 1):
+        exposure_times.append(middle_exposuretime + exposure_width * i)
+
+    for i in range(1, half_num_photos + 1):
+        exposure_times.append(middle_exposuretime - exposure_width * i)
+
+    return exposure_times
+
+
+def create_dated_folder(base_path: str) -> str:
+    """Create the folder for the current night if it doesn't exist.
+
+    A night runs from 12:00 pm to 11:59 am the next day, so photos taken
+    after midnight land in the previous day's folder.
+
+    Args:
+        base_path: The base path where the folder will be created
+
+    Returns:
+        The full path to the folder
+    """
+    now = datetime.now()
+    if now.hour < 12:
+        now = now - timedelta(days=1)
+    folder_path = os.path.join(base_path, now.strftime("%Y-%m-%d"))
+    if not os.path.exists(folder_path):
+        os.makedirs(folder_path)
+    os.chmod(folder_path, 0o777)  # read write for all users
+    return folder_path
+
+
+def determine_pi_model() -> int:
+    """Determine whether this is a Raspberry Pi 4 or 5.
+
+    Returns:
+        4 or 5 (unknown models are treated as a 5)
+    """
+    model = None
+    try:
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("Model"):
+                    model = line.split(":")[1].strip()
+                    break
+    except OSError:
+        pass
+
+    if model and "Pi 4" in model:
+        return 4
+    if not model:
+        logger.warning("Could not read Raspberry Pi model information, treating as model 5")
+    return 5
+
+
+def serial_number() -> Optional[str]:
+    """Read the Raspberry Pi's serial number from /proc/cpuinfo.
+
+    Returns:
+        Serial number, or None if it can't be read
+    """
+    try:
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("Serial"):
+                    return line.split(":")[1].strip()
+    except (OSError, IndexError):
+        pass
+    return None
+
+
+def serial_device_name() -> Optional[str]:
+    """Device name built from the serial number ("mb" plus its last five digits).
+
+    Some of the older scripts named their photos this way instead of using
+    the name in controls.txt.
+    """
+    serial = serial_number()
+    return f"mb{serial[-5:]}" if serial else None
+
+
+def capture_resolution(pi_model: int) -> Tuple[int, int]:
+    """Get the still resolution for a Pi model."""
+    return PI5_RESOLUTION if pi_model == 5 else PI4_RESOLUTION
+
+
+def get_storage_info(path: str) -> Tuple[int, int]:
+    """Get the total and available storage space of a path.
+
+    Args:
+        path: The path to the storage device
+
+    Returns:
+        Tuple of total and available storage in bytes
+    """
+    try:
+        stat = os.statvfs(path)
+        return stat.f_blocks * stat.f_bsize, stat.f_bavail * stat.f_bsize
+    except OSError:
+        return 0, 0
+
+
+class CaptureSettings:
+    """Parsed capture settings from controls.txt and camera_settings.csv."""
+
+    def __init__(self, controls: Dict[str, Any], options: Dict[str, Any],
+                 control_values: Dict[str, str], settings_path: str):
+        """Initialize capture settings.
+
+        Args:
+            controls: Picamera2 controls from the settings CSV
+            options: Non-control settings from the settings CSV
+            control_values: Raw values from controls.txt
+            settings_path: The CSV the settings were read from
+        """
+        self.controls = controls
+        self.settings_path = settings_path
+        self.device_name = control_values.get("name", "wrong")
+        self.only_flash = control_values.get("OnlyFlash", "True").lower() == "true"
+        self.last_calibration = float(control_values.get("LastCalibration", 0))
+        self.presence_trigger = control_values.get("PresenceTrigger", "False").lower() == "true"
+
+        self.image_file_type = int(options.get("ImageFileType", 0))
+        self.vertical_flip = bool(int(options.get("VerticalFlip", 0)))
+        self.auto_calibration = bool(int(options.get("AutoCalibration", 1)))
+        self.auto_calibration_period = int(options.get("AutoCalibrationPeriod", 1000))
+        self.hdr_width = int(options.get("HDR_width", DEFAULT_HDR_WIDTH))
+
+        # 0-2 all mean a single photo
+        hdr_count = int(options.get("HDR", DEFAULT_HDR_COUNT))
+        self.hdr_count = 1 if hdr_count < 3 else hdr_count
+        self.hdr_merge = int(options.get("HDRMerge", HDR_MERGE_OFF))
+        self.skip_duplicates = bool(int(options.get("SkipDuplicates", 0)))
+
+        # 0-1 mean no burst
+        self.burst_count = int(options.get("Burst", 0))
+        self.burst_keep = max(1, int(options.get("BurstKeep", DEFAULT_BURST_KEEP)))
+        self.burst_score = int(options.get("BurstScore", BURST_SCORE_SHARPNESS))
+
+        # Name of a capture strategy, see capture.strategies
+        self.capture_mode = str(options.get("CaptureMode", CAPTURE_MODE_AUTO)).strip().lower()
+
+        # Photos get smaller if the disk wouldn't last until then, see capture.planner
+        self.next_service_date = None
+        service_date = str(options.get("NextServiceDate", "")).strip()
+        if service_date:
+            try:
+                self.next_service_date = datetime.strptime(service_date, "%Y-%m-%d").date()
+            except ValueError:
+                logger.warning(f"Invalid NextServiceDate: {service_date} (expected YYYY-MM-DD)")
+
+    @classmethod
+    def load(cls, controls_path: str = CONTROLS_FILE,
+             settings_path: Optional[str] = None) -> "CaptureSettings":
+        """Load settings from disk.
+
+        Args:
+            controls_path: Path to controls.txt
+            settings_path: Settings CSV (default: external media or internal file)
+
+        Returns:
+            CaptureSettings instance
+        """
+        if settings_path is None:
+            settings_path = find_camera_settings_file()
+
+        control_values = read_control_values(controls_path)
+        settings = load_camera_settings(settings_path)
+        options = {key: settings.pop(key) for key in OPTION_KEYS if key in settings}
+        return cls(settings, options, control_values, settings_path)
+
+    @property
+    def middle_exposure(self) -> int:
+        """The calibrated exposure time in microseconds."""
+        return int(self.controls.get("ExposureTime", 500))
+
+    def exposure_times(self) -> List[int]:
+        """Exposure times for the configured HDR bracket."""
+        return list_exposuretimes(self.middle_exposure, self.hdr_count, self.hdr_width)
+
+    @property
+    def burst(self) -> bool:
+        """Whether photos are taken as bursts instead of an HDR bracket."""
+        return self.burst_count > 1
+
+    def calibration_due(self, now: Optional[float] = None) -> bool:
+        """Check whether the auto-calibration period has elapsed."""
+        if now is None:
+            now = time.time()
+        return self.auto_calibration and (now - self.last_calibration) > self.auto_calibration_period
@@ -0,0 +1,270 @@
+# src/software/capture/strategies.py
+"""Capture strategies: how one photo is taken.
+
+Each of the old TakePhoto_* scripts differed from the others in only a few
+lines: the resolution, whether it calibrated first, how many exposures it
+took or how many cameras it drove. A strategy captures just that difference.
+It declares the still mode it needs (resolution, camera buffers, cameras)
+and whether calibration is forced or skipped, and its capture() takes the
+frames and hands them to the shot for saving. Settings loading, the warm
+camera sessions and the save pipeline are shared by the CaptureEngine.
+"""
+import logging
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple, Type
+
+from .config import (
+    CAPTURE_MODE_AUTO, HDR_MERGE_OFF, HDR_MERGE_FUSED, BURST_BUFFER_COUNT, DEFAULT_BURST_COUNT,
+    SIXTEEN_MP_RESOLUTION, STEREO_RESOLUTION, STEREO_CAMERAS, JPEG_QUALITY
+)
+from .burst import burst_index
+from .fusion import FUSED_INDEX, merge_bracket
+from .multicam import MultiCameraEngine
+from .settings import CaptureSettings
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureStrategy:
+    """Base class for capture strategies."""
+
+    # Name used in the CaptureMode setting and on the command line
+    name = None
+    # Still resolution (None: the maximum for this Pi model)
+    resolution = None
+    # Camera buffers in the still mode
+    buffer_count = 1
+    # Picamera2 camera numbers used
+    cameras = (0,)
+    # True calibrates before every photo, False never does, None follows
+    # AutoCalibration and AutoCalibrationPeriod
+    calibration = None
+    # JPEG quality and most exposures per photo, lowered by the storage planner
+    quality = JPEG_QUALITY
+    max_exposures = None
+
+    def __init__(self, settings: CaptureSettings):
+        """Initialize the strategy.
+
+        Args:
+            settings: Settings the photo is taken with
+        """
+        self.settings = settings
+
+    def exposure_times(self) -> List[int]:
+        """Exposure times recorded with the photo."""
+        return [self.settings.middle_exposure]
+
+    def frame_count(self, max_exposures: Optional[int] = None) -> int:
+        """Files one photo writes.
+
+        Args:
+            max_exposures: Most exposures per photo (None: all)
+        """
+        return len(self.exposure_times()[:max_exposures]) * len(self.cameras)
+
+    def apply_plan(self, plan, full_resolution: Tuple[int, int]):
+        """Take the photo at a storage plan's quality, resolution and exposures.
+
+        Args:
+            plan: StoragePlan from capture.planner
+            full_resolution: Resolution the strategy would use on its own;
+                a plan never raises it
+        """
+        self.quality = plan.quality
+        self.max_exposures = plan.max_exposures
+        if plan.resolution is not None:
+            width, height = plan.resolution
+            if width * height < full_resolution[0] * full_resolution[1]:
+                self.resolution = plan.resolution
+
+    def capture(self, shot) -> None:
+        """Take the frames and hand each one to shot.save().
+
+        Args:
+            shot: The Shot being taken (see capture.engine)
+        """
+        raise NotImplementedError
+
+
+class HDRStrategy(CaptureStrategy):
+    """Exposure bracket from the HDR settings, optionally fused on the device."""
+
+    name = "hdr"
+
+    def exposure_times(self) -> List[int]:
+        # Middle exposure first, so a cut bracket keeps it
+        return self.settings.exposure_times()[:self.max_exposures]
+
+    def frame_count(self, max_exposures: Optional[int] = None) -> int:
+        count = len(self.exposure_times()[:max_exposures])
+        if count < 2 or self.settings.hdr_merge == HDR_MERGE_OFF:
+            return count
+        # The fused frame, plus the middle exposure unless only the fused one is kept
+        return 1 if self.settings.hdr_merge == HDR_MERGE_FUSED else 2
+
+    def capture(self, shot) -> None:
+        session = shot.session()
+        exposure_times = self.exposure_times()
+
+        def save_frame(index, image, metadata):
+            # The fused frame is tagged with the middle exposure
+            shot.save(index, image, metadata, exposure_times[0 if index == FUSED_INDEX else index])
+
+        merge = self.settings.hdr_merge != HDR_MERGE_OFF and not session.raw_capture
+        if not merge or len(exposure_times) < 2:
+            session.capture_frames(exposure_times, on_frame=save_frame, metrics=shot.metrics)
+            return
+
+        # Fusion needs the whole bracket in memory at once
+        session.frame_pool.ensure(len(exposure_times))
+        frames = session.capture_frames(exposure_times, metrics=shot.metrics)
+        with shot.metrics.phase("fusion"):
+            images = [image for image, _ in frames]
+            try:
+                outputs = merge_bracket(images, self.settings.hdr_merge)
+            except Exception:
+                for image in images:
+                    session.frame_pool.release(image)
+                raise
+
+            for image in images:
+                if not any(image is kept for _, kept in outputs):
+                    session.frame_pool.release(image)
+            for index, image in outputs:
+                save_frame(index, image, frames[0 if index == FUSED_INDEX else index][1])
+
+
+class SingleStrategy(HDRStrategy):
+    """One photo at the calibrated exposure, whatever the HDR setting says."""
+
+    name = "single"
+
+    def exposure_times(self) -> List[int]:
+        return [self.settings.middle_exposure]
+
+    def frame_count(self, max_exposures: Optional[int] = None) -> int:
+        return 1
+
+
+class SixteenMPStrategy(HDRStrategy):
+    """HDR bracket at 16MP, as TakePhoto16mp.py took it."""
+
+    name = "16mp"
+    resolution = SIXTEEN_MP_RESOLUTION
+
+
+class AutoExposureStrategy(HDRStrategy):
+    """HDR bracket after a fresh exposure and focus calibration."""
+
+    name = "autoexposure"
+    calibration = True
+
+
+class ManualStrategy(HDRStrategy):
+    """HDR bracket with the stored settings only, never calibrating."""
+
+    name = "manual"
+    calibration = False
+
+
+class BurstStrategy(CaptureStrategy):
+    """Burst at the calibrated exposure that keeps only the best frames."""
+
+    name = "burst"
+    buffer_count = BURST_BUFFER_COUNT
+
+    def keep(self, max_exposures: Optional[int] = None) -> int:
+        """Frames of the burst that are written."""
+        return min(self.settings.burst_keep, max_exposures or self.settings.burst_keep)
+
+    def frame_count(self, max_exposures: Optional[int] = None) -> int:
+        return self.keep(max_exposures)
+
+    def capture(self, shot) -> None:
+        session = shot.session()
+        if session.raw_capture:
+            logger.warning("Burst capture can't save raw frames, taking a single photo")
+            SingleStrategy(self.settings).capture(shot)
+            return
+
+        count = self.settings.burst_count if self.settings.burst else DEFAULT_BURST_COUNT
+        frames = session.capture_burst(self.settings.middle_exposure, count,
+                                       self.keep(self.max_exposures), self.settings.burst_score,
+                                       metrics=shot.metrics)
+        # Burst frames are already the selected best ones, so no dedup
+        for number, image, metadata in frames:
+            shot.save(burst_index(number), image, metadata, self.settings.middle_exposure,
+                      dedup=False)
+
+
+class StereoStrategy(CaptureStrategy):
+    """HDR bracket on two cameras at once under one flash."""
+
+    name = "stereo"
+    resolution = STEREO_RESOLUTION
+    cameras = STEREO_CAMERAS
+
+    def exposure_times(self) -> List[int]:
+        return self.settings.exposure_times()[:self.max_exposures]
+
+    def capture(self, shot) -> None:
+        exposure_times = self.exposure_times()
+        sessions = [shot.session(camera_num) for camera_num in self.cameras]
+        flash = sessions[0].flash
+
+        def save_set(index, frames, metadatas, skew):
+            for camera, (frame, metadata) in enumerate(zip(frames, metadatas)):
+                shot.save(index, frame, metadata, exposure_times[index], camera=camera,
+                          pooled=False, dedup=False)
+
+        with ExitStack() as stack:
+            # Every camera streams in its still mode for the whole bracket
+            cameras = [stack.enter_context(session.still(shot.metrics)) for session in sessions]
+            with shot.metrics.phase("capture"):
+                with MultiCameraEngine(cameras, flash.on, flash.release) as engine:
+                    engine.capture(exposure_times, lambda request: request.make_array("main"),
+                                   on_frame=save_set)
+
+
+STRATEGIES: Dict[str, Type[CaptureStrategy]] = {
+    strategy.name: strategy for strategy in (
+        SingleStrategy, HDRStrategy, BurstStrategy, SixteenMPStrategy,
+        AutoExposureStrategy, ManualStrategy, StereoStrategy,
+    )
+}
+
+
+def register_strategy(strategy: Type[CaptureStrategy]) -> Type[CaptureStrategy]:
+    """Make a strategy available by name; usable as a class decorator."""
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+def select_strategy(settings: CaptureSettings, mode: Optional[str] = None) -> CaptureStrategy:
+    """Pick the strategy for a photo.
+
+    Args:
+        settings: Current settings
+        mode: Strategy name (default: the CaptureMode setting); "auto" picks
+            burst, HDR or a single photo from the Burst and HDR settings
+
+    Returns:
+        Strategy instance
+
+    Raises:
+        ValueError: If the mode is not a known strategy
+    """
+    mode = (mode or settings.capture_mode or CAPTURE_MODE_AUTO).lower()
+    if mode == CAPTURE_MODE_AUTO:
+        if settings.burst:
+            mode = BurstStrategy.name
+        elif settings.hdr_count > 1:
+            mode = HDRStrategy.name
+        else:
+            mode = SingleStrategy.name
+
+    if mode not in STRATEGIES:
+        raise ValueError(f"Unknown capture mode: {mode} "
+                         f"(expected {CAPTURE_MODE_AUTO} or one of {', '.join(STRATEGIES)})")
+    return STRATEGIES[mode](settings)
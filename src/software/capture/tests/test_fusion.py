@@ -0,0 +1,62 @@
+"""
+Tests for exposure fusion.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from ..fusion import fuse_exposures
+
+
+@pytest.fixture
+def bracket():
+    """Three exposures of the same smooth random scene, 200 rows high."""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (20, 24, 3), dtype=np.uint8)
+    scene = cv2.resize(small, (240, 200), interpolation=cv2.INTER_CUBIC).astype(np.float32)
+    return [np.clip(scene * gain, 0, 255).astype(np.uint8) for gain in (1.0, 0.4, 2.0)]
+
+
+def test_strips_match_whole_frame(bracket):
+    """Test that strip-wise fusion matches fusing the whole frame at once."""
+    whole = fuse_exposures(bracket, levels=4, strip_height=1000, overlap=0)
+    # 200 rows is not a multiple of the strip height
+    striped = fuse_exposures(bracket, levels=4, strip_height=64, overlap=32)
+
+    assert np.abs(whole.astype(np.int16) - striped).max() <= 1
+
+
+def test_fuse_into_input_frame(bracket):
+    """Test that a frame of the bracket can hold the result."""
+    expected = fuse_exposures(bracket, levels=4, strip_height=64, overlap=32)
+
+    fused = fuse_exposures(bracket, out=bracket[-1], levels=4, strip_height=64, overlap=32)
+
+    assert fused is bracket[-1]
+    assert np.array_equal(fused, expected)
+
+
+def test_fuse_into_input_frame_unaligned_strips(bracket):
+    """Test in-place fusion with strips that aren't a multiple of the pyramid alignment."""
+    # 6 levels align strip reads to 32 rows, so 17 rows is the most overlap 48-row strips allow
+    expected = fuse_exposures(bracket, levels=6, strip_height=48, overlap=17)
+
+    fused = fuse_exposures(bracket, out=bracket[-1], levels=6, strip_height=48, overlap=17)
+
+    assert np.array_equal(fused, expected)
+
+
+def test_overlap_must_fit_strips(bracket):
+    """Test that an overlap reaching into already written rows is rejected."""
+    with pytest.raises(ValueError):
+        fuse_exposures(bracket, levels=6, strip_height=48, overlap=48)
+    with pytest.raises(ValueError):
+        fuse_exposures(bracket, levels=6, strip_height=48, overlap=18)
+    # Aligned strips can read a whole strip of overlap
+    fuse_exposures(bracket, levels=6, strip_height=64, overlap=64)
+
+
+def test_fusion_needs_two_frames(bracket):
+    """Test that a single frame is rejected."""
+    with pytest.raises(ValueError):
+        fuse_exposures(bracket[:1])
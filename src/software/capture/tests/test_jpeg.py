@@ -0,0 +1,48 @@
+"""
+Tests for the striped JPEG encoder.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from ..jpeg import encode_striped, strip_height
+
+
+def _frame(height, width):
+    """Smooth random frame, so the encodes have real detail to lose."""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+@pytest.mark.parametrize('height, width', [
+    (512, 256),  # whole strips
+    (300, 250),  # last strip and MCU row partial
+    (130, 200),  # last strip of 2 rows
+    (100, 90),   # a single strip
+])
+def test_encode_striped_matches_imencode(height, width):
+    """Test that the stitched JPEG decodes to the same pixels as a whole-frame encode."""
+    frame = _frame(height, width)
+
+    data = b''.join(bytes(chunk) for chunk in encode_striped(frame, 90, rows=128))
+    assert data[:2] == b'\xff\xd8' and data[-2:] == b'\xff\xd9'
+    striped = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    _, reference = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+    expected = cv2.imdecode(reference, cv2.IMREAD_COLOR)
+
+    assert striped.shape == frame.shape
+    assert np.array_equal(striped, expected)
+
+
+def test_encode_striped_rejects_unaligned_strips():
+    """Test that strips must keep the restart marker numbering aligned."""
+    with pytest.raises(ValueError):
+        encode_striped(_frame(256, 64), rows=100)
+
+
+def test_strip_height():
+    """Test that strips are aligned to 8 MCU rows."""
+    assert strip_height(6944, workers=4) == 1792
+    assert strip_height(100, workers=4) == 128
@@ -0,0 +1,119 @@
+"""
+Tests for the storage planner.
+"""
+import json
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from ..planner import StoragePlanner, load_schedule, scheduled_seconds
+
+# The format written by the Scheduler, padding and blank lines included
+SCHEDULE_CSV = """SETTING,VALUE,DETAILS
+second, 1,
+minute,1, specify a specific minute
+hour,19;21;23;2;4,specify what hour you want things to turn on
+weekday,1;2;3;4;5;6;7, specify a number(s) 1-7
+
+
+utc_off,-5, put your UTC offset
+runtime, 60, put how long you want each session to go (in minutes)
+onlyflash,0,switch to using only the flash
+"""
+
+
+def _schedule(hours, minute=0, weekdays=range(7), runtime=60):
+    return {'hours': list(hours), 'minute': minute, 'weekdays': set(weekdays), 'runtime': runtime}
+
+
+@pytest.fixture
+def schedule_file(tmpdir):
+    path = tmpdir.join('schedule_settings.csv')
+    path.write(SCHEDULE_CSV)
+    return str(path)
+
+
+def test_load_schedule(schedule_file):
+    """Test reading the real schedule_settings.csv format."""
+    schedule = load_schedule(schedule_file)
+    assert schedule['hours'] == [19, 21, 23, 2, 4]
+    assert schedule['minute'] == 1
+    # Cron weekday 7 is Sunday, the same as 0
+    assert schedule['weekdays'] == {0, 1, 2, 3, 4, 5, 6}
+    assert schedule['runtime'] == 60
+
+
+def test_load_schedule_every_hour(tmpdir):
+    """Test that EVERY_HOUR and EVERY_DAY mean every value."""
+    path = tmpdir.join('schedule_settings.csv')
+    path.write(SCHEDULE_CSV.replace('19;21;23;2;4', 'EVERY_HOUR')
+               .replace('1;2;3;4;5;6;7', 'EVERY_DAY'))
+    schedule = load_schedule(str(path))
+    assert schedule['hours'] == list(range(24))
+    assert schedule['weekdays'] == set(range(7))
+
+
+def test_scheduled_seconds_across_midnight():
+    """Test sessions that run past midnight."""
+    schedule = _schedule([23], minute=30)
+    # 23:30-00:30, from 23:45
+    assert scheduled_seconds(schedule, datetime(2025, 6, 2, 23, 45),
+                             datetime(2025, 6, 3, 2, 0)) == 45 * 60
+    # The session started the day before is still running at 00:10
+    assert scheduled_seconds(schedule, datetime(2025, 6, 3, 0, 10),
+                             datetime(2025, 6, 3, 1, 0)) == 20 * 60
+    assert scheduled_seconds(schedule, datetime(2025, 6, 3, 1, 0),
+                             datetime(2025, 6, 3, 0, 0)) == 0
+
+
+def test_scheduled_seconds_weekdays():
+    """Test that only sessions on scheduled weekdays count."""
+    # 2025-06-02 is a Monday (cron weekday 1)
+    schedule = _schedule([23], minute=30, weekdays={1})
+    assert scheduled_seconds(schedule, datetime(2025, 6, 2, 12, 0),
+                             datetime(2025, 6, 4, 12, 0)) == 60 * 60
+
+
+def test_scheduled_seconds_without_runtime():
+    """Test that a runtime of 0 counts the whole period."""
+    schedule = _schedule([20], runtime=0)
+    assert scheduled_seconds(schedule, datetime(2025, 6, 2, 12, 0),
+                             datetime(2025, 6, 3, 12, 0)) == 24 * 3600
+
+
+@pytest.fixture
+def planner(tmpdir):
+    """Planner with one session a day and captures of 1 MB per megapixel a minute apart."""
+    schedule_path = tmpdir.join('schedule_settings.csv')
+    schedule_path.write(SCHEDULE_CSV.replace('19;21;23;2;4', '20').replace('minute,1', 'minute,0'))
+    metrics_path = tmpdir.join('capture_metrics.jsonl')
+    metrics_path.write(''.join(
+        json.dumps({'startedAt': 1000 + i * 60, 'files': 1, 'bytesWritten': 1000000,
+                    'resolution': [1000, 1000], 'jpegQuality': 96}) + '\n'
+        for i in range(5)))
+    return StoragePlanner(schedule_path=str(schedule_path), metrics_path=str(metrics_path),
+                          reserve=0)
+
+
+@pytest.mark.parametrize('budget, level', [
+    (5e8, 0),  # 120 photos of 3 frames at quality 96 fit
+    (3e8, 1),  # quality 90
+    (1e8, 3),  # quality 85, one exposure
+    (1e6, 5),  # nothing fits: the cheapest level
+])
+def test_plan_level(planner, budget, level):
+    """Test the level picked for the space left until the service visit."""
+    # Two one-hour sessions (June 2 and 3 at 20:00) before the visit on June 4
+    settings = SimpleNamespace(next_service_date=date(2025, 6, 4))
+    plan = planner.plan(settings, lambda max_exposures: max_exposures or 3, (1000, 1000),
+                        budget, now=datetime(2025, 6, 2, 12, 0))
+    assert plan.level == level
+    assert plan.estimate['shotsLeft'] == 120
+
+
+def test_plan_without_service_date(planner):
+    """Test that the planner is off without a NextServiceDate."""
+    plan = planner.plan(SimpleNamespace(next_service_date=None), lambda m: 3, (1000, 1000), 0)
+    assert plan.level == 0
+    assert plan.reason == 'planner off'
@@ -22,11 +22,14 @@ from .routes.scheduler import scheduler_bp
 from .routes.network import network_bp
 from .routes.jobs import jobs_bp
 from .routes.storage import storage_bp
+from .routes.metrics import metrics_bp
 
 # Import services
 from .services.job_queue import job_queue
 from .services.cache import cache_service
 from .services.storage import storage_manager
+from .services.photo_index import photo_index
+from .services.thumbnails import thumbnail_cache
 
 def create_app():
     """Create and configure the Flask application."""
@@ -91,6 +94,7 @@ def register_blueprints(app):
     app.register_blueprint(network_bp)
     app.register_blueprint(jobs_bp)
     app.register_blueprint(storage_bp)
+    app.register_blueprint(metrics_bp)
 
 def setup_services(app):
     """Initialize and configure services."""
@@ -100,6 +104,10 @@ def setup_services(app):
         job_queue.start()
     else:
         app.logger.info("Background job queue disabled")
+    
+    # Build the photo index and watch the photo folders
+    app.logger.info("Starting photo index")
+    photo_index.start()
 
 def setup_middleware(app):
     """Configure application middleware."""
@@ -125,6 +133,14 @@ def register_shutdown(app):
         # Shutdown cache service
         app.logger.info("Shutting down cache service")
         cache_service.shutdown()
+        
+        # Stop the photo index
+        app.logger.info("Stopping photo index")
+        photo_index.stop()
+        
+        # Stop the thumbnail workers
+        app.logger.info("Stopping thumbnail workers")
+        thumbnail_cache.shutdown()
     
     # Register with atexit
     atexit.register(shutdown_services)
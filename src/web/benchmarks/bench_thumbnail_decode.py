@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold thumbnail generation for full-resolution photos.
+
+Compares the old path (full cv2.imread, then resize) with generate_thumbnail,
+which decodes JPEGs at 1/8 scale in libjpeg, and measures a gallery page of
+thumbnails made one after another against the THUMBNAIL_WORKERS process pool.
+
+Usage:
+    python3 src/web/benchmarks/bench_thumbnail_decode.py [--repeat N] [--sizes 16,48,64] [--page 8]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))))
+
+from src.web.config import THUMBNAIL_SIZE, THUMBNAIL_WORKERS  # noqa: E402
+from src.web.utils.camera import generate_thumbnail  # noqa: E402
+
+# Megapixels -> (width, height) of the sensor modes we ship with
+SIZES = {
+    16: (4656, 3496),
+    48: (8000, 6000),
+    64: (9248, 6944),
+}
+
+
+def make_photo(path, width, height):
+    """Write a synthetic photo with smooth structure and sensor-like noise."""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 32, width // 32, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-6, 7, (height, width, 1), dtype=np.int16)
+    frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    cv2.imwrite(path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), 96])
+
+
+def full_decode_thumbnail(file_path, size):
+    """The thumbnail path before reduced decoding."""
+    img = cv2.imread(file_path)
+    height, width = img.shape[:2]
+    scale = size[0] / max(width, height)
+    img = cv2.resize(img, (int(width * scale), int(height * scale)))
+    return cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 85])[1]
+
+
+def best_time(func, path, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path, THUMBNAIL_SIZE)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold thumbnail generation")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per decoder (best is reported)")
+    parser.add_argument("--sizes", default="16,48,64", help="Comma-separated megapixel sizes")
+    parser.add_argument("--page", type=int, default=8, help="Thumbnails in the gallery page test")
+    args = parser.parse_args()
+
+    decoders = [("full decode", full_decode_thumbnail), ("reduced", generate_thumbnail)]
+    workers = max(THUMBNAIL_WORKERS, 1)
+
+    print(f"Thumbnail size {THUMBNAIL_SIZE}, {workers} worker(s), {os.cpu_count()} CPUs")
+    print(f"{'size':>6} {'decoder':>12} {'seconds':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for megapixels in (int(size) for size in args.sizes.split(",")):
+            path = os.path.join(tmp_dir, f"{megapixels}.jpg")
+            make_photo(path, *SIZES[megapixels])
+            baseline = None
+            for name, func in decoders:
+                seconds = best_time(func, path, args.repeat)
+                baseline = baseline or seconds
+                print(f"{megapixels:>4}MP {name:>12} {seconds:>8.3f} {baseline / seconds:>7.2f}x")
+
+        # A gallery page of cold thumbnails of the largest size
+        paths = [path] * args.page
+        start = time.perf_counter()
+        for page_path in paths:
+            generate_thumbnail(page_path, THUMBNAIL_SIZE)
+        serial = time.perf_counter() - start
+
+        context = multiprocessing.get_context('forkserver')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            # Start the workers before timing
+            list(pool.map(generate_thumbnail, paths[:workers], [THUMBNAIL_SIZE] * workers))
+            start = time.perf_counter()
+            list(pool.map(generate_thumbnail, paths, [THUMBNAIL_SIZE] * len(paths)))
+            pooled = time.perf_counter() - start
+
+        print(f"\n{args.page} thumbnails at {megapixels}MP: {serial:.3f}s in one thread, "
+              f"{pooled:.3f}s in the pool ({serial / pooled:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
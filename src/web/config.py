@@ -34,10 +34,40 @@ MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB
 # Thumbnail Settings
 THUMBNAIL_SIZE = (200, 200)
 THUMBNAIL_QUALITY = 85
+# Renditions written next to each photo at capture time
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+PREVIEW_SUFFIX = ".preview.jpg"
+# Thumbnails generated for photos without a rendition
+THUMBNAIL_CACHE_DIR = os.path.join(BASE_DIR, "thumbnail_cache")
+THUMBNAIL_CACHE_MAX_SIZE = 256 * 1024 * 1024  # bytes; least recently used are evicted
+THUMBNAIL_MAX_AGE = 86400  # seconds browsers may reuse a thumbnail without asking
+THUMBNAIL_WORKERS = 2  # processes decoding photos for thumbnails; 0 decodes in the request
+# Per-night record of saved photos, written by the capture pipeline
+PHOTO_MANIFEST_FILE = "manifest.jsonl"
+
+# Photo Index (SQLite index of the photo folders, replaces walking them per request)
+PHOTO_INDEX_FILE = os.path.join(BASE_DIR, "photo_index.db")
+PHOTO_INDEX_REFRESH_INTERVAL = 5  # seconds between folder checks without a watcher
+PHOTO_INDEX_RECONCILE_INTERVAL = 300  # seconds between folder checks with a watcher
+PHOTO_INDEX_SETTLE_TIME = 10  # folders changed this recently are checked again
+EXTERNAL_BACKUP_DIRNAME = "CreatureBox_Backup"  # backup folder on external drives
+GALLERY_PAGE_SIZE = 100  # photos per page when no limit is given
+GALLERY_PAGE_LIMIT = 1000  # most photos on one page
+
+# Deep-Zoom Tiles (DZI pyramids of full-resolution photos)
+TILES_DIR = os.path.join(BASE_DIR, "tiles")
+TILE_SIZE = 254  # plus the overlap on each side makes 256px tiles
+TILE_OVERLAP = 1
+TILE_QUALITY = 80
 
 # Camera Settings
 CAMERA_LOCK_TIMEOUT = 30  # seconds
 
+# Capture Metrics (written by the capture scripts, one JSON record per line)
+CAPTURE_METRICS_FILE = os.path.join(LOG_DIR, "capture_metrics.jsonl")
+CAPTURE_METRICS_LIMIT = 1000  # most records returned by one request
+FLASH_POWER_WATTS = 0  # flash draw; set it to get flash energy estimates
+
 # Logging Configuration
 LOG_LEVEL = "INFO"
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
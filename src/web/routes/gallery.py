@@ -1,7 +1,11 @@
 # src/web/routes/gallery.py
-from flask import Blueprint, jsonify, request, send_file, Response, current_app
-from ..utils.files import get_photo_dates, get_photos, get_photo_file, delete_photo
-from ..utils.camera import generate_thumbnail
+import re
+from flask import Blueprint, jsonify, request, send_file, current_app
+from ..utils.files import (
+    get_photo_dates, get_photos, get_photo_page, get_photo_file, get_rendition_file, delete_photo
+)
+from ..services.tiles import tile_manager
+from ..services.thumbnails import thumbnail_cache
 from ..error_handlers import APIError, ErrorCode
 from .api import create_success_response
 
@@ -11,20 +15,103 @@ gallery_bp = Blueprint('gallery', __name__, url_prefix='/api/gallery')
 @gallery_bp.route('/dates')
 def gallery_dates():
     """Get list of dates with photos."""
-    dates = get_photo_dates()
+    root = request.args.get('root', 'photos')
+    dates = get_photo_dates(root)
     return jsonify(dates)
 
+# Query parameters that ask for a page instead of the whole list
+PAGE_PARAMETERS = ('limit', 'cursor', 'fields', 'timeFrom', 'timeTo', 'dateFrom', 'dateTo',
+                   'hdr', 'exposureMin', 'exposureMax', 'device')
+TIME_PATTERN = re.compile(r'^\d{2}:\d{2}(:\d{2})?$')
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+PHOTO_FIELDS = ('filename', 'url', 'thumbnailUrl', 'previewUrl', 'dziUrl', 'date', 'time',
+                'exposure', 'focus', 'hdr', 'device', 'root')
+
+def _page_arguments():
+    """Read the pagination, filter and field query parameters."""
+    from ..config import GALLERY_PAGE_SIZE, GALLERY_PAGE_LIMIT
+    
+    try:
+        limit = int(request.args.get('limit', GALLERY_PAGE_SIZE))
+        filters = {
+            'hdr': request.args.get('hdr', type=int),
+            'exposureMin': request.args.get('exposureMin', type=int),
+            'exposureMax': request.args.get('exposureMax', type=int),
+            'device': request.args.get('device'),
+            'dateFrom': request.args.get('dateFrom'),
+            'dateTo': request.args.get('dateTo'),
+        }
+    except ValueError as e:
+        raise APIError(
+            ErrorCode.INVALID_REQUEST,
+            "Invalid query parameter",
+            {"error": str(e)}
+        )
+    
+    if limit < 1 or limit > GALLERY_PAGE_LIMIT:
+        raise APIError(
+            ErrorCode.INVALID_REQUEST,
+            f"limit must be between 1 and {GALLERY_PAGE_LIMIT}"
+        )
+    
+    for key in ('hdr', 'exposureMin', 'exposureMax'):
+        # type=int turns a bad value into None instead of raising
+        if key in request.args and filters[key] is None:
+            raise APIError(ErrorCode.INVALID_REQUEST, f"{key} must be an integer")
+    
+    for key in ('dateFrom', 'dateTo'):
+        if filters[key] is not None and not DATE_PATTERN.match(filters[key]):
+            raise APIError(ErrorCode.INVALID_REQUEST, f"{key} must be YYYY-MM-DD")
+    
+    time_range = None
+    time_from = request.args.get('timeFrom')
+    time_to = request.args.get('timeTo')
+    if time_from or time_to:
+        time_range = (time_from or '00:00', time_to or '23:59:59')
+        if not all(TIME_PATTERN.match(value) for value in time_range):
+            raise APIError(ErrorCode.INVALID_REQUEST, "timeFrom and timeTo must be HH:MM or HH:MM:SS")
+    
+    fields = None
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in PHOTO_FIELDS]
+        if unknown:
+            raise APIError(
+                ErrorCode.INVALID_REQUEST,
+                f"Unknown fields: {', '.join(unknown)}",
+                {"fields": list(PHOTO_FIELDS)}
+            )
+    
+    return {
+        'limit': limit,
+        'cursor': request.args.get('cursor'),
+        'filters': filters,
+        'time_range': time_range,
+        'fields': fields
+    }
+
 @gallery_bp.route('/photos')
 def gallery_photos():
-    """Get list of photos."""
+    """Get list of photos.
+    
+    Without paging parameters the whole list is returned as an array. With
+    any of limit, cursor, fields or a filter, one page is returned with the
+    nextCursor to pass for the following one.
+    """
     date = request.args.get('date')
-    photos = get_photos(date)
-    return jsonify(photos)
+    root = request.args.get('root', 'photos')
+    
+    if not any(key in request.args for key in PAGE_PARAMETERS):
+        photos = get_photos(date, root)
+        return jsonify(photos)
+    
+    page = get_photo_page(date, root, **_page_arguments())
+    return jsonify(create_success_response(data=page))
 
 @gallery_bp.route('/photos/view/<date>/<filename>')
 def view_photo(date, filename):
     """View a photo."""
-    file_path = get_photo_file(date, filename)
+    file_path = get_photo_file(date, filename, request.args.get('root', 'photos'))
     
     if file_path:
         download = request.args.get('download', '0') == '1'
@@ -40,24 +127,120 @@ def view_photo(date, filename):
 
 @gallery_bp.route('/photos/thumbnail/<date>/<filename>')
 def view_thumbnail(date, filename):
-    """View a photo thumbnail."""
-    file_path = get_photo_file(date, filename)
+    """View a photo thumbnail.
+    
+    Thumbnails carry a strong ETag, so a browser that has one gets a 304.
+    """
+    from ..config import THUMBNAIL_SUFFIX, THUMBNAIL_MAX_AGE
+    
+    file_path = get_photo_file(date, filename, request.args.get('root', 'photos'))
     
     if file_path:
-        thumbnail = generate_thumbnail(file_path)
-        if thumbnail is not None:
-            return Response(thumbnail.tobytes(), mimetype='image/jpeg')
+        # Written at capture time; older photos are decoded once and cached
+        rendition = get_rendition_file(file_path, THUMBNAIL_SUFFIX)
+        if rendition:
+            return send_file(rendition, mimetype='image/jpeg', max_age=THUMBNAIL_MAX_AGE)
+        
+        cached = thumbnail_cache.get(file_path)
+        if cached:
+            cache_path, etag = cached
+            return send_file(cache_path, mimetype='image/jpeg', etag=etag,
+                             max_age=THUMBNAIL_MAX_AGE)
     
     raise APIError(
         ErrorCode.FILE_NOT_FOUND,
         f"Thumbnail not available for: {filename}"
     )
 
+@gallery_bp.route('/photos/preview/<date>/<filename>')
+def view_preview(date, filename):
+    """View a screen-sized preview of a photo, or the photo if it has none."""
+    from ..config import PREVIEW_SUFFIX
+    
+    file_path = get_photo_file(date, filename, request.args.get('root', 'photos'))
+    
+    if file_path:
+        rendition = get_rendition_file(file_path, PREVIEW_SUFFIX)
+        return send_file(rendition or file_path)
+    
+    raise APIError(
+        ErrorCode.FILE_NOT_FOUND,
+        f"Photo not found: {filename}"
+    )
+
+@gallery_bp.route('/photos/tiles/<date>/<filename>.dzi')
+def view_dzi(date, filename):
+    """View the deep-zoom descriptor of a photo.
+    
+    A photo without a current pyramid gets one built on the job queue, and
+    the reply is 202 with the job to poll.
+    """
+    file_path = get_photo_file(date, filename)
+    
+    if not file_path:
+        raise APIError(
+            ErrorCode.FILE_NOT_FOUND,
+            f"Photo not found: {filename}"
+        )
+    
+    dzi_path = tile_manager.get_dzi(date, file_path)
+    if dzi_path:
+        return send_file(dzi_path, mimetype='application/xml')
+    
+    try:
+        job_id = tile_manager.queue_pyramid(file_path, date)
+    except Exception as e:
+        current_app.logger.error(f"Error starting tile generation: {str(e)}")
+        raise APIError(
+            ErrorCode.SYSTEM_COMMAND_FAILED,
+            f"Failed to start tile generation for: {filename}",
+            {"error": str(e)}
+        )
+    return jsonify(create_success_response(
+        data={'job_id': job_id},
+        message='Tile generation started'
+    )), 202
+
+@gallery_bp.route('/photos/tiles/<date>/<filename>_files/<int:level>/<int:col>_<int:row>.jpg')
+def view_tile(date, filename, level, col, row):
+    """View one deep-zoom tile of a photo."""
+    tile_path = tile_manager.get_tile(date, filename, level, col, row)
+    
+    if tile_path:
+        response = send_file(tile_path, mimetype='image/jpeg')
+        # Tiles only change if the photo is replaced
+        response.cache_control.max_age = 86400
+        return response
+    
+    raise APIError(
+        ErrorCode.FILE_NOT_FOUND,
+        f"Tile not found: {level}/{col}_{row}"
+    )
+
+@gallery_bp.route('/tiles/<date>', methods=['POST'])
+def generate_tiles(date):
+    """Build the deep-zoom tiles of every photo of a night."""
+    try:
+        job_id = tile_manager.generate_date(date)
+        
+        return jsonify(create_success_response(
+            data={'job_id': job_id},
+            message='Tile generation started'
+        ))
+    except Exception as e:
+        current_app.logger.error(f"Error starting tile generation: {str(e)}")
+        raise APIError(
+            ErrorCode.SYSTEM_COMMAND_FAILED,
+            "Failed to start tile generation",
+            {"error": str(e)}
+        )
+
 @gallery_bp.route('/photos/<filename>', methods=['DELETE'])
 def delete_photo_route(filename):
     """Delete a photo."""
     try:
         success = delete_photo(filename)
+        tile_manager.remove_pyramids(filename)
         return jsonify(create_success_response(message='Photo deleted successfully'))
     except APIError:
         raise
@@ -0,0 +1,59 @@
+# src/web/routes/metrics.py
+from flask import Blueprint, jsonify, request, current_app
+from ..utils.metrics import read_capture_metrics, summarize_capture_metrics
+from ..error_handlers import APIError, ErrorCode
+from .api import create_success_response
+
+# Create blueprint
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+def _read_records():
+    """Read capture records filtered by the since/until/source/limit query parameters."""
+    from ..config import CAPTURE_METRICS_LIMIT
+
+    try:
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+        limit = int(request.args.get('limit', CAPTURE_METRICS_LIMIT))
+    except ValueError as e:
+        raise APIError(
+            ErrorCode.INVALID_REQUEST,
+            "Invalid query parameter",
+            {"error": str(e)}
+        )
+
+    if limit < 1 or limit > CAPTURE_METRICS_LIMIT:
+        raise APIError(
+            ErrorCode.INVALID_REQUEST,
+            f"limit must be between 1 and {CAPTURE_METRICS_LIMIT}"
+        )
+
+    try:
+        return read_capture_metrics(
+            since=since,
+            until=until,
+            source=request.args.get('source'),
+            limit=limit
+        )
+    except OSError as e:
+        current_app.logger.error(f"Error reading capture metrics: {str(e)}")
+        raise APIError(
+            ErrorCode.UNKNOWN_ERROR,
+            "Failed to read capture metrics",
+            {"error": str(e)}
+        )
+
+@metrics_bp.route('/captures')
+def capture_metrics():
+    """Get per-capture timing records, newest first."""
+    records = _read_records()
+    return jsonify(create_success_response(
+        data={'records': records, 'count': len(records)}
+    ))
+
+@metrics_bp.route('/captures/summary')
+def capture_metrics_summary():
+    """Get where capture time and flash energy went over a period."""
+    return jsonify(create_success_response(
+        data=summarize_capture_metrics(_read_records())
+    ))
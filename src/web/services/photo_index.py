@@ -0,0 +1,402 @@
+"""
+Persistent photo index for the gallery, storage and status endpoints.
+
+Walking PHOTOS_DIR on every request takes seconds once a season has left
+tens of thousands of photos. The index keeps one SQLite row per photo in
+each root (photos, photos_backedup and the backup folder of every mounted
+external drive), so listings, counts and the newest photo are queries.
+
+Photos live in the root or in its dated folders. The index is kept current
+per folder: a folder is only listed again when its modification time
+changed, which happens whenever a file is created, deleted or renamed in
+it. Checking every folder's mtime is cheap, and is done at most every
+PHOTO_INDEX_REFRESH_INTERVAL seconds when a query comes in. If the optional
+watchdog package is installed, inotify events mark folders as changed right
+away, and the full check only runs every PHOTO_INDEX_RECONCILE_INTERVAL
+seconds.
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Try to import watchdog, but don't fail if not available
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+    FileSystemEventHandler = object
+
+PHOTOS_ROOT = 'photos'
+BACKUP_ROOT = 'backup'
+EXTERNAL_ROOT_PREFIX = 'external:'
+
+# Bumped when the tables change; older indexes are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    root TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    exposure INTEGER,
+    focus REAL,
+    captured_at REAL,
+    time TEXT NOT NULL,
+    hdr INTEGER,
+    device TEXT,
+    PRIMARY KEY (root, folder, filename)
+);
+CREATE INDEX IF NOT EXISTS photos_mtime ON photos (root, mtime);
+CREATE INDEX IF NOT EXISTS photos_order ON photos (root, folder, time, filename);
+CREATE INDEX IF NOT EXISTS photos_filename ON photos (filename);
+CREATE TABLE IF NOT EXISTS folders (
+    root TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, folder)
+);
+"""
+
+# devicename_YYYY_MM_DD__HH_MM_SS[_HDRx].jpg
+FILENAME_PATTERN = re.compile(
+    r'^(?P<device>.+?)_\d{4}_\d{2}_\d{2}__(?P<time>\d{2}_\d{2}_\d{2})(?:_HDR(?P<hdr>\d+))?')
+
+# Columns photos() can filter on, with the SQL comparison of each filter
+PHOTO_FILTERS = {
+    'dateFrom': 'folder >= ?',
+    'dateTo': 'folder <= ?',
+    'hdr': 'hdr = ?',
+    'exposureMin': 'exposure >= ?',
+    'exposureMax': 'exposure <= ?',
+    'device': 'device = ?',
+}
+
+
+def parse_filename(filename: str) -> Dict[str, Any]:
+    """Read the device, time and HDR index from a capture file name.
+
+    Args:
+        filename: devicename_YYYY_MM_DD__HH_MM_SS_HDRx.jpg
+
+    Returns:
+        device, time (HH:MM:SS) and hdr; None for parts the name doesn't have
+    """
+    match = FILENAME_PATTERN.match(filename)
+    if not match:
+        return {'device': None, 'time': None, 'hdr': None}
+    return {
+        'device': match.group('device'),
+        'time': match.group('time').replace('_', ':'),
+        'hdr': int(match.group('hdr')) if match.group('hdr') is not None else None,
+    }
+
+
+class _FolderEvents(FileSystemEventHandler):
+    """Marks the folders of watchdog events as changed."""
+
+    def __init__(self, index: "PhotoIndex"):
+        self.index = index
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, 'dest_path', None)]
+        for path in paths:
+            if path:
+                self.index.mark_changed(path if event.is_directory else os.path.dirname(path))
+
+
+class PhotoIndex:
+    """SQLite index of the photo roots."""
+
+    _instance = None
+
+    def __new__(cls):
+        """Implement singleton pattern."""
+        if cls._instance is None:
+            cls._instance = super(PhotoIndex, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the index; the database is opened on first use."""
+        # Only initialize once for singleton
+        if self._initialized:
+            return
+
+        self._lock = threading.RLock()
+        self._db = None
+        self._db_path = None
+        self._roots = {}
+        self._changed = set()
+        self._last_refresh = 0
+        self._observer = None
+        self._initialized = True
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, reopening it if PHOTO_INDEX_FILE changed."""
+        from ..config import PHOTO_INDEX_FILE
+
+        if self._db is not None and self._db_path == PHOTO_INDEX_FILE:
+            return self._db
+        if self._db is not None:
+            self._db.close()
+
+        os.makedirs(os.path.dirname(PHOTO_INDEX_FILE), exist_ok=True)
+        db = sqlite3.connect(PHOTO_INDEX_FILE, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        if db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            db.executescript('DROP TABLE IF EXISTS photos; DROP TABLE IF EXISTS folders;')
+            db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        db.executescript(SCHEMA)
+        self._db = db
+        self._db_path = PHOTO_INDEX_FILE
+        self._last_refresh = 0
+        return db
+
+    def roots(self) -> Dict[str, str]:
+        """Indexed roots by name: photos, backup and external:<drive>."""
+        from ..config import PHOTOS_DIR, PHOTOS_BACKUP_DIR, EXTERNAL_BACKUP_DIRNAME
+
+        roots = {PHOTOS_ROOT: PHOTOS_DIR, BACKUP_ROOT: PHOTOS_BACKUP_DIR}
+        for mount_base in ['/media', '/mnt']:
+            if not os.path.isdir(mount_base):
+                continue
+            # Mounted at /media/<user>/<drive> by the desktop, or at /mnt/<drive>
+            candidates = []
+            for name in os.listdir(mount_base):
+                path = os.path.join(mount_base, name)
+                if os.path.ismount(path):
+                    candidates.append(path)
+                elif os.path.isdir(path):
+                    candidates.extend(os.path.join(path, drive) for drive in os.listdir(path))
+            for mount_path in candidates:
+                backup_dir = os.path.join(mount_path, EXTERNAL_BACKUP_DIRNAME)
+                if os.path.ismount(mount_path) and os.path.isdir(backup_dir):
+                    roots[EXTERNAL_ROOT_PREFIX + os.path.basename(mount_path)] = backup_dir
+        return roots
+
+    def root_path(self, root: str) -> Optional[str]:
+        """Directory of a root, or None if it isn't indexed."""
+        with self._lock:
+            if root not in self._roots:
+                self._roots = self.roots()
+            return self._roots.get(root)
+
+    def mark_changed(self, folder: str):
+        """Have a folder listed again on the next query."""
+        with self._lock:
+            self._changed.add(os.path.abspath(folder))
+
+    def _scan_folder(self, db: sqlite3.Connection, root: str, root_path: str, folder: str):
+        """List one folder and bring its rows up to date."""
+        from ..utils.files import is_photo_file, read_photo_manifest
+
+        path = os.path.join(root_path, folder) if folder else root_path
+        manifest = read_photo_manifest(path)
+        rows = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not is_photo_file(entry.name):
+                        continue
+                    stat = entry.stat()
+                    record = manifest.get(entry.name, {})
+                    parsed = parse_filename(entry.name)
+                    if record.get('capturedAt'):
+                        taken = time.strftime('%H:%M:%S', time.localtime(record['capturedAt']))
+                    else:
+                        taken = parsed['time'] or '00:00:00'
+                    hdr = record.get('hdrIndex', parsed['hdr'])
+                    rows.append((root, folder, entry.name, stat.st_size, stat.st_mtime,
+                                 record.get('exposureTime'), record.get('lensPosition'),
+                                 record.get('capturedAt'), taken, hdr, parsed['device']))
+        except OSError:
+            pass
+
+        db.execute('DELETE FROM photos WHERE root = ? AND folder = ?', (root, folder))
+        db.executemany('INSERT INTO photos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _refresh_root(self, db: sqlite3.Connection, root: str, root_path: str, now: float):
+        """List the folders of a root whose mtime changed."""
+        from ..config import PHOTO_INDEX_SETTLE_TIME
+
+        known = dict(db.execute('SELECT folder, mtime_ns FROM folders WHERE root = ?', (root,)))
+
+        current = {}
+        try:
+            current[''] = os.stat(root_path).st_mtime_ns
+            with os.scandir(root_path) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        current[entry.name] = entry.stat().st_mtime_ns
+        except OSError:
+            # The root is gone (e.g. a drive was unplugged)
+            current = {}
+
+        for folder in set(known) - set(current):
+            db.execute('DELETE FROM photos WHERE root = ? AND folder = ?', (root, folder))
+            db.execute('DELETE FROM folders WHERE root = ? AND folder = ?', (root, folder))
+
+        for folder, mtime_ns in current.items():
+            path = os.path.abspath(os.path.join(root_path, folder))
+            if known.get(folder) == mtime_ns and path not in self._changed:
+                continue
+            self._scan_folder(db, root, root_path, folder)
+            self._changed.discard(path)
+            # Files may still be written to a folder that just changed
+            settled = now - mtime_ns / 1e9 > PHOTO_INDEX_SETTLE_TIME
+            db.execute('INSERT OR REPLACE INTO folders VALUES (?, ?, ?)',
+                       (root, folder, mtime_ns if settled else 0))
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date with the folders.
+
+        Args:
+            force: Check every folder even if the last check was recent
+        """
+        from ..config import PHOTO_INDEX_REFRESH_INTERVAL, PHOTO_INDEX_RECONCILE_INTERVAL
+
+        with self._lock:
+            db = self._connect()
+            interval = (PHOTO_INDEX_RECONCILE_INTERVAL if self._observer is not None
+                        else PHOTO_INDEX_REFRESH_INTERVAL)
+            now = time.time()
+            if not force and not self._changed and now - self._last_refresh < interval:
+                return
+
+            start_time = time.time()
+            self._roots = self.roots()
+            with db:
+                # Drop roots that are no longer there, such as an unplugged drive
+                placeholders = ','.join('?' * len(self._roots))
+                db.execute(f'DELETE FROM photos WHERE root NOT IN ({placeholders})', list(self._roots))
+                db.execute(f'DELETE FROM folders WHERE root NOT IN ({placeholders})', list(self._roots))
+                for root, root_path in self._roots.items():
+                    self._refresh_root(db, root, root_path, now)
+            self._last_refresh = now
+            logger.debug(f"Photo index refreshed in {time.time() - start_time:.3f}s")
+
+    def start(self):
+        """Build the index in the background and start watching the roots."""
+        threading.Thread(target=self.refresh, kwargs={'force': True},
+                         name='PhotoIndex-Refresh', daemon=True).start()
+
+        if not WATCHDOG_AVAILABLE:
+            logger.info("watchdog not installed, photo index checks folders on each query")
+            return
+
+        try:
+            observer = Observer()
+            for root_path in self.roots().values():
+                if os.path.isdir(root_path):
+                    observer.schedule(_FolderEvents(self), root_path, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            logger.warning(f"Could not watch photo folders: {str(e)}")
+
+    def stop(self):
+        """Stop watching and close the database."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Run a query on an up-to-date index."""
+        with self._lock:
+            self.refresh()
+            return self._db.execute(sql, params).fetchall()
+
+    def dates(self, root: str = PHOTOS_ROOT) -> List[str]:
+        """Dated folders (YYYY-MM-DD) with photos, newest first."""
+        rows = self._query(
+            "SELECT DISTINCT folder FROM photos WHERE root = ? AND folder LIKE '20__-__-__' "
+            "ORDER BY folder DESC", (root,))
+        return [folder for folder, in rows]
+
+    def photos(self, date: Optional[str] = None, root: str = PHOTOS_ROOT,
+               filters: Optional[Dict[str, Any]] = None, time_range: Optional[Tuple] = None,
+               after: Optional[Tuple[str, str, str]] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Photos of a root, newest first.
+
+        Photos are ordered by (folder, time, filename), so a page starts
+        right after the last photo of the previous one whatever the size
+        of the archive.
+
+        Args:
+            date: Only this dated folder
+            root: Indexed root
+            filters: Values for the keys of PHOTO_FILTERS
+            time_range: (from, to) times of day as HH:MM[:SS]; a range past
+                midnight such as ('22:00', '02:00') wraps
+            after: (folder, time, filename) of the last photo already returned
+            limit: Most photos to return
+
+        Returns:
+            Rows with folder, filename, size, mtime, exposure, focus,
+            capturedAt, time, hdr and device
+        """
+        sql = ('SELECT folder, filename, size, mtime, exposure, focus, captured_at, '
+               'time, hdr, device FROM photos WHERE root = ?')
+        params = [root]
+        if date:
+            sql += ' AND folder = ?'
+            params.append(date)
+        for key, value in (filters or {}).items():
+            if value is not None:
+                sql += f' AND {PHOTO_FILTERS[key]}'
+                params.append(value)
+        if time_range:
+            start, end = time_range
+            # "22:00" <= "22:00:00", and "02:00:59" < "02:00~"
+            join = 'AND' if start <= end else 'OR'
+            sql += f' AND (time >= ? {join} time <= ?)'
+            params.extend([start, end + '~'])
+        if after:
+            sql += ' AND (folder, time, filename) < (?, ?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY folder DESC, time DESC, filename DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        keys = ('folder', 'filename', 'size', 'mtime', 'exposure', 'focus', 'capturedAt',
+                'time', 'hdr', 'device')
+        return [dict(zip(keys, row)) for row in self._query(sql, tuple(params))]
+
+    def stats(self, root: str = PHOTOS_ROOT) -> Tuple[int, int]:
+        """Number of photos in a root and their total size in bytes."""
+        count, size = self._query('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM photos '
+                                  'WHERE root = ?', (root,))[0]
+        return count, size
+
+    def newest_mtime(self, root: str = PHOTOS_ROOT) -> float:
+        """Modification time of the newest photo in a root (0 if none)."""
+        return self._query('SELECT COALESCE(MAX(mtime), 0) FROM photos WHERE root = ?',
+                           (root,))[0][0]
+
+    def locate(self, filename: str, root: str = PHOTOS_ROOT) -> List[str]:
+        """Paths of the photos with a file name in a root."""
+        rows = self._query('SELECT folder FROM photos WHERE root = ? AND filename = ?',
+                           (root, filename))
+        root_path = self.root_path(root)
+        return [os.path.join(root_path, folder, filename) for folder, in rows]
+
+
+# Create singleton instance
+photo_index = PhotoIndex()
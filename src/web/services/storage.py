@@ -9,7 +9,9 @@ import subprocess
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional, Any
 
-from ..config import PHOTOS_DIR, PHOTOS_BACKUP_DIR
+from ..config import (
+    PHOTOS_DIR, PHOTOS_BACKUP_DIR, THUMBNAIL_SUFFIX, PREVIEW_SUFFIX, EXTERNAL_BACKUP_DIRNAME
+)
 from ..error_handlers import APIError, ErrorCode
 from .job_queue import background_task
 
@@ -160,6 +162,9 @@ class StorageManager:
     def _is_photo_file(self, filename: str) -> bool:
         """Check if a file is a photo.
         
+        Thumbnails and previews written next to photos are not photos; they
+        are left out of counts and backups and can be regenerated.
+        
         Args:
             filename: File name
             
@@ -167,7 +172,10 @@ class StorageManager:
             True if file is a photo
         """
         photo_extensions = ('.jpg', '.jpeg', '.png', '.bmp')
-        return filename.lower().endswith(photo_extensions)
+        filename = filename.lower()
+        if filename.endswith((THUMBNAIL_SUFFIX, PREVIEW_SUFFIX)):
+            return False
+        return filename.endswith(photo_extensions)
     
     def _is_date_dir(self, dirname: str) -> bool:
         """Check if a directory name is a date (YYYY-MM-DD format).
@@ -285,7 +293,7 @@ class StorageManager:
                 }
             
             # Create backup directory on external storage
-            backup_dir = os.path.join(external['path'], 'CreatureBox_Backup')
+            backup_dir = os.path.join(external['path'], EXTERNAL_BACKUP_DIRNAME)
             
             # Start backup
             return self.backup_photos(backup_dir)
@@ -0,0 +1,247 @@
+"""
+Disk cache of thumbnails generated from full-resolution photos.
+
+Photos saved before renditions were written at capture time have no
+thumbnail next to them, and decoding a 64MP JPEG to make one takes seconds.
+Generated thumbnails are kept here, named after a hash of the photo's path,
+mtime and size, so a replaced photo gets a new entry and the hash doubles as
+the thumbnail's ETag. The cache is kept under THUMBNAIL_CACHE_MAX_SIZE by
+evicting the least recently used entries, and requests for a thumbnail that
+is still being generated wait for it instead of decoding the photo again.
+
+Photos with a thumbnail in their EXIF block are resized from it, which
+only reads the first few KB of the file. The others are decoded in a pool
+of THUMBNAIL_WORKERS processes, so thumbnails of a gallery page are made on
+several cores instead of taking turns on the GIL.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from ..config import (
+    THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_SIZE, THUMBNAIL_SIZE, THUMBNAIL_QUALITY,
+    THUMBNAIL_WORKERS
+)
+from ..utils.camera import generate_thumbnail, exif_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Hits refresh an entry's mtime (its LRU position) at most this often
+TOUCH_INTERVAL = 3600
+# Eviction frees space down to this fraction of the maximum size
+EVICT_TARGET = 0.9
+# Longest a request waits for another request's thumbnail
+GENERATE_TIMEOUT = 60
+
+
+class ThumbnailCache:
+    """Thumbnail cache service."""
+
+    _instance = None
+
+    def __new__(cls):
+        """Implement singleton pattern."""
+        if cls._instance is None:
+            cls._instance = super(ThumbnailCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the thumbnail cache."""
+        # Only initialize once for singleton
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._generating = {}
+        self._size = None
+        self._pool = None
+        self._initialized = True
+
+    def cache_key(self, file_path: str) -> str:
+        """Key of a photo's thumbnail, which changes when the photo does.
+
+        Args:
+            file_path: Photo path
+
+        Returns:
+            Hex digest of the path, mtime, size and thumbnail settings
+        """
+        stat = os.stat(file_path)
+        key = (f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|"
+               f"{THUMBNAIL_SIZE}|{THUMBNAIL_QUALITY}")
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        """Path of a cache entry; entries are spread over 256 folders."""
+        return os.path.join(THUMBNAIL_CACHE_DIR, key[:2], f"{key}.jpg")
+
+    def get(self, file_path: str) -> Optional[Tuple[str, str]]:
+        """Get a photo's thumbnail, generating it on a miss.
+
+        Args:
+            file_path: Photo path
+
+        Returns:
+            Thumbnail path and ETag, or None if no thumbnail could be made
+        """
+        key = self.cache_key(file_path)
+        cache_path = self._cache_path(key)
+
+        if self._hit(cache_path):
+            return cache_path, key
+
+        with self._lock:
+            done = self._generating.get(key)
+            leader = done is None
+            if leader:
+                done = self._generating[key] = threading.Event()
+
+        if not leader:
+            # Another request is decoding this photo
+            done.wait(GENERATE_TIMEOUT)
+            return (cache_path, key) if os.path.exists(cache_path) else None
+
+        try:
+            if self._hit(cache_path):
+                return cache_path, key
+            if not self._generate(file_path, cache_path):
+                return None
+            return cache_path, key
+        finally:
+            with self._lock:
+                del self._generating[key]
+            done.set()
+
+    def _hit(self, cache_path: str) -> bool:
+        """Check for an entry and move it to the front of the LRU order."""
+        try:
+            mtime = os.stat(cache_path).st_mtime
+        except OSError:
+            return False
+
+        now = time.time()
+        if now - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(cache_path, (now, now))
+            except OSError:
+                pass
+        return True
+
+    def _generate(self, file_path: str, cache_path: str) -> bool:
+        """Decode a photo and store its thumbnail."""
+        start_time = time.time()
+        # Most photos carry a small thumbnail in their EXIF block
+        thumbnail = exif_thumbnail(file_path, THUMBNAIL_SIZE, THUMBNAIL_QUALITY)
+        if thumbnail is None:
+            thumbnail = self._render(file_path)
+        if thumbnail is None:
+            return False
+
+        data = thumbnail.tobytes()
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, cache_path)
+
+        logger.debug(f"Generated thumbnail of {file_path} in {time.time() - start_time:.2f}s")
+        self._added(len(data))
+        return True
+
+    def _render(self, file_path: str):
+        """Make a thumbnail in the worker pool (or here without workers)."""
+        if THUMBNAIL_WORKERS <= 0:
+            return generate_thumbnail(file_path, THUMBNAIL_SIZE, THUMBNAIL_QUALITY)
+
+        with self._lock:
+            if self._pool is None:
+                # Forking the threaded web server could copy a held lock into the child
+                context = multiprocessing.get_context('forkserver')
+                self._pool = ProcessPoolExecutor(THUMBNAIL_WORKERS, mp_context=context)
+            pool = self._pool
+
+        try:
+            future = pool.submit(generate_thumbnail, file_path, THUMBNAIL_SIZE,
+                                 THUMBNAIL_QUALITY)
+            return future.result(GENERATE_TIMEOUT)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory); start a new pool next time
+            logger.error(f"Thumbnail workers stopped: {str(e)}")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            return None
+        except Exception as e:
+            logger.error(f"Error generating thumbnail of {file_path}: {str(e)}")
+            return None
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _entries(self):
+        """(mtime, size, path) of every cache entry."""
+        entries = []
+        if not os.path.isdir(THUMBNAIL_CACHE_DIR):
+            return entries
+        for folder in os.scandir(THUMBNAIL_CACHE_DIR):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _added(self, size: int):
+        """Account for a new entry and evict if the cache got too big."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry_size for _, entry_size, _ in self._entries())
+            else:
+                self._size += size
+            if self._size > THUMBNAIL_CACHE_MAX_SIZE:
+                self._evict()
+
+    def _evict(self):
+        """Delete the least recently used entries (called with the lock held)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+
+        for _, size, path in entries:
+            if total <= THUMBNAIL_CACHE_MAX_SIZE * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+
+        self._size = total
+        logger.info(f"Evicted {removed} thumbnails, cache is {total / 1024**2:.1f} MB")
+
+    def clear(self):
+        """Delete every cache entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+# Create singleton instance
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,319 @@
+"""
+Deep-zoom tile pyramids for full-resolution photos.
+
+A 64MP JPEG is tens of MB, too much to send to a phone over field Wi-Fi
+just to look at one moth. A pyramid stores the photo at every power-of-two
+scale as small JPEG tiles, laid out as a Deep Zoom Image (DZI): viewers
+such as OpenSeadragon load <photo>.dzi and then fetch only the tiles of
+the visible region at the zoom level they show.
+
+Decoding a 64MP photo takes about 190 MB, so pyramids are built one at a
+time on the job queue, never in a request thread.
+"""
+import os
+import json
+import math
+import time
+import shutil
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+from werkzeug.utils import secure_filename
+
+from ..config import PHOTOS_DIR, TILES_DIR, TILE_SIZE, TILE_OVERLAP, TILE_QUALITY
+from .job_queue import job_queue, background_task, JobStatus
+
+logger = logging.getLogger(__name__)
+
+DZI_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="jpg" '
+    'Overlap="{overlap}" TileSize="{tile_size}">\n'
+    '  <Size Width="{width}" Height="{height}"/>\n'
+    '</Image>\n'
+)
+
+
+def dzi_descriptor(width: int, height: int, tile_size: int = TILE_SIZE,
+                   overlap: int = TILE_OVERLAP) -> str:
+    """Build the DZI descriptor of a pyramid.
+
+    Args:
+        width: Full-resolution width
+        height: Full-resolution height
+        tile_size: Tile size without overlap
+        overlap: Pixels shared with each neighbouring tile
+
+    Returns:
+        DZI XML
+    """
+    return DZI_TEMPLATE.format(width=width, height=height, tile_size=tile_size, overlap=overlap)
+
+
+def build_pyramid(image, output_dir: str, tile_size: int = TILE_SIZE,
+                  overlap: int = TILE_OVERLAP, quality: int = TILE_QUALITY) -> Dict[str, int]:
+    """Write the tiles of every zoom level of an image.
+
+    Level N is the full image and every level below is half the size of
+    the one above, down to level 0 at 1x1. Each level is made from the one
+    above it, so the full image is only resized once.
+
+    Args:
+        image: HxWx3 BGR array
+        output_dir: Directory that gets a <level>/<col>_<row>.jpg tree
+        tile_size: Tile size without overlap
+        overlap: Pixels shared with each neighbouring tile
+        quality: JPEG quality
+
+    Returns:
+        Size of the image, number of levels and number of tiles
+    """
+    height, width = image.shape[:2]
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    tiles = 0
+
+    level_image = image
+    for level in range(max_level, -1, -1):
+        level_height, level_width = level_image.shape[:2]
+        level_dir = os.path.join(output_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+
+        for col in range(math.ceil(level_width / tile_size)):
+            x0 = max(0, col * tile_size - overlap)
+            x1 = min(level_width, (col + 1) * tile_size + overlap)
+            for row in range(math.ceil(level_height / tile_size)):
+                y0 = max(0, row * tile_size - overlap)
+                y1 = min(level_height, (row + 1) * tile_size + overlap)
+                ok, jpeg = cv2.imencode('.jpg', level_image[y0:y1, x0:x1], params)
+                if not ok:
+                    raise IOError(f"Failed to encode tile {level}/{col}_{row}")
+                with open(os.path.join(level_dir, f"{col}_{row}.jpg"), 'wb') as f:
+                    f.write(jpeg)
+                tiles += 1
+
+        if level > 0:
+            # DZI level sizes round up
+            size = ((level_width + 1) // 2, (level_height + 1) // 2)
+            level_image = cv2.resize(level_image, size, interpolation=cv2.INTER_AREA)
+
+    return {'width': width, 'height': height, 'levels': max_level + 1, 'tiles': tiles}
+
+
+class TileManager:
+    """Tile pyramid service."""
+
+    _instance = None
+
+    def __new__(cls):
+        """Implement singleton pattern."""
+        if cls._instance is None:
+            cls._instance = super(TileManager, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the tile manager."""
+        # Only initialize once for singleton
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        # One build at a time, whoever asked for it
+        self._build_lock = threading.Lock()
+        self._pending = {}  # descriptor path -> job id of a queued build
+        self._initialized = True
+
+    def _paths(self, date: str, filename: str) -> Tuple[str, str]:
+        """Paths of a photo's DZI descriptor and tile directory."""
+        name = secure_filename(filename)
+        folder = os.path.join(TILES_DIR, secure_filename(date))
+        return os.path.join(folder, f"{name}.dzi"), os.path.join(folder, f"{name}_files")
+
+    @staticmethod
+    def _source_stamp(file_path: str) -> Dict[str, Any]:
+        """Modification time and size of a photo, to notice it being replaced."""
+        stat = os.stat(file_path)
+        return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+    def has_pyramid(self, date: str, filename: str) -> bool:
+        """Check if a photo's pyramid is complete.
+
+        The descriptor is written last, so it only exists for complete
+        pyramids.
+        """
+        dzi_path, _ = self._paths(date, filename)
+        return os.path.exists(dzi_path)
+
+    def is_current(self, file_path: str, date: str) -> bool:
+        """Check if a photo has a complete pyramid built from its current file."""
+        dzi_path, _ = self._paths(date, os.path.basename(file_path))
+        if not os.path.exists(dzi_path):
+            return False
+        try:
+            with open(dzi_path + '.json') as f:
+                return json.load(f) == self._source_stamp(file_path)
+        except (OSError, ValueError):
+            return False
+
+    def generate_pyramid(self, file_path: str, date: str) -> Optional[Dict[str, Any]]:
+        """Build the pyramid of a photo unless it already has a current one.
+
+        Args:
+            file_path: Photo path
+            date: Dated folder of the photo
+
+        Returns:
+            Pyramid statistics, or None if the pyramid was up to date
+        """
+        filename = os.path.basename(file_path)
+        dzi_path, tiles_dir = self._paths(date, filename)
+
+        with self._build_lock:
+            if self.is_current(file_path, date):
+                return None
+
+            start_time = time.time()
+            stamp = self._source_stamp(file_path)
+            image = cv2.imread(file_path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise IOError(f"Could not read {file_path}")
+
+            # Build next to the final directory so a half-built pyramid is never served
+            temp_dir = tiles_dir + '.tmp'
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            stats = build_pyramid(image, temp_dir)
+            del image
+
+            if os.path.exists(dzi_path):
+                os.remove(dzi_path)
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+            os.replace(temp_dir, tiles_dir)
+            with open(dzi_path + '.json', 'w') as f:
+                json.dump(stamp, f)
+            with open(dzi_path + '.tmp', 'w') as f:
+                f.write(dzi_descriptor(stats['width'], stats['height']))
+            os.replace(dzi_path + '.tmp', dzi_path)
+
+            stats['time'] = time.time() - start_time
+            logger.info(f"Built {stats['tiles']} tiles for {filename} in {stats['time']:.2f}s")
+            return stats
+
+    def get_dzi(self, date: str, file_path: str) -> Optional[str]:
+        """Get the DZI descriptor of a photo.
+
+        Args:
+            date: Dated folder of the photo
+            file_path: Photo path
+
+        Returns:
+            Path of the descriptor, or None if the photo has no current
+            pyramid (see queue_pyramid)
+        """
+        if not self.is_current(file_path, date):
+            return None
+        dzi_path, _ = self._paths(date, os.path.basename(file_path))
+        return dzi_path
+
+    def queue_pyramid(self, file_path: str, date: str) -> str:
+        """Build a photo's pyramid on the job queue, once however often it's asked for.
+
+        Args:
+            file_path: Photo path
+            date: Dated folder of the photo
+
+        Returns:
+            ID of the job building the pyramid
+        """
+        dzi_path, _ = self._paths(date, os.path.basename(file_path))
+        with self._lock:
+            job_id = self._pending.get(dzi_path)
+            job = job_queue.get_job(job_id) if job_id else None
+            if job is None or job['status'] not in (JobStatus.PENDING.value,
+                                                     JobStatus.RUNNING.value):
+                job_id = self._pending[dzi_path] = self._generate_queued(file_path, date)
+            return job_id
+
+    @background_task(name="Generate Photo Tiles", timeout=600)
+    def _generate_queued(self, file_path: str, date: str) -> Optional[Dict[str, Any]]:
+        """Build one photo's pyramid as a job, then forget the queued build."""
+        dzi_path, _ = self._paths(date, os.path.basename(file_path))
+        try:
+            return self.generate_pyramid(file_path, date)
+        finally:
+            with self._lock:
+                self._pending.pop(dzi_path, None)
+
+    def get_tile(self, date: str, filename: str, level: int, col: int, row: int) -> Optional[str]:
+        """Get one tile of a photo's pyramid.
+
+        Args:
+            date: Dated folder of the photo
+            filename: Photo file name
+            level: Zoom level
+            col: Tile column
+            row: Tile row
+
+        Returns:
+            Tile path, or None if it doesn't exist
+        """
+        _, tiles_dir = self._paths(date, filename)
+        tile_path = os.path.join(tiles_dir, str(level), f"{col}_{row}.jpg")
+        return tile_path if os.path.exists(tile_path) else None
+
+    def remove_pyramid(self, date: str, filename: str):
+        """Delete a photo's pyramid."""
+        dzi_path, tiles_dir = self._paths(date, filename)
+        for path in (dzi_path, dzi_path + '.json'):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    def remove_pyramids(self, filename: str):
+        """Delete a photo's pyramid from whichever night it is in."""
+        if not os.path.isdir(TILES_DIR):
+            return
+        for date in os.listdir(TILES_DIR):
+            self.remove_pyramid(date, filename)
+
+    @background_task(name="Generate Tiles", timeout=3600)
+    def generate_date(self, date: str) -> Dict[str, Any]:
+        """Build the pyramids of every photo of a night.
+
+        Args:
+            date: Dated folder (YYYY-MM-DD)
+
+        Returns:
+            Number of pyramids built, skipped and failed
+        """
+        from ..utils.files import is_photo_file
+
+        folder = os.path.join(PHOTOS_DIR, secure_filename(date))
+        built = 0
+        skipped = 0
+        failed = 0
+
+        for filename in sorted(os.listdir(folder)):
+            if not is_photo_file(filename):
+                continue
+            try:
+                if self.generate_pyramid(os.path.join(folder, filename), date) is None:
+                    skipped += 1
+                else:
+                    built += 1
+            except Exception as e:
+                logger.error(f"Error building tiles for {filename}: {str(e)}")
+                failed += 1
+
+        return {
+            'status': 'success',
+            'built': built,
+            'skipped': skipped,
+            'failed': failed
+        }
+
+
+# Create singleton instance
+tile_manager = TileManager()
@@ -24,6 +24,7 @@ def app():
     config.CAMERA_SETTINGS_FILE = os.path.join(test_dir, "camera_settings.csv")
     config.SCHEDULE_SETTINGS_FILE = os.path.join(test_dir, "schedule_settings.csv")
     config.CONTROLS_FILE = os.path.join(test_dir, "controls.txt")
+    config.PHOTO_INDEX_FILE = os.path.join(test_dir, "photo_index.db")
     
     # Create empty camera settings file
     with open(config.CAMERA_SETTINGS_FILE, 'w') as f:
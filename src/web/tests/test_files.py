@@ -0,0 +1,67 @@
+"""
+Tests for the photo file utilities.
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+from ..utils.files import get_photos, get_photo_page, read_photo_manifest
+from ..services.photo_index import photo_index
+
+
+@pytest.fixture
+def photos_dir(tmp_path):
+    """Photos directory with one night of photos."""
+    night = tmp_path / "2025-01-01"
+    night.mkdir()
+    for name in ("box_2025_01_01__22_00_00_HDR0.jpg", "box_2025_01_01__22_05_00_HDR0.jpg",
+                 "box_2025_01_01__22_00_00_HDR0.thumb.jpg"):
+        (night / name).write_bytes(b"\xff\xd8")
+    with patch('src.web.config.PHOTOS_DIR', str(tmp_path)), \
+            patch('src.web.config.PHOTO_INDEX_FILE', str(tmp_path / "photo_index.db")):
+        yield tmp_path
+    photo_index.stop()
+
+
+def test_read_photo_manifest_skips_truncated_lines(tmp_path):
+    """Test that a line cut short doesn't hide the other records."""
+    with open(tmp_path / "manifest.jsonl", 'w') as f:
+        f.write(json.dumps({"file": "a.jpg", "exposureTime": 500}) + "\n")
+        f.write('{"file": "b.jp')
+
+    records = read_photo_manifest(str(tmp_path))
+    assert list(records) == ["a.jpg"]
+    assert read_photo_manifest(str(tmp_path / "missing")) == {}
+
+
+def test_get_photos_uses_manifest(photos_dir):
+    """Test that exposure and focus come from the manifest when it has them."""
+    record = {"file": "box_2025_01_01__22_00_00_HDR0.jpg", "exposureTime": 520,
+              "lensPosition": 7.5, "capturedAt": 1735768800.0}
+    with open(photos_dir / "2025-01-01" / "manifest.jsonl", 'w') as f:
+        f.write(json.dumps(record) + "\n")
+
+    photos = {photo['filename']: photo for photo in get_photos("2025-01-01")}
+
+    # Renditions are not listed as photos
+    assert len(photos) == 2
+    assert photos[record['file']]['exposure'] == 520
+    assert photos[record['file']]['focus'] == 7.5
+    assert photos["box_2025_01_01__22_05_00_HDR0.jpg"]['exposure'] == 0
+
+
+def test_get_photo_page_follows_cursor(photos_dir):
+    """Test that pages continue where the previous one stopped."""
+    (photos_dir / "2025-01-01" / "box_2025_01_01__23_00_00_HDR1.jpg").write_bytes(b"\xff\xd8")
+
+    first = get_photo_page("2025-01-01", limit=2)
+    assert [photo['time'] for photo in first['photos']] == ["23:00:00", "22:05:00"]
+    second = get_photo_page("2025-01-01", limit=2, cursor=first['nextCursor'])
+    assert [photo['time'] for photo in second['photos']] == ["22:00:00"]
+    assert second['nextCursor'] is None
+
+    page = get_photo_page(limit=10, filters={'hdr': 1}, fields=['filename', 'device'])
+    assert page['photos'] == [{'filename': "box_2025_01_01__23_00_00_HDR1.jpg", 'device': "box"}]
+
+    page = get_photo_page(limit=10, time_range=("22:01", "22:59"))
+    assert [photo['time'] for photo in page['photos']] == ["22:05:00"]
@@ -0,0 +1,70 @@
+import json
+import pytest
+from ..utils.metrics import read_capture_metrics, summarize_capture_metrics
+
+
+def _record(started_at, source='TakePhoto', version='abc123', capture=1.0):
+    return {
+        'source': source,
+        'version': version,
+        'startedAt': started_at,
+        'totalTime': capture + 2.0,
+        'flashTime': 0.1,
+        'encodeTime': 0.5,
+        'writeTime': 0.2,
+        'phases': {'imports': 2.0, 'capture': capture},
+        'exposures': [{'settle': 0.05, 'flashOn': 0.001, 'capture': 0.09, 'flashOff': 0.001,
+                       'flashTime': 0.1}],
+        'saves': [],
+    }
+
+
+@pytest.fixture
+def metrics_file(tmpdir):
+    """Metrics file with a rotated part and a partial last line."""
+    path = tmpdir.join('capture_metrics.jsonl')
+    tmpdir.join('capture_metrics.jsonl.1').write(json.dumps(_record(100)) + '\n')
+    path.write(json.dumps(_record(200, source='daemon')) + '\n' +
+               json.dumps(_record(300, version='def456', capture=3.0)) + '\n' +
+               '{"source": "TakePh')
+    return str(path)
+
+
+def test_read_capture_metrics(metrics_file):
+    """Test reading records newest first across the rotated file."""
+    records = read_capture_metrics(metrics_file)
+    assert [record['startedAt'] for record in records] == [300, 200, 100]
+
+
+def test_read_capture_metrics_filters(metrics_file):
+    """Test time, source and limit filters."""
+    assert [r['startedAt'] for r in read_capture_metrics(metrics_file, since=200)] == [300, 200]
+    assert [r['startedAt'] for r in read_capture_metrics(metrics_file, until=200)] == [100]
+    assert [r['startedAt'] for r in read_capture_metrics(metrics_file, source='daemon')] == [200]
+    assert [r['startedAt'] for r in read_capture_metrics(metrics_file, limit=1)] == [300]
+
+
+def test_read_capture_metrics_missing_file(tmpdir):
+    """Test that a missing metrics file gives no records."""
+    assert read_capture_metrics(str(tmpdir.join('missing.jsonl'))) == []
+
+
+def test_summarize_capture_metrics(metrics_file):
+    """Test per-phase, flash and per-version aggregation."""
+    summary = summarize_capture_metrics(read_capture_metrics(metrics_file), flash_power_watts=20)
+
+    assert summary['captures'] == 3
+    assert summary['phases']['capture']['max'] == 3.0
+    assert summary['phases']['capture']['p50'] == 1.0
+    assert summary['phases']['encodeTime']['total'] == pytest.approx(1.5)
+    assert summary['exposures']['flashTime']['count'] == 3
+    assert summary['flashTime'] == pytest.approx(0.3)
+    assert summary['flashEnergy'] == pytest.approx(6.0)
+    assert summary['versions']['abc123']['captures'] == 2
+    assert summary['versions']['def456']['totalTime']['mean'] == 5.0
+
+
+def test_summarize_without_flash_power():
+    """Test that flash energy is only estimated with a known flash power."""
+    summary = summarize_capture_metrics([_record(100)], flash_power_watts=0)
+    assert summary['flashEnergy'] is None
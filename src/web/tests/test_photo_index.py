@@ -0,0 +1,48 @@
+"""
+Tests for the photo index.
+"""
+import os
+import pytest
+from unittest.mock import patch
+
+from ..services.photo_index import photo_index
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Photo index over a photos folder with one night of photos."""
+    photos = tmp_path / "photos"
+    night = photos / "2025-01-01"
+    night.mkdir(parents=True)
+    (night / "a.jpg").write_bytes(b"\xff\xd8" * 10)
+    (night / "a.thumb.jpg").write_bytes(b"\xff\xd8")
+    (photos / "loose.jpg").write_bytes(b"\xff\xd8")
+
+    with patch('src.web.config.PHOTOS_DIR', str(photos)), \
+            patch('src.web.config.PHOTOS_BACKUP_DIR', str(tmp_path / "photos_backedup")), \
+            patch('src.web.config.PHOTO_INDEX_FILE', str(tmp_path / "photo_index.db")):
+        yield photos
+    photo_index.stop()
+
+
+def test_index_lists_photos(index):
+    """Test that photos are indexed and renditions are left out."""
+    assert photo_index.dates() == ["2025-01-01"]
+    assert sorted(row['filename'] for row in photo_index.photos()) == ["a.jpg", "loose.jpg"]
+    assert photo_index.stats() == (2, 22)
+    assert photo_index.locate("a.jpg") == [str(index / "2025-01-01" / "a.jpg")]
+    assert photo_index.dates('backup') == []
+
+
+def test_index_follows_changes(index):
+    """Test that new and deleted photos show up on the next refresh."""
+    assert photo_index.stats()[0] == 2
+
+    (index / "2025-01-02").mkdir()
+    (index / "2025-01-02" / "b.jpg").write_bytes(b"\xff\xd8")
+    os.remove(index / "loose.jpg")
+    photo_index.refresh(force=True)
+
+    assert photo_index.dates() == ["2025-01-02", "2025-01-01"]
+    assert photo_index.locate("loose.jpg") == []
+    assert photo_index.newest_mtime() == os.path.getmtime(index / "2025-01-02" / "b.jpg")
@@ -65,6 +65,8 @@ def test_get_storage_stats(tmpdir):
     ("test.png", True),
     ("test.bmp", True),
     ("test.txt", False),
+    ("test.thumb.jpg", False),
+    ("test.preview.jpg", False),
     ("test", False),
 ])
 def test_is_photo_file(filename, expected):
@@ -0,0 +1,135 @@
+"""
+Tests for the thumbnail cache.
+"""
+import os
+import time
+import threading
+import cv2
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from ..services.thumbnails import thumbnail_cache
+from ..utils.camera import jpeg_dimensions, read_reduced, read_exif_thumbnail
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """Empty thumbnail cache directory."""
+    with patch('src.web.services.thumbnails.THUMBNAIL_CACHE_DIR', str(tmp_path / "cache")), \
+            patch('src.web.services.thumbnails.THUMBNAIL_WORKERS', 0):
+        thumbnail_cache._size = None
+        yield tmp_path / "cache"
+    thumbnail_cache._size = None
+
+
+def slow_thumbnail(file_path, size, quality):
+    """Stand-in for decoding a large photo."""
+    time.sleep(0.2)
+    return np.frombuffer(b"\xff\xd8" + os.path.basename(file_path).encode(), dtype=np.uint8)
+
+
+def test_concurrent_requests_decode_once(cache_dir, tmp_path):
+    """Test that requests for a missing thumbnail share one decode."""
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"photo")
+    results = []
+
+    with patch('src.web.services.thumbnails.generate_thumbnail', side_effect=slow_thumbnail) as decode:
+        threads = [threading.Thread(target=lambda: results.append(thumbnail_cache.get(str(photo))))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Cached now
+        assert thumbnail_cache.get(str(photo)) == results[0]
+
+    assert decode.call_count == 1
+    assert len(set(results)) == 1
+
+    # A replaced photo gets a new entry and ETag
+    photo.write_bytes(b"new photo")
+    os.utime(photo, (time.time() + 10, time.time() + 10))
+    assert thumbnail_cache.cache_key(str(photo)) != results[0][1]
+
+
+def test_cache_evicts_least_recently_used(cache_dir, tmp_path):
+    """Test that the oldest entries go when the cache is full."""
+    paths = []
+    for i in range(4):
+        photo = tmp_path / f"photo{i}.jpg"
+        photo.write_bytes(b"photo")
+        paths.append(str(photo))
+
+    with patch('src.web.services.thumbnails.generate_thumbnail', side_effect=slow_thumbnail), \
+            patch('src.web.services.thumbnails.THUMBNAIL_CACHE_MAX_SIZE', 35):
+        entries = []
+        for i, path in enumerate(paths):
+            cache_path, _ = thumbnail_cache.get(path)
+            os.utime(cache_path, (1000 + i, 1000 + i))
+            entries.append(cache_path)
+
+    # 12 bytes each, 35 bytes allowed: the oldest two were evicted on the way
+    assert [os.path.exists(path) for path in entries] == [False, False, True, True]
+
+
+def test_read_reduced_picks_largest_reduction(tmp_path):
+    """Test that JPEGs are decoded at the smallest scale that keeps the size."""
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((1200, 1800, 3), dtype=np.uint8))
+
+    assert jpeg_dimensions(str(photo)) == (1800, 1200)
+    assert read_reduced(str(photo), 200).shape[:2] == (150, 225)
+    assert read_reduced(str(photo), 300).shape[:2] == (300, 450)
+    assert read_reduced(str(photo), 1000).shape[:2] == (1200, 1800)
+    assert read_reduced(str(photo), 0, short_side=200).shape[:2] == (300, 450)
+    assert jpeg_dimensions(str(tmp_path / "missing.jpg")) is None
+
+
+def test_thumbnail_workers(cache_dir, tmp_path):
+    """Test that thumbnails are made in the worker processes."""
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((1200, 1800, 3), dtype=np.uint8))
+
+    with patch('src.web.services.thumbnails.THUMBNAIL_WORKERS', 1):
+        cache_path, _ = thumbnail_cache.get(str(photo))
+        thumbnail_cache.shutdown()
+
+    assert cv2.imread(cache_path).shape[:2] == (200, 200)
+
+
+def test_thumbnail_quality(cache_dir, tmp_path):
+    """Test that thumbnails are encoded at THUMBNAIL_QUALITY, which is part of the cache key."""
+    photo = tmp_path / "photo.jpg"
+    rng = np.random.default_rng(0)
+    cv2.imwrite(str(photo), rng.integers(0, 255, (400, 600, 3), dtype=np.uint8))
+
+    sizes = []
+    for quality in (30, 95):
+        with patch('src.web.services.thumbnails.THUMBNAIL_QUALITY', quality):
+            cache_path, _ = thumbnail_cache.get(str(photo))
+        sizes.append(os.path.getsize(cache_path))
+
+    assert sizes[0] < sizes[1]
+
+
+def test_exif_thumbnail_skips_decode(cache_dir, tmp_path):
+    """Test that a thumbnail embedded in the EXIF block is used when there is one."""
+    piexif = pytest.importorskip("piexif")
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((1200, 1800, 3), dtype=np.uint8))
+    assert read_exif_thumbnail(str(photo)) is None
+
+    embedded = cv2.imencode('.jpg', np.zeros((240, 320, 3), dtype=np.uint8))[1].tobytes()
+    exif = piexif.dump({"0th": {piexif.ImageIFD.Make: "MothboxV4"}, "Exif": {}, "GPS": {},
+                        "1st": {piexif.ImageIFD.Compression: 6}, "thumbnail": embedded})
+    piexif.insert(exif, str(photo))
+    thumbnail = np.frombuffer(read_exif_thumbnail(str(photo)), dtype=np.uint8)
+    assert cv2.imdecode(thumbnail, cv2.IMREAD_COLOR).shape[:2] == (240, 320)
+
+    with patch('src.web.services.thumbnails.generate_thumbnail') as decode:
+        cache_path, _ = thumbnail_cache.get(str(photo))
+
+    decode.assert_not_called()
+    assert cv2.imread(cache_path).shape[:2] == (200, 200)
@@ -0,0 +1,80 @@
+"""
+Tests for the deep-zoom tile service.
+"""
+import os
+import cv2
+import numpy as np
+from unittest.mock import patch
+
+from ..services.tiles import tile_manager, build_pyramid
+
+
+def test_build_pyramid(tmp_path):
+    """Test that every level is tiled with the DZI sizes and overlap."""
+    image = np.zeros((300, 600, 3), dtype=np.uint8)
+
+    stats = build_pyramid(image, str(tmp_path), tile_size=254, overlap=1)
+
+    # 600px wide needs levels 0 (1x1) to 10 (full size)
+    assert stats['levels'] == 11
+    assert sorted(os.listdir(tmp_path / "10")) == ["0_0.jpg", "0_1.jpg", "1_0.jpg", "1_1.jpg",
+                                                   "2_0.jpg", "2_1.jpg"]
+    assert cv2.imread(str(tmp_path / "10" / "0_0.jpg")).shape[:2] == (255, 255)
+    assert cv2.imread(str(tmp_path / "10" / "1_1.jpg")).shape[:2] == (47, 256)
+    assert cv2.imread(str(tmp_path / "9" / "1_0.jpg")).shape[:2] == (150, 47)
+    assert cv2.imread(str(tmp_path / "0" / "0_0.jpg")).shape[:2] == (1, 1)
+
+
+def test_tile_manager_builds_once(tmp_path):
+    """Test that a pyramid is built once and then reused."""
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((64, 96, 3), dtype=np.uint8))
+
+    with patch('src.web.services.tiles.TILES_DIR', str(tmp_path / "tiles")):
+        # Not built yet
+        assert tile_manager.get_dzi("2025-01-01", str(photo)) is None
+
+        assert tile_manager.generate_pyramid(str(photo), "2025-01-01")['tiles'] > 0
+        dzi_path = tile_manager.get_dzi("2025-01-01", str(photo))
+        with open(dzi_path) as f:
+            assert 'Width="96" Height="64"' in f.read()
+        assert tile_manager.get_tile("2025-01-01", "photo.jpg", 7, 0, 0)
+        assert tile_manager.get_tile("2025-01-01", "photo.jpg", 8, 0, 0) is None
+
+        # Already built
+        assert tile_manager.generate_pyramid(str(photo), "2025-01-01") is None
+
+        tile_manager.remove_pyramids("photo.jpg")
+        assert not tile_manager.has_pyramid("2025-01-01", "photo.jpg")
+
+
+def test_tile_manager_rebuilds_replaced_photo(tmp_path):
+    """Test that replacing a photo makes its pyramid stale."""
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((64, 96, 3), dtype=np.uint8))
+
+    with patch('src.web.services.tiles.TILES_DIR', str(tmp_path / "tiles")):
+        tile_manager.generate_pyramid(str(photo), "2025-01-01")
+        assert tile_manager.is_current(str(photo), "2025-01-01")
+
+        cv2.imwrite(str(photo), np.zeros((128, 96, 3), dtype=np.uint8))
+        assert tile_manager.get_dzi("2025-01-01", str(photo)) is None
+
+        assert tile_manager.generate_pyramid(str(photo), "2025-01-01") is not None
+        with open(tile_manager.get_dzi("2025-01-01", str(photo))) as f:
+            assert 'Width="96" Height="128"' in f.read()
+
+
+def test_tile_manager_queues_one_build(tmp_path):
+    """Test that repeated descriptor requests share one queued build."""
+    photo = tmp_path / "photo.jpg"
+    cv2.imwrite(str(photo), np.zeros((64, 96, 3), dtype=np.uint8))
+
+    with patch('src.web.services.tiles.TILES_DIR', str(tmp_path / "tiles")), \
+            patch.object(type(tile_manager), '_generate_queued', return_value="job-1") as queued:
+        assert tile_manager.queue_pyramid(str(photo), "2025-01-01") == "job-1"
+        with patch('src.web.services.tiles.job_queue.get_job',
+                   return_value={'status': 'pending'}):
+            assert tile_manager.queue_pyramid(str(photo), "2025-01-01") == "job-1"
+        assert queued.call_count == 1
+        tile_manager._pending.clear()
@@ -1,6 +1,8 @@
 # src/web/utils/camera.py
 import os
+import math
 import time
+import struct
 import logging
 import threading
 import cv2
@@ -100,41 +102,186 @@ def generate_camera_frames():
     finally:
         release_camera()
 
-def generate_thumbnail(file_path, size=(200, 200)):
+# libjpeg can decode at 1/2, 1/4 or 1/8 scale by dropping DCT coefficients,
+# which skips most of the work of a full-resolution decode
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Start-of-frame markers, which hold the image size (not DHT, JPG or DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def jpeg_dimensions(file_path):
+    """Read the width and height of a JPEG from its header.
+    
+    Returns:
+        (width, height), or None if the file isn't a readable JPEG
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read(2) != b'\xff\xd8':
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code == 0xFF:
+                    # Fill byte before the marker
+                    f.seek(-1, os.SEEK_CUR)
+                    continue
+                if code == 0x01 or 0xD0 <= code <= 0xD8:
+                    # Markers without a length
+                    continue
+                length, = struct.unpack('>H', f.read(2))
+                if code in JPEG_SOF_MARKERS:
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+def read_reduced(file_path, long_side, short_side=0):
+    """Decode an image at the smallest scale that keeps its long side.
+    
+    JPEGs are decoded at the largest libjpeg reduction (1/8, 1/4 or 1/2)
+    whose long side is still at least long_side and whose short side is at
+    least short_side; other images are decoded in full.
+    
+    Args:
+        file_path: Image path
+        long_side: Smallest long side the caller will resize from
+        short_side: Smallest short side the caller will resize from
+    
+    Returns:
+        BGR image, or None if it can't be read
+    """
+    flag = cv2.IMREAD_COLOR
+    dimensions = jpeg_dimensions(file_path)
+    if dimensions:
+        for scale, reduced_flag in REDUCED_DECODE_FLAGS:
+            if (math.ceil(max(dimensions) / scale) >= long_side
+                    and math.ceil(min(dimensions) / scale) >= short_side):
+                flag = reduced_flag
+                break
+    return cv2.imread(file_path, flag)
+
+def read_exif_thumbnail(file_path):
+    """Read the JPEG thumbnail embedded in a JPEG's EXIF block.
+    
+    Only the segments before the EXIF block and the block itself (at most
+    64 KB, usually a few KB) are read.
+    
+    Returns:
+        Thumbnail JPEG bytes, or None if the file has none
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read(2) != b'\xff\xd8':
+                return None
+            while True:
+                marker = f.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF or not 0xE0 <= marker[1] <= 0xEF:
+                    # The APPn segments come first; the image data starts after them
+                    return None
+                length, = struct.unpack('>H', marker[2:])
+                if marker[1] == 0xE1:
+                    segment = f.read(length - 2)
+                    if segment.startswith(b'Exif\x00\x00'):
+                        return _tiff_thumbnail(segment[6:])
+                else:
+                    f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+def _tiff_thumbnail(tiff):
+    """Thumbnail from the 1st IFD of an EXIF TIFF structure."""
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if byte_order is None:
+        return None
+    
+    # IFD0 is followed by the offset of IFD1, which describes the thumbnail
+    ifd0, = struct.unpack(byte_order + 'I', tiff[4:8])
+    entries, = struct.unpack(byte_order + 'H', tiff[ifd0:ifd0 + 2])
+    next_ifd = ifd0 + 2 + entries * 12
+    ifd1, = struct.unpack(byte_order + 'I', tiff[next_ifd:next_ifd + 4])
+    if not ifd1:
+        return None
+    
+    tags = {}
+    entries, = struct.unpack(byte_order + 'H', tiff[ifd1:ifd1 + 2])
+    for i in range(entries):
+        entry = ifd1 + 2 + i * 12
+        tag, value_type, _, value = struct.unpack(byte_order + 'HHII', tiff[entry:entry + 12])
+        if value_type == 3:
+            # SHORT values sit in the first two bytes of the value field
+            value, = struct.unpack(byte_order + 'H', tiff[entry + 8:entry + 10])
+        tags[tag] = value
+    
+    # JPEGInterchangeFormat and JPEGInterchangeFormatLength
+    offset, length = tags.get(0x0201), tags.get(0x0202)
+    if not offset or not length:
+        return None
+    thumbnail = tiff[offset:offset + length]
+    return thumbnail if thumbnail.startswith(b'\xff\xd8') else None
+
+def _square_thumbnail(img, size, quality=85):
+    """Centre-crop an image to the shape of size, then resize it to size.
+    
+    This matches the thumbnails written at capture time, whichever source
+    the thumbnail is made from.
+    """
+    height, width = img.shape[:2]
+    target_width, target_height = size
+    scale = max(target_width / width, target_height / height)
+    crop_width = min(width, round(target_width / scale))
+    crop_height = min(height, round(target_height / scale))
+    left = (width - crop_width) // 2
+    top = (height - crop_height) // 2
+    img = img[top:top + crop_height, left:left + crop_width]
+    img = cv2.resize(img, (target_width, target_height), interpolation=cv2.INTER_AREA)
+    
+    # Encode to JPEG
+    _, buffer = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return buffer
+
+def exif_thumbnail(file_path, size=(200, 200), quality=85):
+    """Generate a thumbnail from the thumbnail embedded in a photo's EXIF block.
+    
+    Returns:
+        Encoded thumbnail, or None if the photo has no embedded thumbnail
+    """
+    # Check if OpenCV is available
+    if not 'cv2' in globals():
+        return None
+    
+    embedded = read_exif_thumbnail(file_path)
+    if embedded is None:
+        return None
+    
+    try:
+        img = cv2.imdecode(np.frombuffer(embedded, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        return _square_thumbnail(img, size, quality)
+    except Exception as e:
+        logger.error(f"Error reading EXIF thumbnail: {str(e)}")
+        return None
+
+def generate_thumbnail(file_path, size=(200, 200), quality=85):
     """Generate a thumbnail for an image."""
     # Check if OpenCV is available
     if not 'cv2' in globals():
         return None
     
     try:
-        img = cv2.imread(file_path)
+        img = read_reduced(file_path, 0, short_side=max(size))
         if img is None:
             return None
         
-        # Resize image
-        height, width = img.shape[:2]
-        if width > height:
-            new_width = size[0]
-            new_height = int(height * (new_width / width))
-        else:
-            new_height = size[1]
-            new_width = int(width * (new_height / height))
-        
-        img = cv2.resize(img, (new_width, new_height))
-        
-        # Crop to square if needed
-        if new_width != new_height:
-            if new_width > new_height:
-                start_x = (new_width - new_height) // 2
-                img = img[:, start_x:start_x + new_height]
-            else:
-                start_y = (new_height - new_width) // 2
-                img = img[start_y:start_y + new_width, :]
-        
-        # Encode to JPEG
-        _, buffer = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-        
-        return buffer
+        return _square_thumbnail(img, size, quality)
     except Exception as e:
         logger.error(f"Error generating thumbnail: {str(e)}")
         return None
@@ -143,10 +290,11 @@ def run_camera_action(action, args=None):
     """Run a camera-related action script."""
     from .system import run_script
     
+    # TriggerCapture.py uses the warm capture daemon and falls back to TakePhoto.py
     if action == 'calibrate':
-        return run_script('TakePhoto.py', ['--calibrate'])
+        return run_script('TriggerCapture.py', ['calibrate'])
     elif action == 'capture':
-        return run_script('TakePhoto.py')
+        return run_script('TriggerCapture.py')
     else:
         raise APIError(
             ErrorCode.INVALID_REQUEST,
@@ -53,9 +53,52 @@ def write_csv_settings(file_path, settings):
         logger.error(f"Error writing CSV file {file_path}: {str(e)}")
         return False
 
+def is_rendition(filename):
+    """Check if a file is a thumbnail or preview written next to a photo."""
+    from ..config import THUMBNAIL_SUFFIX, PREVIEW_SUFFIX
+
+    return filename.lower().endswith((THUMBNAIL_SUFFIX, PREVIEW_SUFFIX))
+
+def is_photo_file(filename):
+    """Check if a file is a photo (renditions don't count)."""
+    return filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')) and not is_rendition(filename)
+
+def rendition_path(file_path, suffix):
+    """Path of a photo's rendition with the given suffix."""
+    return os.path.splitext(file_path)[0] + suffix
+
+def get_rendition_file(file_path, suffix):
+    """Get a photo's rendition, or None if it wasn't written."""
+    path = rendition_path(file_path, suffix)
+    return path if os.path.exists(path) else None
+
+def read_photo_manifest(folder):
+    """Read a dated folder's manifest, keyed by file name.
+    
+    The capture pipeline appends one JSON line per saved file with its
+    exposure, gain, lens position, capture time and hash. Folders from
+    before the manifest existed return an empty dict.
+    """
+    import json
+    from ..config import PHOTO_MANIFEST_FILE
+    
+    records = {}
+    try:
+        with open(os.path.join(folder, PHOTO_MANIFEST_FILE), 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record['file']] = record
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by a power loss
+                    continue
+    except OSError:
+        pass
+    return records
+
 def get_storage_info():
     """Get storage information."""
-    from ..config import BASE_DIR, PHOTOS_DIR
+    from ..config import BASE_DIR
     
     try:
         # Get internal storage info
@@ -65,14 +108,8 @@ def get_storage_info():
         internal_used = internal_total - internal_free
         
         # Get photos count and size
-        photos_count = 0
-        photos_size = 0
-        
-        for root, dirs, files in os.walk(PHOTOS_DIR):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    photos_count += 1
-                    photos_size += os.path.getsize(os.path.join(root, file))
+        from ..services.photo_index import photo_index
+        photos_count, photos_size = photo_index.stats()
         
         # Check for external storage
         external_connected = False
@@ -131,85 +168,153 @@ def create_dated_folder(base_path):
     os.chmod(folder_path, 0o777)  # mode=0o777 for read write for all users
     return folder_path
 
-def get_photo_dates():
-    """Get list of dates with photos."""
-    from ..config import PHOTOS_DIR
+def get_photo_dates(root='photos'):
+    """Get list of dates with photos.
     
-    dates = set()
+    Args:
+        root: Photo index root (photos, backup or external:<drive>)
+    """
+    from ..services.photo_index import photo_index
     
     try:
-        for root, dirs, files in os.walk(PHOTOS_DIR):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    # Get file date from directory name
-                    dir_name = os.path.basename(root)
-                    if dir_name.startswith('20') and len(dir_name) == 10:  # YYYY-MM-DD format
-                        dates.add(dir_name)
+        return photo_index.dates(root)
     except Exception as e:
         logger.error(f"Error getting photo dates: {str(e)}")
+        return []
+
+def _photo_entry(row, root, root_folder):
+    """Build the gallery entry of a photo index row."""
+    file = row['filename']
+    # Photos outside a dated folder are listed under the root folder's name
+    file_date = row['folder'] or root_folder
     
-    return sorted(list(dates), reverse=True)
+    photo = {
+        'filename': file,
+        'url': f"/api/gallery/photos/view/{file_date}/{file}",
+        'thumbnailUrl': f"/api/gallery/photos/thumbnail/{file_date}/{file}",
+        'previewUrl': f"/api/gallery/photos/preview/{file_date}/{file}",
+        'dziUrl': f"/api/gallery/photos/tiles/{file_date}/{file}.dzi",
+        'date': file_date,
+        'time': row['time'],
+        'exposure': row['exposure'] or 0,
+        'focus': row['focus'] or 0,
+        'hdr': row['hdr'],
+        'device': row['device']
+    }
+    if root != 'photos':
+        # Tile pyramids are only built for the photos folder
+        del photo['dziUrl']
+        for key in ('url', 'thumbnailUrl', 'previewUrl'):
+            photo[key] += f"?root={root}"
+        photo['root'] = root
+    return photo
 
-def get_photos(date=None):
-    """Get list of photos, optionally filtered by date."""
-    from ..config import PHOTOS_DIR
+def get_photos(date=None, root='photos'):
+    """Get list of photos, optionally filtered by date.
     
-    photos = []
+    Args:
+        date: Dated folder (YYYY-MM-DD) to list
+        root: Photo index root (photos, backup or external:<drive>)
+    """
+    from ..services.photo_index import photo_index
     
     try:
-        for root, dirs, files in os.walk(PHOTOS_DIR):
-            dir_name = os.path.basename(root)
-            
-            # Skip if filtering by date and this directory doesn't match
-            if date and dir_name != date:
-                continue
-            
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    file_path = os.path.join(root, file)
-                    
-                    # Extract metadata
-                    file_date = dir_name
-                    file_time = '00:00:00'
-                    exposure = 0
-                    focus = 0
-                    
-                    # Try to extract time from filename (format: devicename_YYYY_MM_DD__HH_MM_SS_HDRx.jpg)
-                    parts = file.split('_')
-                    if len(parts) >= 6:
-                        try:
-                            file_time = f"{parts[3]}:{parts[4]}:{parts[5].split('.')[0]}"
-                        except:
-                            pass
-                    
-                    photos.append({
-                        'filename': file,
-                        'url': f"/api/gallery/photos/view/{file_date}/{file}",
-                        'thumbnailUrl': f"/api/gallery/photos/thumbnail/{file_date}/{file}",
-                        'date': file_date,
-                        'time': file_time,
-                        'exposure': exposure,
-                        'focus': focus
-                    })
+        root_folder = os.path.basename(photo_index.root_path(root) or root)
+        # Sorted by date and time, newest first
+        return [_photo_entry(row, root, root_folder) for row in photo_index.photos(date, root)]
     except Exception as e:
         logger.error(f"Error getting photos: {str(e)}")
+        return []
+
+def encode_photo_cursor(photo):
+    """Encode the position after a photo index row as an opaque cursor."""
+    import json
+    import base64
     
-    # Sort by date and time, newest first
-    photos.sort(key=lambda x: (x['date'], x['time']), reverse=True)
+    position = json.dumps([photo['folder'], photo['time'], photo['filename']])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+def decode_photo_cursor(cursor):
+    """Decode a cursor from encode_photo_cursor.
+    
+    Returns:
+        (folder, time, filename) to continue after
     
-    return photos
+    Raises:
+        APIError: If the cursor wasn't made by encode_photo_cursor
+    """
+    import json
+    import base64
+    
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(position) != 3 or not all(isinstance(value, str) for value in position):
+            raise ValueError("expected folder, time and filename")
+        return tuple(position)
+    except (ValueError, TypeError) as e:
+        raise APIError(ErrorCode.INVALID_REQUEST, "Invalid cursor", {"error": str(e)})
 
-def get_photo_file(date, filename):
-    """Get a photo file."""
-    from ..config import PHOTOS_DIR
+def get_photo_page(date=None, root='photos', limit=100, cursor=None, filters=None,
+                   time_range=None, fields=None):
+    """Get one page of photos, newest first.
+    
+    Each page is one index range scan, so its cost doesn't grow with the
+    size of the archive.
+    
+    Args:
+        date: Dated folder (YYYY-MM-DD) to list
+        root: Photo index root (photos, backup or external:<drive>)
+        limit: Most photos on the page
+        cursor: nextCursor of the previous page
+        filters: Values for the keys of PHOTO_FILTERS
+        time_range: (from, to) times of day as HH:MM[:SS]
+        fields: Keys to return for each photo (default: all)
+    
+    Returns:
+        Dictionary with photos, count and nextCursor (None on the last page)
+    """
+    from ..services.photo_index import photo_index
+    
+    after = decode_photo_cursor(cursor) if cursor else None
+    # One extra row tells whether there is a next page
+    rows = photo_index.photos(date, root, filters=filters, time_range=time_range,
+                              after=after, limit=limit + 1)
+    next_cursor = encode_photo_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    
+    root_folder = os.path.basename(photo_index.root_path(root) or root)
+    photos = [_photo_entry(row, root, root_folder) for row in rows]
+    if fields:
+        photos = [{key: photo[key] for key in fields if key in photo} for photo in photos]
+    
+    return {
+        'photos': photos,
+        'count': len(photos),
+        'nextCursor': next_cursor
+    }
+
+def get_photo_file(date, filename, root='photos'):
+    """Get a photo file.
+    
+    Args:
+        date: Dated folder of the photo
+        filename: Photo file name
+        root: Photo index root (photos, backup or external:<drive>)
+    """
+    from ..services.photo_index import photo_index
     
     try:
-        file_path = os.path.join(PHOTOS_DIR, date, secure_filename(filename))
+        root_path = photo_index.root_path(root)
+        if root_path is None:
+            return None
+        
+        file_path = os.path.join(root_path, secure_filename(date), secure_filename(filename))
         if os.path.exists(file_path):
             return file_path
         
         # If the dated folder doesn't exist, try in the main photos directory
-        file_path = os.path.join(PHOTOS_DIR, secure_filename(filename))
+        file_path = os.path.join(root_path, secure_filename(filename))
         if os.path.exists(file_path):
             return file_path
             
@@ -219,17 +324,23 @@ def get_photo_file(date, filename):
         return None
 
 def delete_photo(filename):
-    """Delete a photo."""
-    from ..config import PHOTOS_DIR
+    """Delete a photo and its renditions."""
+    from ..config import THUMBNAIL_SUFFIX, PREVIEW_SUFFIX
+    from ..services.photo_index import photo_index
     
     try:
-        # Find the photo in all date directories
-        for root, dirs, files in os.walk(PHOTOS_DIR):
-            if filename in files:
-                file_path = os.path.join(root, filename)
-                os.remove(file_path)
-                logger.info(f"Deleted photo: {file_path}")
-                return True
+        # Find the photo in the index of all date directories
+        for file_path in photo_index.locate(filename):
+            if not os.path.exists(file_path):
+                continue
+            os.remove(file_path)
+            for suffix in (THUMBNAIL_SUFFIX, PREVIEW_SUFFIX):
+                rendition = get_rendition_file(file_path, suffix)
+                if rendition:
+                    os.remove(rendition)
+            photo_index.mark_changed(os.path.dirname(file_path))
+            logger.info(f"Deleted photo: {file_path}")
+            return True
         
         logger.warning(f"Photo not found for deletion: {filename}")
         raise APIError(ErrorCode.FILE_NOT_FOUND, f"Photo not found: {filename}")
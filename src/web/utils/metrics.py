@@ -0,0 +1,133 @@
+# src/web/utils/metrics.py
+import os
+import json
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _stats(values):
+    """Count, mean, median, 95th percentile, max and total of a list of numbers."""
+    values = sorted(values)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'mean': total / len(values),
+        'p50': _percentile(values, 0.5),
+        'p95': _percentile(values, 0.95),
+        'max': values[-1],
+        'total': total,
+    }
+
+
+def read_capture_metrics(file_path=None, since=None, until=None, source=None, limit=None):
+    """Read capture records, newest first.
+
+    Args:
+        file_path: Metrics file (default: CAPTURE_METRICS_FILE); its rotated
+            .1 file is read too
+        since: Only records started at or after this Unix time
+        until: Only records started before this Unix time
+        source: Only records from this source ("TakePhoto", "daemon", ...)
+        limit: Most records to return
+
+    Returns:
+        List of record dictionaries
+    """
+    from ..config import CAPTURE_METRICS_FILE
+    file_path = file_path or CAPTURE_METRICS_FILE
+
+    records = []
+    for path in (file_path + '.1', file_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A capture killed mid-write can leave a partial line
+                    logger.warning(f"Skipping malformed line in {path}")
+                    continue
+
+                started_at = record.get('startedAt', 0)
+                if since is not None and started_at < since:
+                    continue
+                if until is not None and started_at >= until:
+                    continue
+                if source is not None and record.get('source') != source:
+                    continue
+                records.append(record)
+
+    records.sort(key=lambda record: record.get('startedAt', 0), reverse=True)
+    if limit is not None:
+        records = records[:limit]
+    return records
+
+
+def summarize_capture_metrics(records, flash_power_watts=None):
+    """Aggregate capture records into where the time and flash energy went.
+
+    Args:
+        records: Records from read_capture_metrics
+        flash_power_watts: Flash power draw (default: FLASH_POWER_WATTS);
+            flash energy is only estimated when it is set
+
+    Returns:
+        Dictionary with per-phase and per-exposure statistics, flash totals
+        and a per-version breakdown
+    """
+    from ..config import FLASH_POWER_WATTS
+    if flash_power_watts is None:
+        flash_power_watts = FLASH_POWER_WATTS
+
+    phases = defaultdict(list)
+    exposure_steps = defaultdict(list)
+    versions = defaultdict(lambda: {'totalTime': [], 'flashTime': []})
+    total_times = []
+    flash_time = 0
+
+    for record in records:
+        total_times.append(record.get('totalTime', 0))
+        flash_time += record.get('flashTime', 0)
+        for name, seconds in record.get('phases', {}).items():
+            phases[name].append(seconds)
+        for exposure in record.get('exposures', []):
+            for step in ('settle', 'armed', 'flashOn', 'capture', 'flashOff', 'flashTime'):
+                if step in exposure:
+                    exposure_steps[step].append(exposure[step])
+        for step in ('encodeTime', 'writeTime'):
+            if step in record:
+                phases[step].append(record[step])
+
+        version = versions[record.get('version', 'unknown')]
+        version['totalTime'].append(record.get('totalTime', 0))
+        version['flashTime'].append(record.get('flashTime', 0))
+
+    summary = {
+        'captures': len(records),
+        'totalTime': _stats(total_times) if total_times else None,
+        'phases': {name: _stats(values) for name, values in phases.items()},
+        'exposures': {step: _stats(values) for step, values in exposure_steps.items()},
+        'flashTime': flash_time,
+        'flashEnergy': flash_time * flash_power_watts if flash_power_watts else None,
+        'versions': {
+            name: {
+                'captures': len(values['totalTime']),
+                'totalTime': _stats(values['totalTime']),
+                'flashTime': _stats(values['flashTime']),
+            }
+            for name, values in versions.items()
+        },
+    }
+    return summary
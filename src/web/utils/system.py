@@ -244,20 +244,8 @@ def get_schedule_info():
         # Get last photo time
         last_photo = 0
         try:
-            newest_file = None
-            newest_time = 0
-            
-            for root, dirs, files in os.walk(os.path.join(BASE_DIR, 'photos')):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                        file_path = os.path.join(root, file)
-                        file_time = os.path.getmtime(file_path)
-                        if file_time > newest_time:
-                            newest_time = file_time
-                            newest_file = file_path
-            
-            if newest_file:
-                last_photo = int(newest_time)
+            from ..services.photo_index import photo_index
+            last_photo = int(photo_index.newest_mtime())
         except:
             pass
         